@@ -0,0 +1,3 @@
+UID_WORKER_ID_SEQUENCE = 'UID_WORKER_ID_SEQUENCE'
+UID_WORKER_ID_LEASE_ = lambda worker_id: f'UID_WORKER_ID_LEASE_{worker_id}'
+IDEMPOTENCY_KEY_ = lambda user_id, scope, idempotency_key: f'IDEMPOTENCY_KEY_{user_id}_{scope}_{idempotency_key}'
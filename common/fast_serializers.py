@@ -0,0 +1,157 @@
+import threading
+from collections import defaultdict
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+from rest_framework.relations import RelatedField
+
+IDENTITY_FIELD_CLASSES = (
+    serializers.IntegerField,
+    serializers.CharField,
+    serializers.BooleanField,
+    serializers.ReadOnlyField,
+)
+
+
+class FastSerializer:
+    """
+    read-only ModelSerializer와 같은 모양의 dict를 values_list() row에서 바로 만들어냅니다.
+    serializer의 필드 구성을 한번만 읽어서 row -> dict 함수를 생성해두고, 필드 객체의 get_attribute,
+    to_representation 호출은 변환이 필요한 필드(DateTimeField 등)에만 사용합니다.
+    many=True인 nested serializer는 최상위의 reverse FK만 지원하며 한번의 쿼리로 묶어서 가져옵니다.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._compiled = False
+        # 클래스 속성으로 요청들이 같이 쓰므로 첫 요청들이 동시에 compile해도 paths와 row_to_dict가 섞이지 않게 한다.
+        self._compile_lock = threading.Lock()
+
+    def compile(self):
+        if self._compiled:
+            return
+
+        with self._compile_lock:
+            if not self._compiled:
+                self._compile()
+
+    def _compile(self):
+        self.paths = []
+        self.many_relations = []
+        self.converters = []
+        self.model = self.serializer_class.Meta.model
+
+        expression = self.compile_serializer(self.serializer_class(), self.model, prefix=())
+        many_args = ''.join(f', many{index}' for index in range(len(self.many_relations)))
+        converter_args = ''.join(f', c{index}=c{index}' for index in range(len(self.converters)))
+        source = f'def row_to_dict(row{many_args}{converter_args}):\n    return {expression}\n'
+
+        namespace = {f'c{index}': converter for index, converter in enumerate(self.converters)}
+        exec(compile(source, f'<FastSerializer {self.serializer_class.__name__}>', 'exec'), namespace)
+        self.row_to_dict = namespace['row_to_dict']
+        self._compiled = True
+
+    def compile_serializer(self, serializer, model, prefix):
+        if type(serializer).to_representation is not serializers.Serializer.to_representation:
+            raise ImproperlyConfigured(
+                f'{type(serializer).__name__} 은 to_representation을 재정의하여 FastSerializer로 변환할 수 없습니다.'
+            )
+
+        items = []
+
+        for field_name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+
+            if isinstance(field, serializers.ListSerializer):
+                value = self.compile_many(field, model, prefix)
+            elif isinstance(field, serializers.BaseSerializer):
+                value = self.compile_nested(field, model, prefix)
+            else:
+                value = self.compile_field(field, prefix)
+
+            items.append(f'{field_name!r}: {value}')
+
+        return '{' + ', '.join(items) + '}'
+
+    def compile_nested(self, field, model, prefix):
+        if field.source == '*':
+            return self.compile_serializer(field, model, prefix)
+
+        related_model = model._meta.get_field(field.source_attrs[0]).related_model
+
+        for attr in field.source_attrs[1:]:
+            related_model = related_model._meta.get_field(attr).related_model
+
+        nested_prefix = prefix + tuple(field.source_attrs)
+        pk_index = self.add_path('__'.join(nested_prefix + (related_model._meta.pk.name,)))
+        expression = self.compile_serializer(field, related_model, nested_prefix)
+        return f'(None if row[{pk_index}] is None else {expression})'
+
+    def compile_many(self, field, model, prefix):
+        if prefix or len(field.source_attrs) != 1:
+            raise ImproperlyConfigured(f'{field.field_name} 은 최상위 reverse FK가 아니어서 FastSerializer로 변환할 수 없습니다.')
+
+        relation = model._meta.get_field(field.source)
+        child = FastSerializer(type(field.child))
+        child.compile()
+
+        if child.many_relations:
+            raise ImproperlyConfigured(f'{field.field_name} 은 nested many 필드를 가지고 있어 FastSerializer로 변환할 수 없습니다.')
+
+        pk_index = self.add_path(model._meta.pk.name)
+        self.many_relations.append((child, relation.field.attname))
+        return f'many{len(self.many_relations) - 1}.get(row[{pk_index}], [])'
+
+    def compile_field(self, field, prefix):
+        if isinstance(field, (RelatedField, serializers.SerializerMethodField)) or field.source == '*':
+            raise ImproperlyConfigured(f'{field.field_name} 은 FastSerializer로 변환할 수 없는 필드입니다.')
+
+        index = self.add_path('__'.join(prefix + tuple(field.source_attrs)))
+
+        if type(field) in IDENTITY_FIELD_CLASSES:
+            return f'row[{index}]'
+
+        self.converters.append(field.to_representation)
+        return f'(None if row[{index}] is None else c{len(self.converters) - 1}(row[{index}]))'
+
+    def add_path(self, path):
+        if path not in self.paths:
+            self.paths.append(path)
+        return self.paths.index(path)
+
+    def values_list(self, queryset, *extra_paths):
+        self.compile()
+        extra_paths = [path for path in extra_paths if path not in self.paths]
+        return queryset.prefetch_related(None).values_list(*self.paths, *extra_paths, named=True)
+
+    def get_many_maps(self, rows):
+        if not self.many_relations:
+            return ()
+
+        pks = [row[self.paths.index(self.model._meta.pk.name)] for row in rows]
+        many_maps = []
+
+        for child, fk_attname in self.many_relations:
+            grouped = defaultdict(list)
+            related_rows = child.model._default_manager.filter(
+                **{f'{fk_attname}__in': pks}
+            ).order_by(
+                child.model._meta.pk.name
+            ).values_list(
+                fk_attname, *child.paths
+            )
+
+            for related_row in related_rows:
+                grouped[related_row[0]].append(child.row_to_dict(related_row[1:]))
+
+            many_maps.append(grouped)
+
+        return many_maps
+
+    def serialize(self, rows):
+        self.compile()
+        rows = list(rows)
+        many_maps = self.get_many_maps(rows)
+        row_to_dict = self.row_to_dict
+        return [row_to_dict(row, *many_maps) for row in rows]
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.response import Response
+
+from common.cache import has_obtained_redis_lock, release_redis_lock
+from common.cache_keys import IDEMPOTENCY_KEY_
+
+
+class FastListModelMixin:
+    """
+    fast_serializer가 지정된 ListAPIView는 모델 인스턴스와 DRF 필드 객체 대신
+    values_list() row를 FastSerializer로 바로 직렬화합니다.
+    """
+    fast_serializer = None
+
+    def get_fast_serializer(self):
+        return self.fast_serializer
+
+    def list(self, request, *args, **kwargs):
+        fast_serializer = self.get_fast_serializer()
+
+        if fast_serializer is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = fast_serializer.values_list(queryset, *queryset.query.annotations)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(fast_serializer.serialize(page))
+
+        return Response(fast_serializer.serialize(rows))
+
+
+class ConditionalGetMixin:
+    """
+    get_conditional_validators()가 돌려주는 (etag, last_modified)로 If-None-Match / If-Modified-Since를 검사해서
+    변경이 없으면 목록을 조회/직렬화하지 않고 304를 응답합니다.
+    """
+
+    def get_conditional_validators(self):
+        return None, None
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_conditional_validators()
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            if etag is not None:
+                response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+
+        return response
+
+
+class IdempotentCreateMixin:
+    """
+    Idempotency-Key 헤더가 있으면 처음 요청의 응답을 Redis에 저장해두고 같은 키로 다시 온 요청에는 저장된 응답을
+    그대로 돌려줍니다. 처리중인 같은 키의 요청은 끝날 때까지 기다렸다가 그 결과를 받고, 같은 키로 내용이 다른 요청을
+    보내면 422를 응답합니다. 헤더가 없으면 예전처럼 create_lock_key(사용자 id)로 만든 키의 lock을 잡고,
+    이미 처리중이면 423을 응답합니다.
+    """
+    idempotency_key_header = 'Idempotency-Key'
+    # cache_keys의 사용자별 lock 키 함수를 staticmethod로 지정한다.
+    create_lock_key = None
+
+    def get_create_lock_key(self):
+        assert self.create_lock_key is not None, f'{type(self).__name__}에 create_lock_key를 지정해야 합니다.'
+        return self.create_lock_key(self.request.user.id)
+
+    def create_response(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    def create(self, request, *args, **kwargs):
+        idempotency_key = request.headers.get(self.idempotency_key_header)
+
+        if not idempotency_key:
+            return self.create_with_lock(request, *args, **kwargs)
+
+        return self.create_with_idempotency_key(idempotency_key, request, *args, **kwargs)
+
+    def create_with_lock(self, request, *args, **kwargs):
+        lock_key = self.get_create_lock_key()
+
+        if not has_obtained_redis_lock(lock_key, 3):
+            return Response('처리중입니다.', status=status.HTTP_423_LOCKED)
+
+        try:
+            return self.create_response(request, *args, **kwargs)
+        finally:
+            release_redis_lock(lock_key)
+
+    def get_request_fingerprint(self, request):
+        body = json.dumps(request.data, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(f'{request.method}:{request.path}:{body}'.encode()).hexdigest()
+
+    def create_with_idempotency_key(self, idempotency_key, request, *args, **kwargs):
+        if len(idempotency_key) > 255:
+            return Response('Idempotency-Key는 255자 이하여야 합니다.', status=status.HTTP_400_BAD_REQUEST)
+
+        key = IDEMPOTENCY_KEY_(request.user.id, type(self).__name__, idempotency_key)
+        fingerprint = self.get_request_fingerprint(request)
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+
+        while True:
+            if cache.add(key, {'fingerprint': fingerprint, 'response': None}, timeout=settings.IDEMPOTENCY_LOCK_TIMEOUT):
+                return self.create_and_store_response(key, fingerprint, request, *args, **kwargs)
+
+            stored = cache.get(key)
+
+            if stored is None:
+                # 먼저 온 요청이 실패해서 키가 지워졌으면 이 요청이 다시 처리한다.
+                continue
+
+            if stored['fingerprint'] != fingerprint:
+                return Response(
+                    '같은 Idempotency-Key로 다른 내용의 요청을 보냈습니다.',
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+
+            if stored['response'] is not None:
+                return Response(
+                    stored['response']['data'],
+                    status=stored['response']['status'],
+                    headers={'Idempotent-Replayed': 'true'},
+                )
+
+            if time.monotonic() >= deadline:
+                return Response('처리중입니다.', status=status.HTTP_409_CONFLICT)
+
+            time.sleep(settings.IDEMPOTENCY_POLL_INTERVAL)
+
+    def create_and_store_response(self, key, fingerprint, request, *args, **kwargs):
+        try:
+            response = self.create_response(request, *args, **kwargs)
+        except Exception:
+            # 검증 실패 등으로 아무것도 만들지 않았으므로 같은 키로 다시 요청할 수 있게 지운다.
+            cache.delete(key)
+            raise
+
+        if response.status_code >= 500:
+            cache.delete(key)
+        else:
+            cache.set(
+                key,
+                {'fingerprint': fingerprint, 'response': {'status': response.status_code, 'data': response.data}},
+                timeout=settings.IDEMPOTENCY_KEY_TIMEOUT,
+            )
+
+        return response
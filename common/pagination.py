@@ -0,0 +1,129 @@
+import base64
+import binascii
+import datetime
+import decimal
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    raise TypeError(f'{type(value).__name__} 은 cursor에 사용할 수 없습니다.')
+
+
+class KeysetPagination(BasePagination):
+    """
+    queryset의 order_by를 그대로 keyset으로 사용하는 cursor pagination.
+    마지막 정렬 필드가 id가 아니면 같은 방향의 id를 tiebreaker로 덧붙이고, COUNT(*)와 OFFSET 없이
+    (정렬 필드들, id) > cursor 조건의 인덱스 스캔만으로 페이지를 가져온다.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = '잘못된 cursor 입니다.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(queryset)
+        position, self.is_reversed = self.decode_cursor(request)
+
+        ordering = self.reverse_ordering(self.ordering) if self.is_reversed else self.ordering
+        queryset = queryset.order_by(*ordering)
+
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if self.is_reversed:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_ordering(self, queryset):
+        ordering = [field for field in queryset.query.order_by if isinstance(field, str)]
+
+        if not ordering:
+            ordering = ['-id']
+        elif ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering.append('-id' if ordering[-1].startswith('-') else 'id')
+
+        return ordering
+
+    def reverse_ordering(self, ordering):
+        return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+    def get_position_filter(self, ordering, position):
+        q = Q()
+        equals = {}
+
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            q |= Q(**equals, **{f'{name}__{lookup}': value})
+            equals[name] = value
+
+        # OR 조건만으로는 index에서 시작 위치를 찾지 못해서 페이지가 깊어질수록 느려진다.
+        # 결과는 같지만 첫 정렬 필드의 범위 조건을 같이 걸어서 cursor 위치부터 index range scan을 하도록 한다.
+        field, value = ordering[0], position[0]
+        leading_lookup = 'lte' if field.startswith('-') else 'gte'
+        return Q(**{f'{field.lstrip("-")}__{leading_lookup}': value}) & q
+
+    def get_position(self, item):
+        return [
+            item[field.lstrip('-')] if isinstance(item, dict) else getattr(item, field.lstrip('-'))
+            for field in self.ordering
+        ]
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]), is_reversed=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[0]), is_reversed=True)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+
+        if not encoded:
+            return None, False
+
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            position, is_reversed = cursor['p'], bool(cursor['r'])
+        except (TypeError, ValueError, KeyError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, is_reversed
+
+    def encode_cursor(self, position, is_reversed):
+        cursor = json.dumps({'p': position, 'r': int(is_reversed)}, default=encode_cursor_value)
+        encoded = base64.urlsafe_b64encode(cursor.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
@@ -0,0 +1,315 @@
+import datetime
+import re
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+Partition = namedtuple('Partition', ['name', 'upper_bound', 'is_default'])
+
+CREATE_MONTHLY_PARTITION_SQL = '''
+CREATE TABLE IF NOT EXISTS {partition} PARTITION OF {table}
+FOR VALUES FROM (%s) TO (%s)
+'''
+
+CREATE_DEFAULT_PARTITION_SQL = 'CREATE TABLE IF NOT EXISTS {partition} PARTITION OF {table} DEFAULT'
+
+SELECT_PARTITIONS_SQL = '''
+SELECT partition.relname, pg_get_expr(partition.relpartbound, partition.oid)
+FROM pg_inherits
+JOIN pg_class partition ON partition.oid = pg_inherits.inhrelid
+WHERE pg_inherits.inhparent = %s::regclass
+ORDER BY partition.relname
+'''
+
+SELECT_PLAIN_INDEXES_SQL = '''
+SELECT index_class.relname, pg_get_indexdef(pg_index.indexrelid)
+FROM pg_index
+JOIN pg_class index_class ON index_class.oid = pg_index.indexrelid
+WHERE pg_index.indrelid = %s::regclass
+  AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE pg_constraint.conindid = pg_index.indexrelid)
+'''
+
+SELECT_REFERENCING_FOREIGN_KEYS_SQL = '''
+SELECT pg_constraint.conrelid::regclass::text, pg_constraint.conname
+FROM pg_constraint
+WHERE pg_constraint.contype = 'f'
+  AND pg_constraint.confrelid = %s::regclass
+'''
+
+SELECT_FOREIGN_KEYS_SQL = '''
+SELECT pg_constraint.conname, pg_get_constraintdef(pg_constraint.oid)
+FROM pg_constraint
+WHERE pg_constraint.contype = 'f'
+  AND pg_constraint.conrelid = %s::regclass
+'''
+
+SELECT_UNIQUE_CONSTRAINTS_SQL = '''
+SELECT pg_constraint.conname
+FROM pg_constraint
+WHERE pg_constraint.contype = 'u'
+  AND pg_constraint.conrelid = %s::regclass
+'''
+
+UPPER_BOUND_PATTERN = re.compile(r"TO \('([^']+)'\)")
+
+
+def quote_name(name):
+    return connection.ops.quote_name(name)
+
+
+def get_month_start(value):
+    return datetime.date(value.year, value.month, 1)
+
+
+def add_months(month, months):
+    year, month_index = divmod(month.year * 12 + month.month - 1 + months, 12)
+    return datetime.date(year, month_index + 1, 1)
+
+
+def get_month_boundary(month):
+    # partition 경계는 서버의 TIME_ZONE 기준 자정으로 맞춘다.
+    return timezone.make_aware(datetime.datetime.combine(month, datetime.time()))
+
+
+def get_monthly_partition_name(table, month):
+    return f'{table}_y{month.year}m{month.month:02d}'
+
+
+def get_legacy_partition_name(table):
+    return f'{table}_legacy'
+
+
+def create_monthly_partitions(table, months_ahead, start=None, lock_timeout_ms=None):
+    """
+    start(기본값은 이번 달)부터 months_ahead 달 뒤까지 월별 partition을 만들고 새로 만든 partition 이름들을 돌려줍니다.
+    DEFAULT partition에 해당 기간의 row가 들어가 있으면 partition을 만들 수 없기 때문에 미리 만들어둬야 합니다.
+    lock_timeout_ms는 create_monthly_partition과 같습니다.
+    """
+    created_partitions = []
+
+    for partition, month in get_missing_monthly_partitions(table, months_ahead, start=start):
+        create_monthly_partition(table, month, lock_timeout_ms=lock_timeout_ms)
+        created_partitions.append(partition)
+
+    return created_partitions
+
+
+def get_missing_monthly_partitions(table, months_ahead, start=None):
+    """
+    start(기본값은 이번 달)부터 months_ahead 달 뒤까지 아직 partition이 없는 달들의 [(partition 이름, 달)]입니다.
+    """
+    start = get_month_start(start or timezone.localdate())
+    # legacy partition처럼 여러 달을 덮는 partition이 있으므로 이름이 아니라 범위로 이미 있는지 확인한다.
+    covered_until = max(
+        (partition.upper_bound for partition in get_partitions(table) if partition.upper_bound is not None),
+        default=None,
+    )
+    missing_partitions = []
+
+    for offset in range(months_ahead + 1):
+        month = add_months(start, offset)
+
+        if covered_until is not None and get_month_boundary(month) < covered_until:
+            continue
+
+        missing_partitions.append((get_monthly_partition_name(table, month), month))
+
+    return missing_partitions
+
+
+def create_monthly_partition(table, month, lock_timeout_ms=None):
+    """
+    month의 partition을 만듭니다. 부모 테이블에 ACCESS EXCLUSIVE lock을 잡고 DEFAULT partition에 해당 기간의 row가 없는지 훑으므로
+    lock_timeout_ms를 주면 detach_partition과 같이 그 이상 lock을 기다리지 않고 OperationalError가 발생합니다.
+    """
+    sql = CREATE_MONTHLY_PARTITION_SQL.format(
+        partition=quote_name(get_monthly_partition_name(table, month)), table=quote_name(table),
+    )
+    params = [get_month_boundary(month), get_month_boundary(add_months(month, 1))]
+
+    # 기다리는 동안 부모 테이블을 읽고 쓰는 쿼리가 뒤에 쌓이지 않게 한다.
+    with transaction.atomic(), connection.cursor() as cursor:
+        if lock_timeout_ms is not None:
+            cursor.execute('SET LOCAL lock_timeout = %s', [f'{lock_timeout_ms}ms'])
+        cursor.execute(sql, params)
+
+
+def get_partitions(table):
+    """
+    partition 목록입니다. upper_bound는 partition 범위의 끝(포함하지 않음)이고 DEFAULT partition은 None입니다.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(SELECT_PARTITIONS_SQL, [quote_name(table)])
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bound in rows:
+        match = UPPER_BOUND_PATTERN.search(bound)
+        partitions.append(Partition(
+            name=name,
+            upper_bound=parse_datetime(match.group(1)) if match else None,
+            is_default=bound == 'DEFAULT',
+        ))
+
+    return partitions
+
+
+def prepare_partitioning(table, legacy_until, replacement_indexes=()):
+    """
+    기존 테이블을 partition 테이블로 바꾸기 전에 오래 걸리는 작업을 lock 없이 미리 해둡니다.
+    transaction 밖(autocommit)에서 호출해야 합니다.
+
+    - partition의 primary key가 될 (id, created_at) unique index
+    - unique 제약을 지우고 대신 사용할 일반 index (replacement_indexes: [(index 이름, [컬럼])])
+    - 기존 row가 모두 legacy partition 범위에 들어간다는 CHECK 제약 (ATTACH할 때 테이블을 다시 훑지 않도록)
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {quote_name(f"{table}_id_created_at_key")} '
+            f'ON {quote_name(table)} (id, created_at)'
+        )
+
+        for index, columns in replacement_indexes:
+            cursor.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote_name(index)} '
+                f'ON {quote_name(table)} ({", ".join(quote_name(column) for column in columns)})'
+            )
+
+        check = quote_name(f'{table}_legacy_created_at_check')
+        cursor.execute(
+            f'ALTER TABLE {quote_name(table)} ADD CONSTRAINT {check} CHECK (created_at < %s) NOT VALID',
+            [legacy_until],
+        )
+        # VALIDATE는 쓰기를 막지 않는 lock만 잡는다.
+        cursor.execute(f'ALTER TABLE {quote_name(table)} VALIDATE CONSTRAINT {check}')
+
+
+def convert_to_partitioned_table(table, legacy_until, months_ahead):
+    """
+    prepare_partitioning을 한 테이블을 created_at 기준 월별 partition 테이블로 바꿉니다.
+    기존 테이블은 legacy partition(~ legacy_until)으로 붙이고 이후는 월별 partition과 DEFAULT partition에 쌓입니다.
+    기존 데이터를 옮기거나 다시 훑지 않기 때문에 metadata만 바뀌지만 ACCESS EXCLUSIVE lock을 잡으므로
+    transaction.atomic() 안에서 짧게 호출해야 합니다.
+
+    partition 테이블에는 partition key가 빠진 unique 제약과 이 테이블을 참조하는 foreign key를 둘 수 없어서 지웁니다.
+    """
+    legacy = get_legacy_partition_name(table)
+
+    with connection.cursor() as cursor:
+        cursor.execute(SELECT_REFERENCING_FOREIGN_KEYS_SQL, [quote_name(table)])
+        for referencing_table, constraint in cursor.fetchall():
+            cursor.execute(f'ALTER TABLE {referencing_table} DROP CONSTRAINT {quote_name(constraint)}')
+
+        cursor.execute(SELECT_UNIQUE_CONSTRAINTS_SQL, [quote_name(table)])
+        for constraint, in cursor.fetchall():
+            cursor.execute(f'ALTER TABLE {quote_name(table)} DROP CONSTRAINT {quote_name(constraint)}')
+
+        cursor.execute(SELECT_PLAIN_INDEXES_SQL, [quote_name(table)])
+        indexes = [
+            (index, definition) for index, definition in cursor.fetchall()
+            if index != f'{table}_id_created_at_key'
+        ]
+        cursor.execute(SELECT_FOREIGN_KEYS_SQL, [quote_name(table)])
+        foreign_keys = cursor.fetchall()
+        cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [quote_name(table), 'id'])
+        sequence, = cursor.fetchone()
+
+        cursor.execute(f'ALTER TABLE {quote_name(table)} RENAME TO {quote_name(legacy)}')
+        cursor.execute(
+            f'ALTER TABLE {quote_name(legacy)} '
+            f'DROP CONSTRAINT {quote_name(f"{table}_pkey")}, '
+            f'ADD CONSTRAINT {quote_name(f"{legacy}_pkey")} PRIMARY KEY USING INDEX {quote_name(f"{table}_id_created_at_key")}'
+        )
+        # 부모 테이블이 원래 index 이름을 그대로 사용할 수 있도록 legacy partition의 index 이름을 바꾼다.
+        for index, _ in indexes:
+            cursor.execute(f'ALTER INDEX {quote_name(index)} RENAME TO {quote_name(f"{index[:55]}_legacy")}')
+
+        # PositiveIntegerField의 >= 0 같은 CHECK 제약도 부모 테이블로 옮겨야 새 partition에 만들어진다.
+        # legacy partition 범위를 확인하려고 만든 CHECK 제약은 부모 테이블에서는 지운다.
+        cursor.execute(
+            f'CREATE TABLE {quote_name(table)} (LIKE {quote_name(legacy)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE (created_at)'
+        )
+        cursor.execute(
+            f'ALTER TABLE {quote_name(table)} DROP CONSTRAINT {quote_name(f"{table}_legacy_created_at_check")}'
+        )
+        cursor.execute(f'ALTER TABLE {quote_name(table)} ADD CONSTRAINT {quote_name(f"{table}_pkey")} PRIMARY KEY (id, created_at)')
+        cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {quote_name(table)}.id')
+
+        # 같은 정의의 index가 이미 있는 legacy partition은 index를 새로 만들지 않고 붙이기만 한다.
+        for _, definition in indexes:
+            cursor.execute(definition)
+
+        cursor.execute(
+            f'ALTER TABLE {quote_name(table)} ATTACH PARTITION {quote_name(legacy)} FOR VALUES FROM (MINVALUE) TO (%s)',
+            [legacy_until],
+        )
+        cursor.execute(
+            f'ALTER TABLE {quote_name(legacy)} DROP CONSTRAINT {quote_name(f"{table}_legacy_created_at_check")}'
+        )
+        # legacy partition에 같은 foreign key가 있으면 다시 검사하지 않고 그대로 붙는다.
+        for constraint, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {quote_name(table)} ADD CONSTRAINT {quote_name(constraint)} {definition}')
+        cursor.execute(CREATE_DEFAULT_PARTITION_SQL.format(
+            partition=quote_name(f'{table}_default'), table=quote_name(table),
+        ))
+
+    create_monthly_partitions(table, months_ahead, start=timezone.localdate(legacy_until))
+
+
+def create_partitioned_index(table, index, columns):
+    """
+    PostgreSQL 11은 partition 테이블에 CREATE INDEX CONCURRENTLY를 할 수 없어서 부모 테이블에는 ON ONLY로 index만 만들고
+    partition마다 CONCURRENTLY로 만든 index를 붙입니다. 모든 partition의 index가 붙어야 부모 index가 유효해지고,
+    이후에 만드는 partition에는 index가 자동으로 만들어집니다. transaction 밖(autocommit)에서 호출해야 합니다.
+    """
+    column_names = ', '.join(quote_name(column) for column in columns)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {quote_name(index)} ON ONLY {quote_name(table)} ({column_names})')
+
+        for partition in get_partitions(table):
+            partition_index = f'{partition.name}_{"_".join(columns)}_idx'[:63]
+            cursor.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote_name(partition_index)} '
+                f'ON {quote_name(partition.name)} ({column_names})'
+            )
+            cursor.execute(f'ALTER INDEX {quote_name(index)} ATTACH PARTITION {quote_name(partition_index)}')
+
+
+def detach_partition(table, partition, lock_timeout_ms, concurrently=False):
+    """
+    partition을 떼어냅니다. 부모 테이블의 lock을 lock_timeout_ms 이상 기다리지 않고 OperationalError가 발생합니다.
+    concurrently는 PostgreSQL 14 이상에서만 사용할 수 있고 transaction 밖에서 호출해야 합니다.
+    """
+    sql = f'ALTER TABLE {quote_name(table)} DETACH PARTITION {quote_name(partition)}'
+
+    if not concurrently:
+        # 부모 테이블에 ACCESS EXCLUSIVE lock을 잡으므로 기다리는 동안 다른 쿼리가 뒤에 쌓이지 않게 한다.
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('SET LOCAL lock_timeout = %s', [f'{lock_timeout_ms}ms'])
+            cursor.execute(sql)
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute('SET lock_timeout = %s', [f'{lock_timeout_ms}ms'])
+        try:
+            cursor.execute(f'{sql} CONCURRENTLY')
+        finally:
+            cursor.execute('RESET lock_timeout')
+
+
+def drop_partition(partition):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE {quote_name(partition)}')
+
+
+def archive_partition(partition, schema):
+    """
+    떼어낸 partition을 archive schema로 옮깁니다. 데이터는 그대로 두고 테이블의 schema만 바뀝니다.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {quote_name(schema)}')
+        cursor.execute(f'ALTER TABLE {quote_name(partition)} SET SCHEMA {quote_name(schema)}')
@@ -1,6 +1,22 @@
+import datetime
+import threading
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Q
+from django.test import override_settings
+from django.utils import timezone
+from django_redis import get_redis_connection
 from rest_framework.test import APITestCase
 
+from common import uid
+from common.cache_keys import UID_WORKER_ID_LEASE_
+from common.pagination import KeysetPagination
+from common.uid import (
+    SnowflakeGenerator, format_uid, uid_to_datetime, lease_worker_id, get_uid_generator, reset_uid_generator,
+    MAX_WORKER_ID, UID_LENGTH,
+)
 from user.models import Provider
 
 User = get_user_model()
@@ -29,3 +45,90 @@ class ToyTestCase(APITestCase):
             user=user,
             provider_name=name,
         )
+
+
+class TestSnowflakeGenerator(ToyTestCase):
+    def test_여러_thread에서_동시에_생성해도_id가_중복되지_않고_thread마다_증가함(self):
+        generator = SnowflakeGenerator(worker_id=1)
+        results = [None] * 8
+
+        def generate(index):
+            results[index] = [generator.next_id() for _ in range(20000)]
+
+        threads = [threading.Thread(target=generate, args=(index,)) for index in range(len(results))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        uids = [uid for result in results for uid in result]
+        self.assertEqual(len(set(uids)), len(uids))
+        for result in results:
+            self.assertEqual(result, sorted(result))
+
+    def test_같은_ms에_sequence를_다_쓰거나_시계가_뒤로_가도_id가_증가함(self):
+        generator = SnowflakeGenerator(worker_id=1)
+
+        with mock.patch('common.uid.time.time_ns', side_effect=[1600000000000 * 1000000] * 5000 + [1599999999000 * 1000000] * 10):
+            uids = [generator.next_id() for _ in range(5010)]
+
+        self.assertEqual(uids, sorted(set(uids)))
+
+    def test_다른_worker_id로_만든_id는_중복되지_않음(self):
+        with mock.patch('common.uid.time.time_ns', return_value=1600000000000 * 1000000):
+            uids = SnowflakeGenerator(worker_id=1).next_ids(100) + SnowflakeGenerator(worker_id=2).next_ids(100)
+
+        self.assertEqual(len(set(uids)), len(uids))
+
+    def test_문자열_uid는_19자리로_고정되어_문자열_순서와_생성_순서가_같음(self):
+        generator = SnowflakeGenerator(worker_id=MAX_WORKER_ID)
+        uids = [format_uid(uid) for uid in generator.next_ids(1000)]
+
+        self.assertTrue(all(len(uid) == UID_LENGTH for uid in uids))
+        self.assertEqual(uids, sorted(uids))
+        self.assertLess(abs(uid_to_datetime(uids[0]) - timezone.now()), datetime.timedelta(seconds=5))
+
+
+class TestWorkerIdLease(ToyTestCase):
+    def test_worker_id는_겹치지_않게_lease되고_release하면_Redis에서_지워짐(self):
+        redis = get_redis_connection('default')
+        leases = [lease_worker_id() for _ in range(3)]
+
+        try:
+            self.assertEqual(len({lease.worker_id for lease in leases}), 3)
+            self.assertEqual(redis.exists(*[cache.make_key(UID_WORKER_ID_LEASE_(lease.worker_id)) for lease in leases]), 3)
+        finally:
+            for lease in leases:
+                lease.release()
+
+        self.assertEqual(redis.exists(*[cache.make_key(UID_WORKER_ID_LEASE_(lease.worker_id)) for lease in leases]), 0)
+
+    @override_settings(UID_WORKER_ID=None)
+    def test_lease를_잃으면_새_worker_id를_lease해서_uid를_만듦(self):
+        reset_uid_generator()
+        generator = get_uid_generator()
+        lost_lease = uid._lease
+
+        try:
+            cache.delete(UID_WORKER_ID_LEASE_(lost_lease.worker_id))
+
+            self.assertFalse(lost_lease.renew())
+            self.assertFalse(lost_lease.is_valid)
+            self.assertIsNot(get_uid_generator(), generator)
+            self.assertNotEqual(uid._lease.token, lost_lease.token)
+        finally:
+            uid._lease.release()
+            reset_uid_generator()
+
+class TestKeysetPagination(ToyTestCase):
+    def test_cursor_조건에_첫_정렬_필드의_범위_조건이_같이_걸림(self):
+        pagination = KeysetPagination()
+        created_at = timezone.now()
+
+        q = pagination.get_position_filter(['-created_at', '-id'], [created_at, 10])
+
+        self.assertEqual(q.children[0], ('created_at__lte', created_at))
+        self.assertEqual(
+            str(q.children[1]),
+            str(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=10)),
+        )
@@ -0,0 +1,203 @@
+import atexit
+import datetime
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from common.cache_keys import UID_WORKER_ID_SEQUENCE, UID_WORKER_ID_LEASE_
+
+EPOCH_MS = 1577836800000  # 2020-01-01T00:00:00Z
+WORKER_ID_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_ID_BITS) - 1
+SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+TIMESTAMP_SHIFT = WORKER_ID_BITS + SEQUENCE_BITS
+UID_LENGTH = 19
+
+# 내가 잡은 lease일 때만 연장하거나 지운다.
+RENEW_WORKER_ID_LEASE_SCRIPT = '''
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+'''
+RELEASE_WORKER_ID_LEASE_SCRIPT = '''
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+'''
+
+
+class SnowflakeGenerator:
+    """
+    (ms 단위 timestamp 41bit, worker id 10bit, sequence 12bit)로 만든 64bit 정수 id를 생성합니다.
+    worker마다 ms당 4096개까지 DB나 Redis 없이 만들 수 있고, 한 ms의 sequence를 다 쓰거나 시계가 뒤로 가면
+    기다리지 않고 마지막 timestamp를 이어서 사용하기 때문에 같은 worker 안에서는 항상 증가합니다.
+    """
+
+    def __init__(self, worker_id):
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ImproperlyConfigured(f'worker id는 0 ~ {MAX_WORKER_ID} 사이여야 합니다: {worker_id}')
+
+        self.worker_id = worker_id
+        self.last_timestamp = -1
+        self.sequence = 0
+        self.lock = threading.Lock()
+
+    def next_id(self):
+        with self.lock:
+            return self._next_id()
+
+    def next_ids(self, count):
+        with self.lock:
+            return [self._next_id() for _ in range(count)]
+
+    def _next_id(self):
+        timestamp = time.time_ns() // 1000000
+
+        if timestamp <= self.last_timestamp:
+            timestamp = self.last_timestamp
+            self.sequence = (self.sequence + 1) & SEQUENCE_MASK
+            if self.sequence == 0:
+                timestamp += 1
+        else:
+            self.sequence = 0
+
+        self.last_timestamp = timestamp
+        return ((timestamp - EPOCH_MS) << TIMESTAMP_SHIFT) | (self.worker_id << SEQUENCE_BITS) | self.sequence
+
+
+def format_uid(uid):
+    # 자리수를 고정해야 문자열로 정렬해도 생성 순서와 같다.
+    return f'{uid:0{UID_LENGTH}d}'
+
+
+def uid_to_datetime(uid):
+    timestamp = (int(uid) >> TIMESTAMP_SHIFT) + EPOCH_MS
+    return datetime.datetime.fromtimestamp(timestamp / 1000, tz=datetime.timezone.utc)
+
+
+class WorkerIdLease:
+    """
+    Redis에 SET NX로 잡은 worker id입니다. heartbeat thread가 UID_WORKER_ID_LEASE_TIMEOUT이 지나기 전에 계속 연장하고
+    프로세스가 끝나면 놓아줍니다. 연장하지 못한 채로 timeout이 지나면 다른 프로세스가 같은 id를 잡을 수 있으므로
+    is_valid가 False가 되고 더 이상 이 id로 uid를 만들지 않습니다.
+    """
+
+    def __init__(self, worker_id, token):
+        self.worker_id = worker_id
+        self.token = token
+        self.key = cache.make_key(UID_WORKER_ID_LEASE_(worker_id))
+        self.valid_until = time.monotonic() + settings.UID_WORKER_ID_LEASE_TIMEOUT
+        self.stopped = threading.Event()
+
+    @property
+    def is_valid(self):
+        return not self.stopped.is_set() and time.monotonic() < self.valid_until
+
+    def renew(self):
+        renewed_at = time.monotonic()
+        timeout = settings.UID_WORKER_ID_LEASE_TIMEOUT
+
+        if get_redis_connection('default').eval(RENEW_WORKER_ID_LEASE_SCRIPT, 1, self.key, self.token, timeout * 1000):
+            self.valid_until = renewed_at + timeout
+            return True
+
+        # Redis에서 lease가 사라졌거나 다른 프로세스가 가져갔다.
+        self.stopped.set()
+        return False
+
+    def heartbeat(self):
+        while not self.stopped.wait(settings.UID_WORKER_ID_LEASE_TIMEOUT / 3):
+            try:
+                self.renew()
+            except RedisError:
+                # 잠깐 연결이 끊긴 경우에는 valid_until이 지나기 전까지 다시 시도한다.
+                continue
+
+    def release(self):
+        if self.stopped.is_set():
+            return
+
+        self.stopped.set()
+        try:
+            get_redis_connection('default').eval(RELEASE_WORKER_ID_LEASE_SCRIPT, 1, self.key, self.token)
+        except RedisError:
+            # 놓아주지 못해도 timeout이 지나면 다른 프로세스가 사용할 수 있다.
+            pass
+
+
+def lease_worker_id():
+    """
+    아무도 사용하지 않는 worker id를 Redis에서 SET NX + TTL로 잡고 heartbeat을 시작합니다.
+    프로세스가 끝나거나 멈춰서 연장되지 않은 id는 다시 사용되기 때문에 프로세스가 계속 새로 떠도 id가 모자라지 않습니다.
+    """
+    redis = get_redis_connection('default')
+    token = uuid.uuid4().hex
+    timeout_ms = settings.UID_WORKER_ID_LEASE_TIMEOUT * 1000
+    # 매번 0번부터 찾지 않도록 시작 위치만 sequence로 돌린다.
+    start = redis.incr(cache.make_key(UID_WORKER_ID_SEQUENCE))
+
+    for offset in range(MAX_WORKER_ID + 1):
+        worker_id = (start + offset) & MAX_WORKER_ID
+
+        if redis.set(cache.make_key(UID_WORKER_ID_LEASE_(worker_id)), token, nx=True, px=timeout_ms):
+            lease = WorkerIdLease(worker_id, token)
+            threading.Thread(target=lease.heartbeat, daemon=True).start()
+            atexit.register(lease.release)
+            return lease
+
+    raise ImproperlyConfigured(f'사용할 수 있는 worker id가 없습니다. {MAX_WORKER_ID + 1}개가 모두 사용중입니다.')
+
+
+_generator = None
+_lease = None
+_generator_lock = threading.Lock()
+
+
+def is_generator_usable():
+    return _generator is not None and (_lease is None or _lease.is_valid)
+
+
+def get_uid_generator():
+    """
+    UID_WORKER_ID가 설정되어 있으면 그 값을, 아니면 Redis에서 lease 받은 worker id를 사용합니다.
+    lease를 잃으면 새 worker id를 다시 받습니다.
+    """
+    global _generator, _lease
+
+    if not is_generator_usable():
+        with _generator_lock:
+            if not is_generator_usable():
+                if settings.UID_WORKER_ID is not None:
+                    _lease, worker_id = None, int(settings.UID_WORKER_ID)
+                else:
+                    _lease = lease_worker_id()
+                    worker_id = _lease.worker_id
+                _generator = SnowflakeGenerator(worker_id)
+
+    return _generator
+
+
+def reset_uid_generator():
+    global _generator, _lease, _generator_lock
+    _generator = None
+    _lease = None
+    _generator_lock = threading.Lock()
+
+
+# fork된 프로세스가 부모와 같은 worker id로 id를 만들지 않도록 새로 받게 한다.
+# 부모의 heartbeat thread는 자식에 복사되지 않으므로 부모의 lease는 부모가 계속 연장한다.
+os.register_at_fork(after_in_child=reset_uid_generator)
+
+
+def generate_uid():
+    return format_uid(get_uid_generator().next_id())
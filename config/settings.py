@@ -36,6 +36,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework',
 
@@ -163,3 +164,67 @@ SIMPLE_JWT = {
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
 }
+
+# Product
+PRODUCT_LIST_CACHE_TIMEOUT = 60 * 5
+PRODUCT_LIST_FROM_PRODUCT_CARD = False
+# Redis의 재고로 장바구니, 주문을 먼저 검증할지 여부. 캐시된 응답의 재고는 항상 Redis의 재고로 채운다.
+PRODUCT_STOCK_MIRROR_ENABLED = False
+PRODUCT_STOCK_MIRROR_TIMEOUT = 60 * 60
+
+# Order
+CART_BACKEND = os.getenv('CART_BACKEND', 'db')  # db | redis
+CART_UPSERT_ENABLED = False
+CART_ID_BLOCK_SIZE = 100
+CART_PRODUCT_OPTION_CACHE_TIMEOUT = 60 * 10
+CART_SUMMARY_CACHE_TIMEOUT = 60 * 10
+ORDER_CHECKOUT_MODE = os.getenv('ORDER_CHECKOUT_MODE', 'sync')  # sync | async
+ORDER_CHECKOUT_BATCH_SIZE = 100
+ORDER_CHECKOUT_STATUS_TIMEOUT = 60 * 60 * 24
+ORDER_CHECKOUT_PROCESSING_TIMEOUT = 60 * 5
+ORDER_CHECKOUT_MAX_ATTEMPTS = 3
+ORDER_REFUND_BATCH_SIZE = 1000
+ORDER_PARTITION_MONTHS_AHEAD = 3
+ORDER_PARTITION_PRUNING_SLACK_SECONDS = 60 * 60 * 24
+ORDER_PAYMENT_EXPIRE_SECONDS = 60 * 30
+ORDER_EXPIRY_LOOKBACK_SECONDS = 60 * 60 * 24 * 7
+ORDER_EXPIRY_BATCH_SIZE = 500
+ORDER_EXPIRY_LOCK_TIMEOUT_MS = 1000
+PAYMENT_RECONCILE_BATCH_SIZE = 100
+SALES_ROLLUP_LAG_SECONDS = 60 * 5
+# watermark보다 이만큼 앞에서부터 다시 훑어서 lag보다 늦게 commit된 주문 상품도 반영한다.
+SALES_ROLLUP_RESCAN_SECONDS = 60 * 30
+SALES_ROLLUP_MAX_DAYS = 93
+SALES_ROLLUP_MAX_HOURLY_DAYS = 7
+SETTLEMENT_EXPORT_CHUNK_SIZE = 2000
+SETTLEMENT_EXPORT_FLUSH_BYTES = 64 * 1024
+# 정산 파일 cursor의 planner 설정. 작을수록 전체 시간보다 첫 row까지의 시간이 짧은 (order_id index를 따라가는) plan을 고른다.
+SETTLEMENT_EXPORT_CURSOR_TUPLE_FRACTION = 0.01
+
+# Payment
+# 결제 수단별 결제사 설정. 실제 결제사를 붙이기 전까지는 로컬 가짜 결제사를 사용한다.
+PAYMENT_GATEWAYS = {
+    pay_method: {
+        'BACKEND': 'order.payments.gateways.FakePaymentGateway',
+        'OPTIONS': {
+            'latency': 0,
+            'failure_rate': 0,
+            'decline_rate': 0,
+            'pool_size': 20,
+        },
+        'TIMEOUT': 3,
+        'MAX_CONCURRENCY': 20,
+        'FAILURE_THRESHOLD': 5,
+        'RECOVERY_TIMEOUT': 30,
+    } for pay_method in ('CARD', 'KAKAO')
+}
+
+# UID
+UID_WORKER_ID = os.getenv('UID_WORKER_ID')  # 없으면 프로세스마다 Redis에서 lease 받음
+UID_WORKER_ID_LEASE_TIMEOUT = 30
+
+# Idempotency-Key
+IDEMPOTENCY_KEY_TIMEOUT = 60 * 60 * 24
+IDEMPOTENCY_LOCK_TIMEOUT = 30
+IDEMPOTENCY_WAIT_TIMEOUT = 10
+IDEMPOTENCY_POLL_INTERVAL = 0.05
@@ -16,7 +16,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
-from order.views import MeCartListCreateAPIView, MeOrderCreateAPIView
+from order.views import (
+    MeCartListCreateAPIView, MeCartBulkCreateAPIView, MeCartSummaryAPIView,
+    MeOrderListCreateAPIView, MeOrderRetrieveAPIView, MeOrderCheckoutStatusAPIView, OrderProductRefundAPIView,
+    SalesDailyRollupAPIView, SalesHourlyRollupAPIView, SettlementExportAPIView,
+)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -25,5 +29,17 @@ urlpatterns = [
     path('products', include('product.urls')),
 
     path('users/me/carts', MeCartListCreateAPIView.as_view(), name='me-cart-list-create'),
-    path('users/me/orders', MeOrderCreateAPIView.as_view(), name='me-order-create'),
+    path('users/me/carts/summary', MeCartSummaryAPIView.as_view(), name='me-cart-summary'),
+    path('users/me/carts/bulk', MeCartBulkCreateAPIView.as_view(), name='me-cart-bulk-create'),
+    path('users/me/orders', MeOrderListCreateAPIView.as_view(), name='me-order-list-create'),
+    path('users/me/orders/<str:order_uid>', MeOrderRetrieveAPIView.as_view(), name='me-order-retrieve'),
+    path(
+        'users/me/orders/<str:order_uid>/status',
+        MeOrderCheckoutStatusAPIView.as_view(),
+        name='me-order-checkout-status',
+    ),
+    path('order-products/refunds', OrderProductRefundAPIView.as_view(), name='order-product-refund'),
+    path('sales/daily', SalesDailyRollupAPIView.as_view(), name='sales-daily'),
+    path('sales/hourly', SalesHourlyRollupAPIView.as_view(), name='sales-hourly'),
+    path('settlements/export', SettlementExportAPIView.as_view(), name='settlement-export'),
 ]
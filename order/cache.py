@@ -0,0 +1,31 @@
+import time
+
+from django.core.cache import cache
+
+from order.cache_keys import CART_VERSION_USER_, CART_UPDATED_AT_USER_
+
+
+def get_cart_version_state(user_id):
+    """
+    사용자 장바구니의 (version, 마지막으로 삭제된 시각의 unix timestamp)를 한번의 round trip으로 가져옵니다.
+    장바구니가 삭제되면 남은 row들의 updated_at으로는 알 수 없어서 따로 version을 올립니다.
+    """
+    version_key, updated_at_key = CART_VERSION_USER_(user_id), CART_UPDATED_AT_USER_(user_id)
+    state = cache.get_many([version_key, updated_at_key])
+    cart_version = state.get(version_key)
+
+    if cart_version is None:
+        # 키가 유실되어도 예전 버전 번호가 재사용되지 않도록 현재 시각으로 초기화한다.
+        cache.add(version_key, int(time.time() * 1000), timeout=None)
+        cart_version = cache.get(version_key)
+
+    return cart_version, state.get(updated_at_key)
+
+
+def bump_cart_version(user_id):
+    cache.set(CART_UPDATED_AT_USER_(user_id), int(time.time()), timeout=None)
+
+    try:
+        return cache.incr(CART_VERSION_USER_(user_id))
+    except ValueError:
+        return get_cart_version_state(user_id)[0]
@@ -1,2 +1,14 @@
 CART_CREATE_LOCK_USER_ = lambda user_id: f'CART_CREATE_LOCK_USER_{user_id}'
 ORDER_CREATE_LOCK_USER_ = lambda user_id: f'ORDER_CREATE_LOCK_USER_{user_id}'
+ORDER_CHECKOUT_QUEUE = 'ORDER_CHECKOUT_QUEUE'
+ORDER_CHECKOUT_PROCESSING = 'ORDER_CHECKOUT_PROCESSING'
+ORDER_CHECKOUT_PROCESSING_STARTED_AT = 'ORDER_CHECKOUT_PROCESSING_STARTED_AT'
+ORDER_CHECKOUT_ATTEMPTS = 'ORDER_CHECKOUT_ATTEMPTS'
+ORDER_CHECKOUT_STATUS_ = lambda order_uid: f'ORDER_CHECKOUT_STATUS_{order_uid}'
+CART_QUANTITIES_USER_ = lambda user_id: f'CART_QUANTITIES_USER_{user_id}'
+CART_IDS_USER_ = lambda user_id: f'CART_IDS_USER_{user_id}'
+CART_DIRTY_USERS = 'CART_DIRTY_USERS'
+CART_PRODUCT_OPTION_ = lambda catalog_version, product_option_id: f'CART_PRODUCT_OPTION_{catalog_version}_{product_option_id}'
+CART_SUMMARY_USER_ = lambda user_id: f'CART_SUMMARY_USER_{user_id}'
+CART_VERSION_USER_ = lambda user_id: f'CART_VERSION_USER_{user_id}'
+CART_UPDATED_AT_USER_ = lambda user_id: f'CART_UPDATED_AT_USER_{user_id}'
@@ -0,0 +1,341 @@
+import os
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django_redis import get_redis_connection
+from rest_framework.exceptions import ValidationError
+
+from common.fast_serializers import FastSerializer
+from order.cache_keys import CART_QUANTITIES_USER_, CART_IDS_USER_, CART_DIRTY_USERS, CART_PRODUCT_OPTION_
+from order.models import Cart
+from product.cache import get_catalog_version
+from product.models import ProductOption
+from product.serializers import ProductOptionWithProductSerializer
+from product.stock import apply_mirrored_stocks
+
+# DB에서 불러온 장바구니라는 표시를 장바구니 hash 안에 같이 둬서 hash가 evict되면 표시도 같이 사라지게 한다.
+CART_LOADED_FIELD = b'loaded'
+
+RESERVE_CART_IDS_SQL = "SELECT nextval(pg_get_serial_sequence('cart', 'id')) FROM generate_series(1, %s)"
+
+DELETE_REMOVED_CARTS_SQL = 'DELETE FROM cart WHERE user_id = %s AND NOT (id = ANY(%s::integer[]))'
+
+# 장바구니 id와 수량을 한번에 기록해서 sync_carts가 id만 있고 수량이 없는 장바구니를 읽지 않게 한다.
+# ARGV: 상품옵션 id, 수량, 재고, 합칠지 여부, 새 장바구니 id(없는 옵션일 때만 넘긴다), 사용자 id
+# 돌려주는 값: {장바구니 id, 기록된 수량}, 새 id가 필요하면 {0, 0}, 이미 있으면 {id, -1}, 재고가 부족하면 {id, -2}
+ADD_CART_SCRIPT = '''
+local cart_id = redis.call('hget', KEYS[1], ARGV[1])
+if not cart_id then
+    if ARGV[5] == '' then
+        return {0, 0}
+    end
+    redis.call('hset', KEYS[1], ARGV[1], ARGV[5])
+    redis.call('hset', KEYS[2], ARGV[1], ARGV[2])
+    redis.call('sadd', KEYS[3], ARGV[6])
+    return {tonumber(ARGV[5]), tonumber(ARGV[2])}
+end
+if ARGV[4] ~= '1' then
+    return {tonumber(cart_id), -1}
+end
+local quantity = tonumber(redis.call('hget', KEYS[2], ARGV[1]) or '0') + tonumber(ARGV[2])
+if quantity > tonumber(ARGV[3]) then
+    return {tonumber(cart_id), -2}
+end
+redis.call('hset', KEYS[2], ARGV[1], quantity)
+redis.call('sadd', KEYS[3], ARGV[6])
+return {tonumber(cart_id), quantity}
+'''
+
+UPSERT_CARTS_SQL = '''
+INSERT INTO cart (id, user_id, product_option_id, quantity, created_at, updated_at)
+SELECT carts.id, "user".id, carts.product_option_id, carts.quantity, now(), now()
+FROM unnest(%(cart_ids)s::integer[], %(product_option_ids)s::integer[], %(quantities)s::integer[])
+    AS carts (id, product_option_id, quantity)
+JOIN "user" ON "user".id = %(user_id)s
+JOIN product_option ON product_option.id = carts.product_option_id
+ON CONFLICT (id) DO UPDATE SET
+    quantity = EXCLUDED.quantity,
+    updated_at = EXCLUDED.updated_at
+WHERE cart.quantity <> EXCLUDED.quantity
+'''
+
+product_option_fast_serializer = FastSerializer(ProductOptionWithProductSerializer)
+
+
+def is_redis_cart_backend():
+    return settings.CART_BACKEND == 'redis'
+
+
+_reserved_cart_ids = []
+_reserved_cart_ids_lock = threading.Lock()
+
+
+def reset_reserved_cart_ids():
+    global _reserved_cart_ids, _reserved_cart_ids_lock
+    _reserved_cart_ids = []
+    _reserved_cart_ids_lock = threading.Lock()
+
+
+# fork된 프로세스가 부모가 받아둔 id를 같이 쓰지 않도록 비운다.
+os.register_at_fork(after_in_child=reset_reserved_cart_ids)
+
+
+def next_cart_ids(count):
+    """
+    cart 테이블의 sequence에서 CART_ID_BLOCK_SIZE개씩 id를 받아두고 나눠줍니다.
+    나중에 DB에 기록할 때 DB에서 만든 cart id와 겹치지 않습니다.
+    """
+    with _reserved_cart_ids_lock:
+        if len(_reserved_cart_ids) < count:
+            with connection.cursor() as cursor:
+                cursor.execute(RESERVE_CART_IDS_SQL, [max(count, settings.CART_ID_BLOCK_SIZE)])
+                _reserved_cart_ids.extend(cart_id for cart_id, in cursor.fetchall())
+
+        cart_ids = _reserved_cart_ids[:count]
+        del _reserved_cart_ids[:count]
+
+    return cart_ids
+
+
+def get_cart_keys(user_id):
+    return (
+        cache.make_key(CART_QUANTITIES_USER_(user_id)),
+        cache.make_key(CART_IDS_USER_(user_id)),
+    )
+
+
+def load_db_carts(redis, user_id):
+    """
+    cart 테이블의 장바구니를 같은 id로 Redis에 채웁니다. Redis에 이미 있는 상품옵션은 덮어쓰지 않습니다.
+    """
+    quantities_key, ids_key = get_cart_keys(user_id)
+
+    with redis.pipeline() as pipeline:
+        for cart_id, product_option_id, quantity in Cart.objects.filter(
+                user_id=user_id,
+        ).values_list(
+            'id', 'product_option_id', 'quantity',
+        ):
+            pipeline.hsetnx(ids_key, product_option_id, cart_id)
+            pipeline.hsetnx(quantities_key, product_option_id, quantity)
+        pipeline.hset(ids_key, CART_LOADED_FIELD, 1)
+        pipeline.hset(quantities_key, CART_LOADED_FIELD, 1)
+        pipeline.execute()
+
+
+def is_carts_loaded(redis, user_id):
+    quantities_key, ids_key = get_cart_keys(user_id)
+
+    with redis.pipeline(transaction=False) as pipeline:
+        pipeline.hexists(quantities_key, CART_LOADED_FIELD)
+        pipeline.hexists(ids_key, CART_LOADED_FIELD)
+        return all(pipeline.execute())
+
+
+def ensure_carts_loaded(redis, user_id):
+    """
+    처음 사용하거나 Redis에서 evict된 사용자의 장바구니는 cart 테이블에서 읽어서 같은 id로 Redis에 채웁니다.
+    """
+    if not is_carts_loaded(redis, user_id):
+        load_db_carts(redis, user_id)
+
+
+def save_db_cart(cart):
+    """
+    cart 테이블에서 직접 바뀐 장바구니를 이미 불러온 Redis 장바구니에도 반영합니다.
+    불러오지 않은 장바구니는 나중에 불러올 때 cart 테이블에서 읽기 때문에 반영하지 않습니다.
+    """
+    redis = get_redis_connection('default')
+
+    if not is_carts_loaded(redis, cart.user_id):
+        return
+
+    quantities_key, ids_key = get_cart_keys(cart.user_id)
+
+    with redis.pipeline() as pipeline:
+        pipeline.hset(ids_key, cart.product_option_id, cart.id)
+        pipeline.hset(quantities_key, cart.product_option_id, cart.quantity)
+        pipeline.execute()
+
+
+def delete_db_cart(cart):
+    """
+    cart 테이블에서 직접 삭제된 장바구니를 Redis 장바구니에서도 지워서 다음 기록 때 다시 추가되지 않게 합니다.
+    """
+    quantities_key, ids_key = get_cart_keys(cart.user_id)
+
+    with get_redis_connection('default').pipeline() as pipeline:
+        pipeline.hdel(ids_key, cart.product_option_id)
+        pipeline.hdel(quantities_key, cart.product_option_id)
+        pipeline.execute()
+
+
+def get_cart_state(user_id):
+    """
+    {product_option_id: (cart_id, quantity)}
+    """
+    redis = get_redis_connection('default')
+    quantities_key, ids_key = get_cart_keys(user_id)
+
+    for _ in range(2):
+        # 두 hash를 같은 시점에 읽어야 읽는 사이에 evict된 hash를 빈 장바구니로 착각하지 않는다.
+        with redis.pipeline() as pipeline:
+            pipeline.hgetall(quantities_key)
+            pipeline.hgetall(ids_key)
+            quantities, cart_ids = pipeline.execute()
+
+        if CART_LOADED_FIELD in quantities and CART_LOADED_FIELD in cart_ids:
+            break
+
+        load_db_carts(redis, user_id)
+
+    return {
+        int(product_option_id): (int(cart_ids[product_option_id]), int(quantity))
+        for product_option_id, quantity in quantities.items()
+        if product_option_id != CART_LOADED_FIELD and product_option_id in cart_ids
+    }
+
+
+def get_cart_product_options(product_option_ids):
+    """
+    장바구니에 보여줄 상품옵션(상품, 입점사 포함)을 catalog version별 캐시에서 가져오고, 없는 것만 한번의 쿼리로 채웁니다.
+    재고 미러를 사용하면 재고는 미러의 현재 값으로 바꿔서 돌려줍니다.
+    """
+    catalog_version = get_catalog_version()
+    product_option_id_by_key = {
+        CART_PRODUCT_OPTION_(catalog_version, product_option_id): product_option_id
+        for product_option_id in product_option_ids
+    }
+    product_options = {
+        product_option_id_by_key[key]: product_option
+        for key, product_option in cache.get_many(list(product_option_id_by_key)).items()
+    }
+    missing_product_option_ids = set(product_option_ids) - set(product_options)
+
+    if missing_product_option_ids:
+        loaded = {
+            product_option['id']: product_option
+            for product_option in product_option_fast_serializer.serialize(
+                product_option_fast_serializer.values_list(
+                    ProductOption.objects.filter(id__in=missing_product_option_ids)
+                )
+            )
+        }
+        cache.set_many(
+            {
+                CART_PRODUCT_OPTION_(catalog_version, product_option_id): product_option
+                for product_option_id, product_option in loaded.items()
+            },
+            timeout=settings.CART_PRODUCT_OPTION_CACHE_TIMEOUT,
+        )
+        product_options.update(loaded)
+
+    apply_mirrored_stocks(list(product_options.values()))
+
+    return product_options
+
+
+def get_carts(user):
+    """
+    MeCartSerializer와 같은 모양의 장바구니 목록을 최신순으로 돌려줍니다.
+    """
+    cart_state = get_cart_state(user.id)
+    product_options = get_cart_product_options(list(cart_state))
+
+    return [
+        {
+            'id': cart_id,
+            'user_id': user.id,
+            'quantity': quantity,
+            'product_option': product_options[product_option_id],
+        }
+        for product_option_id, (cart_id, quantity) in sorted(
+            cart_state.items(), key=lambda item: item[1][0], reverse=True,
+        )
+        # 그 사이에 삭제된 상품옵션은 보여주지 않는다.
+        if product_option_id in product_options
+    ]
+
+
+def add_cart(user, product_option_id, quantity, stock, merge=False):
+    """
+    장바구니에 상품옵션을 담습니다. 이미 있으면 merge=True일 때만 검증할 때 읽은 재고(stock) 안에서 수량을 합칩니다.
+    장바구니 id는 없는 상품옵션을 담을 때만 받고, id와 수량은 Lua script로 한번에 기록합니다.
+    """
+    redis = get_redis_connection('default')
+    ensure_carts_loaded(redis, user.id)
+    quantities_key, ids_key = get_cart_keys(user.id)
+    keys = [ids_key, quantities_key, cache.make_key(CART_DIRTY_USERS)]
+    args = [product_option_id, quantity, stock, int(merge), '', user.id]
+
+    cart_id, quantity = redis.eval(ADD_CART_SCRIPT, len(keys), *keys, *args)
+
+    if not cart_id:
+        args[4], = next_cart_ids(1)
+        cart_id, quantity = redis.eval(ADD_CART_SCRIPT, len(keys), *keys, *args)
+
+    if quantity == -1:
+        raise ValidationError({'non_field_errors': ['이미 장바구니에 있는 상품 옵션입니다.']})
+    if quantity == -2:
+        raise ValidationError({'non_field_errors': ['해당 옵션의 재고가 부족합니다.']})
+
+    return {
+        'id': cart_id,
+        'user_id': user.id,
+        'quantity': quantity,
+        'product_option': get_cart_product_options([product_option_id])[product_option_id],
+    }
+
+
+def set_cart_quantities(user, quantity_by_option_id):
+    """
+    장바구니에 없는 상품옵션은 추가하고 있는 상품옵션은 수량을 바꿉니다.
+    """
+    redis = get_redis_connection('default')
+    ensure_carts_loaded(redis, user.id)
+    quantities_key, ids_key = get_cart_keys(user.id)
+    product_option_ids = list(quantity_by_option_id)
+    existing_cart_ids = redis.hmget(ids_key, product_option_ids)
+    new_product_option_ids = [
+        product_option_id
+        for product_option_id, cart_id in zip(product_option_ids, existing_cart_ids)
+        if cart_id is None
+    ]
+
+    with redis.pipeline() as pipeline:
+        for product_option_id, cart_id in zip(new_product_option_ids, next_cart_ids(len(new_product_option_ids))):
+            pipeline.hsetnx(ids_key, product_option_id, cart_id)
+        pipeline.hset(quantities_key, mapping=quantity_by_option_id)
+        pipeline.sadd(cache.make_key(CART_DIRTY_USERS), user.id)
+        pipeline.execute()
+
+
+def pop_dirty_user_ids(count):
+    return [int(user_id) for user_id in get_redis_connection('default').spop(cache.make_key(CART_DIRTY_USERS), count)]
+
+
+def mark_dirty_user_ids(user_ids):
+    get_redis_connection('default').sadd(cache.make_key(CART_DIRTY_USERS), *user_ids)
+
+
+def sync_carts(user_ids):
+    """
+    Redis의 장바구니를 cart 테이블에 그대로 기록합니다. Redis에 없는 장바구니는 삭제됩니다.
+    장바구니 hash가 evict되었으면 get_cart_state가 cart 테이블에서 다시 불러오기 때문에 저장된 장바구니가 지워지지 않습니다.
+    """
+    for user_id in user_ids:
+        cart_state = get_cart_state(user_id)
+        product_option_ids = list(cart_state)
+        cart_ids = [cart_state[product_option_id][0] for product_option_id in product_option_ids]
+        quantities = [cart_state[product_option_id][1] for product_option_id in product_option_ids]
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(DELETE_REMOVED_CARTS_SQL, [user_id, cart_ids])
+            cursor.execute(UPSERT_CARTS_SQL, {
+                'user_id': user_id,
+                'cart_ids': cart_ids,
+                'product_option_ids': product_option_ids,
+                'quantities': quantities,
+            })
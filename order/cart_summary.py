@@ -0,0 +1,110 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from order.cache_keys import CART_SUMMARY_USER_
+from order.cart_store import is_redis_cart_backend, get_cart_state, get_cart_product_options
+from order.models import Cart
+from order.pricing import quote_carts
+from product.cache import get_catalog_version
+from product.models import Product, ProductOption
+from user.models import Provider
+
+
+def load_redis_carts(user):
+    """
+    Redis 장바구니와 캐싱된 상품옵션으로 quote_carts에 넘길 수 있는 (저장되지 않은) Cart 객체들을 만듭니다.
+    """
+    cart_state = get_cart_state(user.id)
+    product_options = get_cart_product_options(list(cart_state))
+    carts = []
+
+    for product_option_id, (cart_id, quantity) in sorted(cart_state.items(), key=lambda item: item[1][0]):
+        if product_option_id not in product_options:
+            continue
+
+        product_option = product_options[product_option_id]
+        product = product_option['product']
+        provider = Provider(id=product['provider']['id'], provider_name=product['provider']['provider_name'])
+        carts.append(Cart(
+            id=cart_id,
+            user=user,
+            quantity=quantity,
+            product_option=ProductOption(
+                id=product_option_id,
+                name=product_option['name'],
+                stock=product_option['stock'],
+                product=Product(
+                    id=product['id'],
+                    name=product['name'],
+                    price=product['price'],
+                    shipping_price=product['shipping_price'],
+                    is_on_sale=product['is_on_sale'],
+                    can_bundle=product['can_bundle'],
+                    provider=provider,
+                ),
+            ),
+        ))
+
+    return carts
+
+
+def summarize_carts(carts):
+    quote = quote_carts(carts)
+    provider_name_by_id = {
+        cart.product_option.product.provider_id: cart.product_option.product.provider.provider_name
+        for cart in carts
+    }
+
+    return {
+        'cart_count': len(carts),
+        'products_price': quote.products_price,
+        'shipping_price': quote.shipping_price,
+        'total_price': quote.pay_price,
+        'providers': [
+            {
+                'provider_id': provider.provider_id,
+                'provider_name': provider_name_by_id[provider.provider_id],
+                'products_price': provider.products_price,
+                'shipping_price': provider.shipping_price,
+            } for provider in sorted(quote.providers, key=lambda provider: provider.provider_id)
+        ],
+    }
+
+
+def get_cart_summary(user):
+    """
+    주문할 때와 같은 규칙으로 계산한 장바구니 전체의 상품 금액, 입점사별 배송비, 결제 금액입니다.
+    사용자의 장바구니가 바뀌거나 catalog version이 올라가기 전까지는 캐시된 값을 돌려줍니다.
+    """
+    if is_redis_cart_backend():
+        # Redis 장바구니는 상품옵션까지 캐시에서 읽기 때문에 따로 캐싱하지 않는다.
+        return summarize_carts(load_redis_carts(user))
+
+    catalog_version = get_catalog_version()
+    cached = cache.get(CART_SUMMARY_USER_(user.id))
+
+    if cached is not None and cached['catalog_version'] == catalog_version:
+        return cached['summary']
+
+    summary = summarize_carts(list(Cart.objects.filter(
+        user=user,
+    ).select_related(
+        'product_option__product__provider',
+    ).order_by(
+        'id',
+    )))
+    cache.set(
+        CART_SUMMARY_USER_(user.id),
+        {'catalog_version': catalog_version, 'summary': summary},
+        timeout=settings.CART_SUMMARY_CACHE_TIMEOUT,
+    )
+    return summary
+
+
+def invalidate_cart_summaries(user_ids):
+    keys = [CART_SUMMARY_USER_(user_id) for user_id in set(user_ids)]
+
+    # 커밋 전에 다른 요청이 이전 장바구니로 다시 캐싱하지 않도록 커밋 이후에도 한번 더 지운다.
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
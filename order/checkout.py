@@ -0,0 +1,343 @@
+import json
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction, IntegrityError
+from django_redis import get_redis_connection
+from model_utils import Choices
+from rest_framework.exceptions import ValidationError
+
+from common.uid import generate_uid
+from order.cache_keys import (
+    ORDER_CHECKOUT_QUEUE, ORDER_CHECKOUT_STATUS_, ORDER_CHECKOUT_PROCESSING, ORDER_CHECKOUT_PROCESSING_STARTED_AT,
+    ORDER_CHECKOUT_ATTEMPTS,
+)
+from order.models import Cart, Order, OrderProduct, OrderUid, Payment
+from order.partitions import filter_by_order_uids
+from order.payments.authorization import authorize_orders
+from order.pricing import quote_carts
+from product.stock import reserve_stocks
+
+User = get_user_model()
+
+CHECKOUT_STATUS_CHOICE = Choices('PENDING', 'CREATED', 'FAILED')
+
+
+def is_async_checkout_enabled():
+    return settings.ORDER_CHECKOUT_MODE == 'async'
+
+
+def load_carts(user, cart_ids):
+    return list(Cart.objects.filter(
+        user=user,
+        id__in=cart_ids,
+    ).select_related(
+        'product_option__product__provider',
+    ).order_by(
+        'id',
+    ))
+
+
+def create_order_uid():
+    return generate_uid()
+
+
+def reserve_cart_stocks(carts):
+    quantity_by_option_id = {}
+    for cart in carts:
+        quantity_by_option_id[cart.product_option_id] = (
+            quantity_by_option_id.get(cart.product_option_id, 0) + cart.quantity
+        )
+
+    stock_by_option_id = reserve_stocks(quantity_by_option_id)
+
+    no_stock_option_list = [
+        f'{cart.product_option.product.name}/{cart.product_option.name}'
+        for cart in carts if cart.product_option_id not in stock_by_option_id
+    ]
+    if no_stock_option_list:
+        raise ValidationError({
+            'non_field_errors': [', '.join(no_stock_option_list) + ' 의 재고가 부족합니다'],
+        })
+
+    for cart in carts:
+        cart.product_option.stock = stock_by_option_id[cart.product_option_id]
+
+
+def place_order(user, carts, order_uid, shipping_address, shipping_request_note, pay_method):
+    """
+    select_related('product_option__product')로 불러온 장바구니들로 주문, 상품별 주문, 결제 정보를 만들고 재고를 차감합니다.
+    재고가 부족하면 ValidationError가 발생하고 만들어진 데이터는 모두 rollback 됩니다.
+    같은 order_uid의 주문이 이미 있으면 IntegrityError가 발생합니다.
+    """
+    quote = quote_carts(carts)
+
+    with transaction.atomic():
+        order = Order.objects.create(
+            user=user,
+            order_uid=order_uid,
+            shipping_price=quote.shipping_price,
+            shipping_address=shipping_address,
+            shipping_request_note=shipping_request_note,
+            is_paid=False,
+        )
+        # 같은 order_uid로 동시에 만들면 나중에 넣는 쪽이 먼저 넣은 transaction이 끝날 때까지 기다린 뒤 IntegrityError가 발생한다.
+        OrderUid.objects.create(order_uid=order_uid, order=order, created_at=order.created_at)
+
+        order_products = [
+            OrderProduct(
+                user=user,
+                cart=line.cart,
+                product_option=line.cart.product_option,
+                order=order,
+                product_price=line.product_price,
+                ordered_quantity=line.quantity,
+                ordered_price=line.ordered_price,
+                shipping_price=line.shipping_price,
+                status=OrderProduct.STATUS_CHOICE.PENDING,
+            ) for line in quote.lines
+        ]
+        OrderProduct.objects.bulk_create(order_products)
+
+        Payment.objects.create(
+            order=order,
+            pay_price=quote.pay_price,
+            pay_method=getattr(Payment.PAY_METHOD_CHOICE, pay_method)
+        )
+
+        # 재고 row lock을 가장 짧게 잡도록 commit 직전에 차감한다.
+        reserve_cart_stocks(carts)
+
+    # 응답을 직렬화할 때 주문 상품들을 다시 조회하지 않도록 만들어둔 객체를 그대로 사용한다.
+    order._prefetched_objects_cache = {'order_products': order_products}
+    return order
+
+
+def set_checkout_status(order_uid, user_id, status, order_id=None, errors=None):
+    cache.set(
+        ORDER_CHECKOUT_STATUS_(order_uid),
+        {'user_id': user_id, 'status': status, 'order_id': order_id, 'errors': errors},
+        timeout=settings.ORDER_CHECKOUT_STATUS_TIMEOUT,
+    )
+
+
+def get_checkout_status(user, order_uid):
+    checkout_status = cache.get(ORDER_CHECKOUT_STATUS_(order_uid))
+
+    if checkout_status is None:
+        order_id = filter_by_order_uids(
+            Order.objects.filter(user=user), [order_uid],
+        ).values_list('id', flat=True).first()
+        if order_id is None:
+            return None
+        return {'status': CHECKOUT_STATUS_CHOICE.CREATED, 'order_id': order_id, 'errors': None}
+
+    if checkout_status['user_id'] != user.id:
+        return None
+
+    return checkout_status
+
+
+def enqueue_checkout(user, validated_data):
+    order_uid = create_order_uid()
+    intent = {
+        'order_uid': order_uid,
+        'user_id': user.id,
+        'cart_ids': [cart.id for cart in validated_data['carts']],
+        'shipping_address': validated_data['shipping_address'],
+        'shipping_request_note': validated_data.get('shipping_request_note'),
+        'pay_method': validated_data['pay_method'],
+    }
+
+    set_checkout_status(order_uid, user.id, CHECKOUT_STATUS_CHOICE.PENDING)
+    get_redis_connection('default').lpush(cache.make_key(ORDER_CHECKOUT_QUEUE), json.dumps(intent))
+    return order_uid
+
+
+def get_checkout_queue_keys():
+    return (
+        cache.make_key(ORDER_CHECKOUT_QUEUE),
+        cache.make_key(ORDER_CHECKOUT_PROCESSING),
+        cache.make_key(ORDER_CHECKOUT_PROCESSING_STARTED_AT),
+        cache.make_key(ORDER_CHECKOUT_ATTEMPTS),
+    )
+
+
+def pop_checkout_intents(batch_size, timeout):
+    """
+    큐에서 가장 오래된 주문 요청을 최대 batch_size개 처리중 리스트로 옮기고 꺼낸 그대로(JSON)를 돌려줍니다.
+    큐가 비어있으면 timeout초 동안 기다리고, timeout이 0이면 기다리지 않습니다.
+    꺼낸 요청은 ack_checkout_intent를 호출하기 전까지 처리중 리스트에 남아있어서 worker가 죽어도 잃어버리지 않습니다.
+    """
+    redis = get_redis_connection('default')
+    queue_key, processing_key, started_at_key, _ = get_checkout_queue_keys()
+
+    if timeout:
+        item = redis.brpoplpush(queue_key, processing_key, timeout=timeout)
+    else:
+        item = redis.rpoplpush(queue_key, processing_key)
+
+    if item is None:
+        return []
+
+    items = [item]
+
+    if batch_size > 1:
+        with redis.pipeline() as pipeline:
+            for _ in range(batch_size - 1):
+                pipeline.rpoplpush(queue_key, processing_key)
+            items.extend(item for item in pipeline.execute() if item is not None)
+
+    redis.hset(started_at_key, mapping=dict.fromkeys(items, time.time()))
+    return items
+
+
+def ack_checkout_intent(item):
+    """
+    처리가 끝난(주문이 commit 됐거나 실패 상태를 기록한) 주문 요청을 처리중 리스트에서 지웁니다.
+    """
+    redis = get_redis_connection('default')
+    _, processing_key, started_at_key, attempts_key = get_checkout_queue_keys()
+
+    with redis.pipeline() as pipeline:
+        pipeline.lrem(processing_key, 1, item)
+        pipeline.hdel(started_at_key, item)
+        pipeline.hdel(attempts_key, item)
+        pipeline.execute()
+
+
+def requeue_stale_checkout_intents(stale_seconds):
+    """
+    처리중 리스트로 옮긴 뒤 stale_seconds초가 지나도록 ack되지 않은 주문 요청(worker가 죽었거나 예외가 발생한 요청)을
+    큐에 다시 넣고 다시 넣은 수를 돌려줍니다. 같은 order_uid의 주문은 다시 만들지 않기 때문에 여러 번 처리되어도 안전합니다.
+    ORDER_CHECKOUT_MAX_ATTEMPTS번 처리하지 못한 요청은 주문이 만들어져 있으면 CREATED로, 아니면 FAILED로 기록하고 버립니다.
+    """
+    redis = get_redis_connection('default')
+    queue_key, processing_key, started_at_key, attempts_key = get_checkout_queue_keys()
+    items = redis.lrange(processing_key, 0, -1)
+
+    if not items:
+        return 0
+
+    now = time.time()
+    requeued_count = 0
+
+    for item, started_at in zip(items, redis.hmget(started_at_key, items)):
+        if started_at is None:
+            # 옮긴 직후 시작 시각을 기록하기 전에 worker가 죽었을 수 있으므로 지금부터 다시 잰다.
+            redis.hsetnx(started_at_key, item, now)
+            continue
+
+        if now - float(started_at) < stale_seconds:
+            continue
+
+        # 그 사이에 ack됐거나 다른 worker가 먼저 다시 넣었으면 건너뛴다.
+        if not redis.lrem(processing_key, 1, item):
+            continue
+
+        redis.hdel(started_at_key, item)
+
+        if redis.hincrby(attempts_key, item, 1) >= settings.ORDER_CHECKOUT_MAX_ATTEMPTS:
+            intent = json.loads(item)
+            # 주문을 commit한 뒤 ack하기 전에 worker가 죽었으면 이미 만들어진 주문을 알려준다.
+            order_id = filter_by_order_uids(
+                Order.objects, [intent['order_uid']],
+            ).values_list(
+                'id', flat=True,
+            ).first()
+
+            if order_id is None:
+                set_checkout_status(
+                    intent['order_uid'], intent['user_id'], CHECKOUT_STATUS_CHOICE.FAILED,
+                    errors={'non_field_errors': ['주문을 처리하지 못했습니다.']},
+                )
+            else:
+                set_checkout_status(intent['order_uid'], intent['user_id'], CHECKOUT_STATUS_CHOICE.CREATED, order_id)
+            redis.hdel(attempts_key, item)
+            continue
+
+        redis.rpush(queue_key, item)
+        requeued_count += 1
+
+    return requeued_count
+
+
+def process_checkout_intents(items):
+    """
+    꺼낸 주문 요청들의 장바구니, 사용자, 이미 만들어진 주문을 한번에 불러온 뒤 요청마다 주문을 만들고 ack합니다.
+    같은 요청이 다시 들어와도 order_uid로 이미 만든 주문을 찾아서 중복으로 만들지 않습니다.
+    예상하지 못한 예외가 발생한 요청은 ack하지 않고 남겨둬서 requeue_stale_checkout_intents가 다시 넣게 하고,
+    (만든 주문 수, [(order_uid, 예외)])를 돌려줍니다.
+    """
+    intents = [(item, json.loads(item)) for item in items]
+    carts_by_id = Cart.objects.filter(
+        id__in={cart_id for _, intent in intents for cart_id in intent['cart_ids']},
+    ).select_related(
+        'product_option__product__provider',
+    ).in_bulk()
+    users_by_id = User.objects.in_bulk({intent['user_id'] for _, intent in intents})
+    order_id_by_order_uid = dict(filter_by_order_uids(
+        Order.objects, [intent['order_uid'] for _, intent in intents],
+    ).values_list(
+        'order_uid', 'id',
+    ))
+    created_orders = []
+    errors = []
+
+    for item, intent in intents:
+        try:
+            order = process_checkout_intent(intent, carts_by_id, users_by_id, order_id_by_order_uid)
+        except Exception as e:
+            errors.append((intent['order_uid'], e))
+            continue
+
+        ack_checkout_intent(item)
+
+        if order is not None:
+            order_id_by_order_uid[order.order_uid] = order.id
+            created_orders.append(order)
+
+    # 만든 주문들의 결제 승인은 모든 주문 transaction이 끝난 뒤에 결제사별로 동시에 요청한다.
+    authorize_orders(created_orders)
+    return len(created_orders), errors
+
+
+def process_checkout_intent(intent, carts_by_id, users_by_id, order_id_by_order_uid):
+    """
+    주문 요청 하나로 주문을 만들고 상태를 기록합니다. 새로 만든 주문이 있으면 돌려줍니다.
+    """
+    order_uid, user_id = intent['order_uid'], intent['user_id']
+
+    if order_uid in order_id_by_order_uid:
+        set_checkout_status(order_uid, user_id, CHECKOUT_STATUS_CHOICE.CREATED, order_id_by_order_uid[order_uid])
+        return None
+
+    carts = [carts_by_id.get(cart_id) for cart_id in sorted(set(intent['cart_ids']))]
+    if user_id not in users_by_id or any(cart is None or cart.user_id != user_id for cart in carts):
+        set_checkout_status(
+            order_uid, user_id, CHECKOUT_STATUS_CHOICE.FAILED,
+            errors={'cart_ids': ['잘못된 cart id가 포함되어 있습니다.']},
+        )
+        return None
+
+    try:
+        order = place_order(
+            users_by_id[user_id], carts, order_uid,
+            shipping_address=intent['shipping_address'],
+            shipping_request_note=intent['shipping_request_note'],
+            pay_method=intent['pay_method'],
+        )
+    except ValidationError as e:
+        set_checkout_status(order_uid, user_id, CHECKOUT_STATUS_CHOICE.FAILED, errors=e.detail)
+        return None
+    except IntegrityError:
+        order_id = filter_by_order_uids(Order.objects, [order_uid]).values_list('id', flat=True).first()
+        if order_id is None:
+            raise
+        set_checkout_status(order_uid, user_id, CHECKOUT_STATUS_CHOICE.CREATED, order_id)
+        return None
+
+    set_checkout_status(order_uid, user_id, CHECKOUT_STATUS_CHOICE.CREATED, order.id)
+    return order
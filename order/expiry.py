@@ -0,0 +1,101 @@
+import datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from order.models import Order, Payment
+from order.payments.authorization import reconcile_payments
+from order.state_machine import cancel_unpaid_orders
+
+
+def get_expiry_range(now=None):
+    """
+    결제 기한이 지난 주문을 찾을 created_at 범위입니다. 너무 오래된 주문까지 매번 훑지 않도록 lookback으로 자릅니다.
+    """
+    now = now or timezone.now()
+    created_before = now - datetime.timedelta(seconds=settings.ORDER_PAYMENT_EXPIRE_SECONDS)
+    return created_before - datetime.timedelta(seconds=settings.ORDER_EXPIRY_LOOKBACK_SECONDS), created_before
+
+
+def get_unpaid_order_keys(created_from, created_before, after, batch_size):
+    """
+    결제되지 않았고 취소되지도 않은 주문의 (created_at, id) partial index를 따라가면서 batch_size개씩 가져옵니다.
+    이미 취소된 주문은 index에 없기 때문에 매번 다시 훑지 않습니다.
+    after는 이전 batch의 마지막 (created_at, id)입니다.
+    """
+    queryset = Order.objects.filter(
+        is_paid=False,
+        is_cancelled=False,
+        created_at__gte=created_from,
+        created_at__lt=created_before,
+    )
+
+    if after is not None:
+        after_created_at, after_id = after
+        # OR 조건만으로는 index에서 시작 위치를 찾지 못하므로 created_at의 범위 조건을 같이 건다.
+        queryset = queryset.filter(
+            Q(created_at__gte=after_created_at),
+            Q(created_at__gt=after_created_at) | Q(created_at=after_created_at, id__gt=after_id),
+        )
+
+    return list(queryset.order_by('created_at', 'id').values_list('created_at', 'id')[:batch_size])
+
+
+def exclude_unknown_payment_orders(order_ids):
+    """
+    승인 여부를 모르는(UNKNOWN) 결제는 결제사에 먼저 조회해서 반영하고, 그래도 모르는 주문은 만료하지 않도록 뺍니다.
+    결제사에서 승인된 주문의 재고를 되돌리지 않기 위해서입니다.
+    """
+    orders = list(Order.objects.select_related('payment').filter(
+        id__in=order_ids,
+        payment__status=Payment.STATUS_CHOICE.UNKNOWN,
+    ))
+
+    if not orders:
+        return order_ids
+
+    _, _, unknown_orders = reconcile_payments(orders)
+    unknown_order_ids = {order.id for order in unknown_orders}
+    return [order_id for order_id in order_ids if order_id not in unknown_order_ids]
+
+
+def expire_unpaid_orders(order_ids):
+    """
+    주문들의 PENDING 주문 상품을 NOT_PAID로 바꾸고 재고를 되돌립니다. 이미 결제됐거나 취소된 주문 상품은 그대로 둡니다.
+    주문하는 사용자의 요청을 막지 않도록 다른 transaction이 잡고 있는 주문 상품은 건너뛰고(다음 순회에서 다시 처리),
+    재고 lock도 ORDER_EXPIRY_LOCK_TIMEOUT_MS 이상 기다리지 않습니다.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL lock_timeout = %s', [f'{settings.ORDER_EXPIRY_LOCK_TIMEOUT_MS}ms'])
+
+        return cancel_unpaid_orders(order_ids, reason='expired', skip_locked=True)
+
+
+def sweep_unpaid_orders(batch_size, now=None):
+    """
+    결제 기한이 지난 주문 전체를 batch 단위로 한번 훑으면서 만료시킵니다. batch마다 transaction을 따로 사용하고,
+    승인 여부를 모르는 결제는 만료하기 전에 결제사에 조회합니다.
+    (확인한 주문 수, 만료된 주문 상품 수)를 돌려줍니다.
+    """
+    created_from, created_before = get_expiry_range(now)
+    after = None
+    order_count = order_product_count = 0
+
+    while True:
+        keys = get_unpaid_order_keys(created_from, created_before, after, batch_size)
+
+        if not keys:
+            break
+
+        order_ids = exclude_unknown_payment_orders([order_id for _, order_id in keys])
+        order_product_count += len(expire_unpaid_orders(order_ids))
+        order_count += len(keys)
+        after = keys[-1]
+
+        if len(keys) < batch_size:
+            break
+
+    return order_count, order_product_count
@@ -0,0 +1,83 @@
+import datetime
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Min
+from django.utils import timezone
+
+from order.models import OrderProduct
+from order.sales_rollups import start_sales_rollups, refresh_sales_rollups_between
+
+
+def parse_date(value):
+    return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def refresh_chunk(chunk):
+    date_from, date_to = chunk
+    return date_from, refresh_sales_rollups_between(date_from, date_to)
+
+
+class Command(BaseCommand):
+    help = (
+        '지난 주문 상품들로 시간별, 일별 매출 집계를 다시 만듭니다. 기간을 --chunk-days 단위로 나눠 '
+        '--processes 개의 프로세스가 나눠서 처리하고, 처음 실행하면 update_sales_rollups가 이어서 반영할 위치를 만듭니다.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-from', type=parse_date, help='YYYY-MM-DD (기본값은 첫 주문 상품의 날짜)')
+        parser.add_argument('--date-to', type=parse_date, help='YYYY-MM-DD, 이 날짜까지 포함합니다. (기본값은 오늘)')
+        parser.add_argument('--chunk-days', type=int, default=1)
+        parser.add_argument('--processes', type=int, default=4)
+
+    def handle(self, *args, **options):
+        started_at = time.monotonic()
+        # backfill하는 동안 바뀌는 주문 상품을 놓치지 않도록 backfill보다 먼저 watermark를 만든다.
+        start_sales_rollups()
+
+        date_from = options['date_from'] or self.get_first_date()
+        date_to = options['date_to'] or timezone.localdate()
+
+        if date_from is None:
+            self.stdout.write('집계할 주문 상품이 없습니다.')
+            return
+
+        if date_from > date_to:
+            raise CommandError('--date-from은 --date-to보다 이후일 수 없습니다.')
+
+        chunk_days = datetime.timedelta(days=options['chunk_days'])
+        chunks = []
+        chunk_from = date_from
+
+        while chunk_from <= date_to:
+            chunk_to = min(chunk_from + chunk_days, date_to + datetime.timedelta(days=1))
+            chunks.append((chunk_from, chunk_to))
+            chunk_from = chunk_to
+
+        if options['processes'] <= 1:
+            refreshed_count = self.report(map(refresh_chunk, chunks))
+        else:
+            # fork된 프로세스들이 부모의 DB 연결을 같이 쓰지 않도록 미리 닫는다.
+            connections.close_all()
+            with multiprocessing.Pool(options['processes']) as pool:
+                refreshed_count = self.report(pool.imap_unordered(refresh_chunk, chunks))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{date_from} ~ {date_to} 시간별 매출 집계 {refreshed_count}건을 다시 만들었습니다. '
+            f'({time.monotonic() - started_at:.1f}s)'
+        ))
+
+    def get_first_date(self):
+        first_created_at = OrderProduct.objects.aggregate(first_created_at=Min('created_at'))['first_created_at']
+        return first_created_at and timezone.localtime(first_created_at).date()
+
+    def report(self, results):
+        refreshed_count = 0
+
+        for date_from, count in results:
+            refreshed_count += count
+            self.stdout.write(f'{date_from}: {count}건')
+
+        return refreshed_count
@@ -0,0 +1,68 @@
+import multiprocessing
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from common.uid import SnowflakeGenerator, MAX_WORKER_ID
+
+
+def generate_in_process(worker_id, count):
+    generator = SnowflakeGenerator(worker_id)
+    return generator.next_ids(count)
+
+
+class Command(BaseCommand):
+    help = 'order_uid 생성기의 초당 생성 개수를 측정하고 thread/process 동시 생성 시 중복이 없는지 확인합니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000000, help='thread/process 하나가 만들 id 개수')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--processes', type=int, default=4)
+
+    def handle(self, *args, **options):
+        count, threads, processes = options['count'], options['threads'], options['processes']
+
+        if processes > MAX_WORKER_ID + 1:
+            raise CommandError(f'--processes는 {MAX_WORKER_ID + 1} 이하여야 합니다.')
+
+        generator = SnowflakeGenerator(worker_id=0)
+        self.measure('single thread, next_id()', lambda: [generator.next_id() for _ in range(count)])
+        self.measure('single thread, next_ids()', lambda: generator.next_ids(count))
+
+        def generate_in_threads():
+            results = [None] * threads
+
+            def generate(index):
+                results[index] = [generator.next_id() for _ in range(count)]
+
+            workers = [threading.Thread(target=generate, args=(index,)) for index in range(threads)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+            return [uid for result in results for uid in result]
+
+        self.measure(f'{threads} threads, shared generator', generate_in_threads)
+
+        def generate_in_processes():
+            with multiprocessing.Pool(processes) as pool:
+                results = pool.starmap(generate_in_process, [(worker_id, count) for worker_id in range(processes)])
+            return [uid for result in results for uid in result]
+
+        self.measure(f'{processes} processes, worker id per process', generate_in_processes)
+
+    def measure(self, name, generate):
+        started_at = time.perf_counter()
+        uids = generate()
+        elapsed = max(time.perf_counter() - started_at, 1e-9)
+        collision_count = len(uids) - len(set(uids))
+
+        self.stdout.write(
+            f'{name}: {len(uids)} ids, {elapsed:.2f}s, {len(uids) / elapsed:,.0f} ids/sec, {collision_count} collisions',
+            style_func=self.style.SUCCESS if collision_count == 0 else self.style.ERROR,
+        )
+
+        if collision_count:
+            raise CommandError(f'{name}: 중복된 id가 {collision_count}개 생성되었습니다.')
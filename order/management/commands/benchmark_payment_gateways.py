@@ -0,0 +1,86 @@
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.core.management.base import BaseCommand
+
+from order.payments.client import PaymentGatewayClient
+from order.payments.gateways import FakePaymentGateway, PaymentGatewayUnavailable, PaymentGatewayError, PaymentDeclined
+
+PAY_METHODS = ('CARD', 'KAKAO')
+
+
+class Command(BaseCommand):
+    help = (
+        '가짜 결제사로 결제 승인 부하 테스트를 합니다. 두 결제사가 정상일 때와 KAKAO 결제사가 느려졌을 때의 '
+        '결제 수단별 처리량과 응답 시간을 비교합니다. DB 없이 결제 승인 단계만 측정합니다.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=2000, help='단계마다 보낼 결제 승인 요청 수')
+        parser.add_argument('--workers', type=int, default=50, help='동시에 결제를 요청하는 web worker 수')
+        parser.add_argument('--latency', type=float, default=0.02)
+        parser.add_argument('--degraded-latency', type=float, default=2.0)
+        parser.add_argument('--degraded-failure-rate', type=float, default=0.5)
+        parser.add_argument('--timeout', type=float, default=0.5)
+        parser.add_argument('--max-concurrency', type=int, default=20)
+
+    def handle(self, *args, **options):
+        healthy = {'latency': options['latency'], 'jitter': options['latency']}
+        degraded = {'latency': options['degraded_latency'], 'failure_rate': options['degraded_failure_rate']}
+
+        self.run_phase('정상', {'CARD': healthy, 'KAKAO': healthy}, options)
+        self.run_phase('KAKAO 장애', {'CARD': healthy, 'KAKAO': degraded}, options)
+
+    def run_phase(self, name, gateway_options, options):
+        clients = {
+            pay_method: PaymentGatewayClient(
+                FakePaymentGateway(pay_method, **gateway_options[pay_method]),
+                timeout=options['timeout'],
+                max_concurrency=options['max_concurrency'],
+                failure_threshold=5,
+                recovery_timeout=1,
+            ) for pay_method in PAY_METHODS
+        }
+        results = defaultdict(Counter)
+        elapsed_by_pay_method = defaultdict(list)
+
+        def checkout(index):
+            pay_method = PAY_METHODS[index % len(PAY_METHODS)]
+            client = clients[pay_method]
+            started_at = time.monotonic()
+
+            try:
+                client.submit(f'benchmark-{index}', 10000, pay_method).result(timeout=client.timeout)
+            except PaymentGatewayUnavailable:
+                result = 'unavailable'
+            except TimeoutError:
+                result = 'timeout'
+            except PaymentDeclined:
+                result = 'declined'
+            except PaymentGatewayError:
+                result = 'error'
+            else:
+                result = 'authorized'
+
+            results[pay_method][result] += 1
+            elapsed_by_pay_method[pay_method].append(time.monotonic() - started_at)
+
+        started_at = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            list(executor.map(checkout, range(options['orders'])))
+        elapsed = max(time.monotonic() - started_at, 1e-6)
+
+        self.stdout.write(self.style.SUCCESS(f'[{name}] {options["orders"]} requests, {elapsed:.2f}s'))
+
+        for pay_method in PAY_METHODS:
+            durations = sorted(elapsed_by_pay_method[pay_method])
+            self.stdout.write(
+                f'  {pay_method}: {results[pay_method]["authorized"] / elapsed:.0f} authorized/sec, '
+                f'p50 {durations[len(durations) // 2] * 1000:.0f}ms, '
+                f'p99 {durations[int(len(durations) * 0.99)] * 1000:.0f}ms, '
+                f'{dict(results[pay_method])}'
+            )
+
+        for client in clients.values():
+            client.shutdown()
@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError
+
+from common.partitions import create_monthly_partition, get_missing_monthly_partitions
+from order.partitions import PARTITIONED_TABLES
+
+
+class Command(BaseCommand):
+    help = (
+        '월별 partition 테이블의 다음 partition들을 미리 만듭니다. '
+        'DEFAULT partition에 row가 쌓이기 전에 만들어야 하므로 cron 등으로 매일 실행합니다. '
+        '부모 테이블의 lock은 --lock-timeout-ms까지만 기다렸다가 다시 시도합니다.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=settings.ORDER_PARTITION_MONTHS_AHEAD)
+        parser.add_argument('--lock-timeout-ms', type=int, default=1000)
+        parser.add_argument('--retries', type=int, default=5)
+
+    def handle(self, *args, **options):
+        for table in PARTITIONED_TABLES:
+            for partition, month in get_missing_monthly_partitions(table, options['months_ahead']):
+                self.create(table, partition, month, options)
+                self.stdout.write(f'{partition} partition을 만들었습니다.')
+
+    def create(self, table, partition, month, options):
+        for attempt in range(options['retries'] + 1):
+            try:
+                create_monthly_partition(table, month, lock_timeout_ms=options['lock_timeout_ms'])
+            except OperationalError as e:
+                if attempt == options['retries']:
+                    raise CommandError(f'{partition} partition을 만들지 못했습니다: {e}')
+
+                self.stderr.write(f'{table} 테이블의 lock을 잡지 못해서 {partition} partition을 다시 만들어봅니다: {e}')
+                time.sleep(2 ** attempt)
+            else:
+                return
@@ -0,0 +1,80 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.utils import timezone
+
+from common.partitions import (
+    get_month_start, get_month_boundary, get_partitions, detach_partition, drop_partition, archive_partition,
+)
+from order.partitions import PARTITIONED_TABLES
+
+
+def parse_month(value):
+    return datetime.datetime.strptime(value, '%Y-%m').date()
+
+
+class Command(BaseCommand):
+    help = (
+        '주문 관련 partition 테이블에서 --before 달 이전의 partition들을 떼어내고, 떼어낸 partition을 지우거나 '
+        'archive schema로 옮깁니다. 데이터를 지우는 DELETE 없이 partition 단위로 정리하기 때문에 오래 걸리지 않고, '
+        '부모 테이블의 lock은 --lock-timeout-ms까지만 기다렸다가 다시 시도합니다. DEFAULT partition은 떼어내지 않습니다.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', type=parse_month, required=True, help='이 달(YYYY-MM) 이전에 끝나는 partition을 떼어냅니다.')
+        action = parser.add_mutually_exclusive_group()
+        action.add_argument('--drop', action='store_true', help='떼어낸 partition을 지웁니다.')
+        action.add_argument('--archive-schema', help='떼어낸 partition을 옮길 schema')
+        parser.add_argument(
+            '--concurrently', action='store_true',
+            help='DETACH PARTITION CONCURRENTLY를 사용합니다. (PostgreSQL 14 이상)',
+        )
+        parser.add_argument('--lock-timeout-ms', type=int, default=1000)
+        parser.add_argument('--retries', type=int, default=5)
+        parser.add_argument('--dry-run', action='store_true', help='떼어낼 partition 목록만 출력합니다.')
+
+    def handle(self, *args, **options):
+        before = options['before']
+
+        if before > get_month_start(timezone.localdate()):
+            raise CommandError('이번 달 이후의 partition은 떼어낼 수 없습니다.')
+
+        if options['concurrently'] and connection.pg_version < 140000:
+            raise CommandError('DETACH PARTITION CONCURRENTLY는 PostgreSQL 14 이상에서만 사용할 수 있습니다.')
+
+        before = get_month_boundary(before)
+
+        for table in PARTITIONED_TABLES:
+            for partition in get_partitions(table):
+                if partition.is_default or partition.upper_bound is None or partition.upper_bound > before:
+                    continue
+
+                if options['dry_run']:
+                    self.stdout.write(f'{table}: {partition.name}')
+                    continue
+
+                self.detach(table, partition.name, options)
+
+                if options['drop']:
+                    drop_partition(partition.name)
+                    self.stdout.write(f'{partition.name} partition을 지웠습니다.')
+                elif options['archive_schema']:
+                    archive_partition(partition.name, options['archive_schema'])
+                    self.stdout.write(f'{partition.name} partition을 {options["archive_schema"]} schema로 옮겼습니다.')
+                else:
+                    self.stdout.write(f'{partition.name} partition을 떼어냈습니다.')
+
+    def detach(self, table, partition, options):
+        for attempt in range(options['retries'] + 1):
+            try:
+                detach_partition(table, partition, options['lock_timeout_ms'], concurrently=options['concurrently'])
+            except OperationalError as e:
+                if attempt == options['retries']:
+                    raise CommandError(f'{partition} partition을 떼어내지 못했습니다: {e}')
+
+                self.stderr.write(f'{partition} partition의 lock을 잡지 못해서 다시 시도합니다: {e}')
+                time.sleep(2 ** attempt)
+            else:
+                return
@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections
+
+from order.expiry import sweep_unpaid_orders
+
+
+class Command(BaseCommand):
+    help = (
+        '결제 기한(ORDER_PAYMENT_EXPIRE_SECONDS)이 지난 결제되지 않은 주문의 주문 상품을 NOT_PAID로 바꾸고 '
+        '재고를 되돌립니다. 주문 요청과 같이 계속 실행할 수 있도록 batch마다 짧은 transaction을 사용합니다.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.ORDER_EXPIRY_BATCH_SIZE)
+        parser.add_argument('--interval', type=float, default=60.0, help='한번 훑은 뒤 다음까지 기다리는 시간(초)')
+        parser.add_argument('--once', action='store_true', help='한번만 훑고 종료합니다.')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+
+            try:
+                order_count, order_product_count = sweep_unpaid_orders(options['batch_size'])
+            except OperationalError as e:
+                # lock_timeout에 걸린 batch는 다음 순회에서 다시 처리한다.
+                self.stderr.write(f'주문 만료 중 오류가 발생했습니다: {e}')
+            else:
+                self.stdout.write(f'결제되지 않은 주문 {order_count}개를 확인하고 주문 상품 {order_product_count}개를 만료했습니다.')
+
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,38 @@
+import datetime
+import sys
+
+from django.core.management.base import BaseCommand
+
+from order.settlement import export_settlement, get_settlement_filename
+
+
+def parse_month(value):
+    return datetime.datetime.strptime(value, '%Y-%m').date()
+
+
+class Command(BaseCommand):
+    help = (
+        '입점사의 월 정산 파일(gzip으로 압축한 CSV)을 만듭니다. 주문 상품을 chunk 단위로 읽으면서 바로 압축해서 쓰기 때문에 '
+        '주문 상품 수와 상관없이 일정한 메모리만 사용합니다.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--provider-id', type=int, required=True)
+        parser.add_argument('--month', type=parse_month, required=True, help='YYYY-MM')
+        parser.add_argument('--output', help="저장할 파일 경로, '-'이면 stdout (기본값은 settlement-<입점사>-<월>.csv.gz)")
+
+    def handle(self, *args, **options):
+        output = options['output'] or get_settlement_filename(options['provider_id'], options['month'])
+        chunks = export_settlement(options['provider_id'], options['month'])
+
+        if output == '-':
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+
+        with open(output, 'wb') as file:
+            for chunk in chunks:
+                file.write(chunk)
+
+        self.stdout.write(f'{output} 파일을 만들었습니다.')
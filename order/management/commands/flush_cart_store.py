@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from order.cart_store import pop_dirty_user_ids, mark_dirty_user_ids, sync_carts
+
+
+class Command(BaseCommand):
+    help = 'CART_BACKEND=redis 일 때 변경된 사용자들의 Redis 장바구니를 cart 테이블에 기록합니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--interval', type=float, default=1.0, help='변경된 장바구니가 없을 때 기다리는 시간(초)')
+        parser.add_argument('--once', action='store_true', help='변경된 장바구니를 모두 기록하면 종료합니다.')
+
+    def handle(self, *args, **options):
+        while True:
+            user_ids = pop_dirty_user_ids(options['batch_size'])
+
+            if not user_ids:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+                continue
+
+            close_old_connections()
+
+            try:
+                sync_carts(user_ids)
+            except Exception:
+                # 기록하지 못한 사용자는 다음에 다시 기록한다.
+                mark_dirty_user_ids(user_ids)
+                raise
+
+            self.stdout.write(f'사용자 {len(user_ids)}명의 장바구니를 기록했습니다.')
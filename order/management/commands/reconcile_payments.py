@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from order.payments.authorization import get_unknown_payment_orders, reconcile_payments
+
+
+class Command(BaseCommand):
+    help = (
+        '결제사 응답이 timeout보다 늦거나 통신에 실패해서 승인 여부를 모르는(UNKNOWN) 결제의 결과를 결제사에 조회해서 '
+        '승인된 주문은 PAID로, 승인되지 않은 주문은 NOT_PAID로 바꾸고 재고를 되돌립니다.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.PAYMENT_RECONCILE_BATCH_SIZE)
+        parser.add_argument('--interval', type=float, default=60.0, help='한번 훑은 뒤 다음까지 기다리는 시간(초)')
+        parser.add_argument('--once', action='store_true', help='한번만 훑고 종료합니다.')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            after_id = None
+            authorized_count = declined_count = unknown_count = 0
+
+            while True:
+                orders = get_unknown_payment_orders(options['batch_size'], after_id)
+
+                if not orders:
+                    break
+
+                authorized_orders, declined_orders, unknown_orders = reconcile_payments(orders)
+                authorized_count += len(authorized_orders)
+                declined_count += len(declined_orders)
+                unknown_count += len(unknown_orders)
+                after_id = orders[-1].id
+
+            self.stdout.write(
+                f'승인 여부를 모르는 결제 중 {authorized_count}개는 승인, {declined_count}개는 취소했고 '
+                f'{unknown_count}개는 아직 모릅니다.'
+            )
+
+            if options['once']:
+                break
+            time.sleep(options['interval'])
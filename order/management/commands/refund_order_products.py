@@ -0,0 +1,89 @@
+import csv
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from order.refund import refund_order_products
+
+FIELDS = ('order_product_id', 'quantity')
+
+
+class Command(BaseCommand):
+    help = (
+        'CSV 파일의 주문 상품들을 batch 단위로 환불합니다. '
+        f'컬럼: {", ".join(FIELDS)} (quantity가 비어있으면 남은 수량 전부)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="파일 경로, '-'이면 stdin")
+        parser.add_argument('--batch-size', type=int, default=settings.ORDER_REFUND_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+
+        if path == '-':
+            self.refund(sys.stdin, options['batch_size'])
+        else:
+            with open(path, newline='', encoding='utf-8') as file:
+                self.refund(file, options['batch_size'])
+
+    def refund(self, file, batch_size):
+        started_at = time.monotonic()
+        refunded_count = skipped_count = rejected_count = 0
+        batch = {}
+
+        reader = csv.DictReader(file)
+        missing_fields = set(FIELDS) - set(reader.fieldnames or ())
+
+        if missing_fields:
+            raise CommandError(f'CSV 헤더에 {", ".join(sorted(missing_fields))} 컬럼이 없습니다.')
+
+        for line_number, row in enumerate(reader, start=2):
+            try:
+                order_product_id = int(row['order_product_id'])
+                quantity = int(row['quantity']) if row['quantity'] else None
+                if quantity is not None and quantity <= 0:
+                    raise ValueError(quantity)
+            except (TypeError, ValueError):
+                rejected_count += 1
+                self.stderr.write(f'{line_number}번째 줄을 건너뜁니다: {row}')
+                continue
+
+            # 같은 주문 상품이 다시 나오면 앞의 환불을 먼저 반영한다.
+            if order_product_id in batch or len(batch) >= batch_size:
+                refunded, skipped = self.refund_batch(batch)
+                refunded_count += refunded
+                skipped_count += skipped
+                batch = {}
+                self.report(refunded_count, skipped_count, started_at)
+
+            batch[order_product_id] = quantity
+
+        if batch:
+            refunded, skipped = self.refund_batch(batch)
+            refunded_count += refunded
+            skipped_count += skipped
+
+        self.report(refunded_count, skipped_count, started_at, rejected_count=rejected_count, style=self.style.SUCCESS)
+
+    def refund_batch(self, batch):
+        result = refund_order_products(batch)
+
+        for order_product_id in result.skipped_ids:
+            self.stderr.write(f'환불할 수 없는 주문 상품입니다: {order_product_id}')
+
+        return len(result.refunded_quantity_by_id), len(result.skipped_ids)
+
+    def report(self, refunded_count, skipped_count, started_at, rejected_count=None, style=None):
+        elapsed = max(time.monotonic() - started_at, 1e-6)
+        message = (
+            f'{refunded_count} refunded, {skipped_count} skipped, {elapsed:.1f}s, '
+            f'{(refunded_count + skipped_count) / elapsed:.0f} rows/sec'
+        )
+
+        if rejected_count is not None:
+            message += f', {rejected_count} rows rejected'
+
+        self.stdout.write(style(message) if style else message)
@@ -0,0 +1,70 @@
+import multiprocessing
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from order.checkout import pop_checkout_intents, process_checkout_intents, requeue_stale_checkout_intents
+
+
+class Command(BaseCommand):
+    help = (
+        'ORDER_CHECKOUT_MODE=async 일 때 주문 큐에 쌓인 주문 요청을 batch로 꺼내 주문을 만드는 worker들을 실행합니다. '
+        '시작할 때와 큐가 비었을 때 ORDER_CHECKOUT_PROCESSING_TIMEOUT이 지나도록 처리되지 않은 요청을 큐에 다시 넣습니다.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=settings.ORDER_CHECKOUT_BATCH_SIZE)
+        parser.add_argument('--block-timeout', type=int, default=5)
+        parser.add_argument('--once', action='store_true', help='큐가 비면 종료합니다.')
+
+    def handle(self, *args, **options):
+        worker_args = (options['batch_size'], options['block_timeout'], options['once'])
+        self.requeue_stale_intents()
+
+        if options['processes'] <= 1:
+            self.work(*worker_args)
+            return
+
+        # fork된 프로세스들이 부모의 DB 연결을 같이 쓰지 않도록 미리 닫는다.
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(target=self.work, args=worker_args)
+            for _ in range(options['processes'])
+        ]
+
+        for worker in workers:
+            worker.start()
+
+        signal.signal(signal.SIGTERM, lambda *_: [worker.terminate() for worker in workers])
+
+        for worker in workers:
+            worker.join()
+
+    def work(self, batch_size, block_timeout, once):
+        self.is_stopping = False
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, 'is_stopping', True))
+
+        while not self.is_stopping:
+            items = pop_checkout_intents(batch_size, timeout=0 if once else block_timeout)
+
+            if not items:
+                if once:
+                    break
+                self.requeue_stale_intents()
+                continue
+
+            close_old_connections()
+            created_count, errors = process_checkout_intents(items)
+            self.stdout.write(f'주문 요청 {len(items)}건 중 {created_count}건의 주문을 만들었습니다.')
+
+            for order_uid, error in errors:
+                self.stderr.write(f'{order_uid} 주문 요청을 처리하지 못해서 나중에 다시 처리합니다: {error!r}')
+
+    def requeue_stale_intents(self):
+        requeued_count = requeue_stale_checkout_intents(settings.ORDER_CHECKOUT_PROCESSING_TIMEOUT)
+
+        if requeued_count:
+            self.stdout.write(f'처리되지 않은 주문 요청 {requeued_count}건을 큐에 다시 넣었습니다.')
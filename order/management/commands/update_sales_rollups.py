@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from order.sales_rollups import update_sales_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        '마지막으로 반영한 이후에 바뀐 주문 상품들을 시간별, 일별 매출 집계에 반영합니다. '
+        '처음에는 backfill_sales_rollups로 지난 주문 상품을 먼저 집계해야 합니다.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=60.0, help='반영한 뒤 다음까지 기다리는 시간(초)')
+        parser.add_argument('--once', action='store_true', help='한번만 반영하고 종료합니다.')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            refreshed_count = update_sales_rollups()
+
+            if refreshed_count is None:
+                self.stderr.write('매출 집계 위치가 없습니다. 먼저 backfill_sales_rollups를 실행해주세요.')
+            else:
+                self.stdout.write(f'시간별 매출 집계 {refreshed_count}건을 다시 만들었습니다.')
+
+            if options['once']:
+                break
+            time.sleep(options['interval'])
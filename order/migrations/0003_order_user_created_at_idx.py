@@ -0,0 +1,20 @@
+# Generated by Django 3.0.8 on 2026-10-18 17:02
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('order', '0002_order_orderproduct_payment'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='order_user_created_at_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.0.8 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0003_order_user_created_at_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderproduct',
+            name='refunded_quantity',
+            field=models.PositiveIntegerField(default=0, verbose_name='환불 수량'),
+        ),
+        migrations.AddField(
+            model_name='orderproduct',
+            name='refunded_price',
+            field=models.PositiveIntegerField(default=0, verbose_name='환불 금액'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='refunded_price',
+            field=models.PositiveIntegerField(default=0, verbose_name='환불 금액'),
+        ),
+    ]
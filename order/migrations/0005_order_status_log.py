@@ -0,0 +1,86 @@
+# Generated by Django 3.0.8 on 2026-10-18 21:10
+
+import datetime
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+CREATE_ORDER_STATUS_LOG_SQL = '''
+CREATE TABLE order_status_log (
+    id bigserial NOT NULL,
+    order_id integer NOT NULL,
+    order_product_id integer,
+    from_status smallint CONSTRAINT order_status_log_from_status_check CHECK (from_status >= 0),
+    to_status smallint NOT NULL CONSTRAINT order_status_log_to_status_check CHECK (to_status >= 0),
+    reason varchar(50) NOT NULL DEFAULT '',
+    created_at timestamp with time zone NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+CREATE INDEX order_status_log_order_id_idx ON order_status_log (order_id, created_at);
+CREATE TABLE order_status_log_default PARTITION OF order_status_log DEFAULT;
+'''
+
+
+CREATE_MONTHLY_PARTITION_SQL = '''
+CREATE TABLE IF NOT EXISTS {partition} PARTITION OF order_status_log
+FOR VALUES FROM (%s) TO (%s)
+'''
+
+
+def add_months(month, months):
+    year, month_index = divmod(month.year * 12 + month.month - 1 + months, 12)
+    return datetime.date(year, month_index + 1, 1)
+
+
+def create_partitions(apps, schema_editor):
+    """
+    이번 달부터 ORDER_PARTITION_MONTHS_AHEAD 달 뒤까지 월별 partition을 만듭니다.
+    이후에 바뀌는 partition helper의 영향을 받지 않도록 이 migration을 만들 때의 SQL을 그대로 둡니다.
+    """
+    today = timezone.localdate()
+    start = datetime.date(today.year, today.month, 1)
+
+    with schema_editor.connection.cursor() as cursor:
+        for offset in range(settings.ORDER_PARTITION_MONTHS_AHEAD + 1):
+            month = add_months(start, offset)
+            partition = f'order_status_log_y{month.year}m{month.month:02d}'
+            # partition 경계는 서버의 TIME_ZONE 기준 자정으로 맞춘다.
+            cursor.execute(
+                CREATE_MONTHLY_PARTITION_SQL.format(partition=schema_editor.quote_name(partition)),
+                [
+                    timezone.make_aware(datetime.datetime.combine(month, datetime.time())),
+                    timezone.make_aware(datetime.datetime.combine(add_months(month, 1), datetime.time())),
+                ],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0004_refunded_quantity_refunded_price'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStatusLog',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('from_status', models.PositiveSmallIntegerField(blank=True, choices=[(0, 'PENDING'), (1, 'NOT_PAID'), (2, 'PAID'), (3, 'REFUND'), (4, 'PARTIAL_REFUND')], null=True)),
+                ('to_status', models.PositiveSmallIntegerField(choices=[(0, 'PENDING'), (1, 'NOT_PAID'), (2, 'PAID'), (3, 'REFUND'), (4, 'PARTIAL_REFUND')])),
+                ('reason', models.CharField(blank=True, default='', max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='status_logs', to='order.Order')),
+                ('order_product', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='status_logs', to='order.OrderProduct')),
+            ],
+            options={
+                'verbose_name': '주문 상태 변경 이력',
+                'verbose_name_plural': '주문 상태 변경 이력',
+                'db_table': 'order_status_log',
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(CREATE_ORDER_STATUS_LOG_SQL, reverse_sql='DROP TABLE order_status_log'),
+        migrations.RunPython(create_partitions, migrations.RunPython.noop),
+    ]
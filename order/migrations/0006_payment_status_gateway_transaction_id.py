@@ -0,0 +1,28 @@
+# Generated by Django 3.0.8 on 2026-10-18 22:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0005_order_status_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'PENDING'), (1, 'AUTHORIZED'), (2, 'DECLINED')], default=0),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='gateway',
+            field=models.CharField(blank=True, max_length=30, null=True, verbose_name='결제사'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='transaction_id',
+            field=models.CharField(blank=True, max_length=100, null=True, verbose_name='결제사 거래 번호'),
+        ),
+    ]
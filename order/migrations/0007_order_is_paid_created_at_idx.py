@@ -0,0 +1,20 @@
+# Generated by Django 3.0.8 on 2026-10-18 23:20
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('order', '0006_payment_status_gateway_transaction_id'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['is_paid', 'created_at', 'id'], name='order_is_paid_created_at_idx'),
+        ),
+    ]
@@ -0,0 +1,214 @@
+# Generated by Django 3.0.8 on 2026-10-19 01:10
+
+import datetime
+
+from django.conf import settings
+from django.db import migrations, models, transaction
+import django.db.models.deletion
+from django.utils import timezone
+
+# 이후에 바뀌는 partition helper의 영향을 받지 않도록 이 migration을 만들 때의 SQL을 그대로 둔다.
+
+# unique 제약은 partition 테이블로 옮길 수 없어서 같은 컬럼에 일반 index를 미리 만들어둔다.
+REPLACEMENT_INDEXES = {
+    'order': [('order_order_uid_idx', ['order_uid'])],
+    'order_product': [],
+    'payment': [('payment_order_id_idx', ['order_id'])],
+}
+
+SELECT_PLAIN_INDEXES_SQL = '''
+SELECT index_class.relname, pg_get_indexdef(pg_index.indexrelid)
+FROM pg_index
+JOIN pg_class index_class ON index_class.oid = pg_index.indexrelid
+WHERE pg_index.indrelid = %s::regclass
+  AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE pg_constraint.conindid = pg_index.indexrelid)
+'''
+
+SELECT_REFERENCING_FOREIGN_KEYS_SQL = '''
+SELECT pg_constraint.conrelid::regclass::text, pg_constraint.conname
+FROM pg_constraint
+WHERE pg_constraint.contype = 'f'
+  AND pg_constraint.confrelid = %s::regclass
+'''
+
+SELECT_FOREIGN_KEYS_SQL = '''
+SELECT pg_constraint.conname, pg_get_constraintdef(pg_constraint.oid)
+FROM pg_constraint
+WHERE pg_constraint.contype = 'f'
+  AND pg_constraint.conrelid = %s::regclass
+'''
+
+SELECT_UNIQUE_CONSTRAINTS_SQL = '''
+SELECT pg_constraint.conname
+FROM pg_constraint
+WHERE pg_constraint.contype = 'u'
+  AND pg_constraint.conrelid = %s::regclass
+'''
+
+CREATE_MONTHLY_PARTITION_SQL = '''
+CREATE TABLE IF NOT EXISTS {partition} PARTITION OF {table}
+FOR VALUES FROM (%s) TO (%s)
+'''
+
+
+def add_months(month, months):
+    year, month_index = divmod(month.year * 12 + month.month - 1 + months, 12)
+    return datetime.date(year, month_index + 1, 1)
+
+
+def get_month_boundary(month):
+    # partition 경계는 서버의 TIME_ZONE 기준 자정으로 맞춘다.
+    return timezone.make_aware(datetime.datetime.combine(month, datetime.time()))
+
+
+def prepare_partitioning(cursor, quote_name, table, legacy_until, replacement_indexes):
+    """
+    오래 걸리는 index 생성과 CHECK 제약 검사를 lock 없이 미리 해둡니다. transaction 밖(autocommit)에서 호출해야 합니다.
+    """
+    cursor.execute(
+        f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {quote_name(f"{table}_id_created_at_key")} '
+        f'ON {quote_name(table)} (id, created_at)'
+    )
+
+    for index, columns in replacement_indexes:
+        cursor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote_name(index)} '
+            f'ON {quote_name(table)} ({", ".join(quote_name(column) for column in columns)})'
+        )
+
+    check = quote_name(f'{table}_legacy_created_at_check')
+    cursor.execute(
+        f'ALTER TABLE {quote_name(table)} ADD CONSTRAINT {check} CHECK (created_at < %s) NOT VALID',
+        [legacy_until],
+    )
+    # VALIDATE는 쓰기를 막지 않는 lock만 잡는다.
+    cursor.execute(f'ALTER TABLE {quote_name(table)} VALIDATE CONSTRAINT {check}')
+
+
+def convert_to_partitioned_table(cursor, quote_name, table, legacy_until, months_ahead):
+    """
+    기존 테이블을 legacy partition(~ legacy_until)으로 붙인 created_at 기준 월별 partition 테이블로 바꿉니다.
+    partition 테이블에는 partition key가 빠진 unique 제약과 이 테이블을 참조하는 foreign key를 둘 수 없어서 지웁니다.
+    """
+    legacy = f'{table}_legacy'
+
+    cursor.execute(SELECT_REFERENCING_FOREIGN_KEYS_SQL, [quote_name(table)])
+    for referencing_table, constraint in cursor.fetchall():
+        cursor.execute(f'ALTER TABLE {referencing_table} DROP CONSTRAINT {quote_name(constraint)}')
+
+    cursor.execute(SELECT_UNIQUE_CONSTRAINTS_SQL, [quote_name(table)])
+    for constraint, in cursor.fetchall():
+        cursor.execute(f'ALTER TABLE {quote_name(table)} DROP CONSTRAINT {quote_name(constraint)}')
+
+    cursor.execute(SELECT_PLAIN_INDEXES_SQL, [quote_name(table)])
+    indexes = [
+        (index, definition) for index, definition in cursor.fetchall()
+        if index != f'{table}_id_created_at_key'
+    ]
+    cursor.execute(SELECT_FOREIGN_KEYS_SQL, [quote_name(table)])
+    foreign_keys = cursor.fetchall()
+    cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [quote_name(table), 'id'])
+    sequence, = cursor.fetchone()
+
+    cursor.execute(f'ALTER TABLE {quote_name(table)} RENAME TO {quote_name(legacy)}')
+    cursor.execute(
+        f'ALTER TABLE {quote_name(legacy)} '
+        f'DROP CONSTRAINT {quote_name(f"{table}_pkey")}, '
+        f'ADD CONSTRAINT {quote_name(f"{legacy}_pkey")} PRIMARY KEY USING INDEX {quote_name(f"{table}_id_created_at_key")}'
+    )
+    # 부모 테이블이 원래 index 이름을 그대로 사용할 수 있도록 legacy partition의 index 이름을 바꾼다.
+    for index, _ in indexes:
+        cursor.execute(f'ALTER INDEX {quote_name(index)} RENAME TO {quote_name(f"{index[:55]}_legacy")}')
+
+    # PositiveIntegerField의 >= 0 같은 CHECK 제약도 부모 테이블로 옮겨야 새 partition에 만들어진다.
+    # legacy partition 범위를 확인하려고 만든 CHECK 제약은 부모 테이블에서는 지운다.
+    cursor.execute(
+        f'CREATE TABLE {quote_name(table)} (LIKE {quote_name(legacy)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+        f'PARTITION BY RANGE (created_at)'
+    )
+    cursor.execute(f'ALTER TABLE {quote_name(table)} DROP CONSTRAINT {quote_name(f"{table}_legacy_created_at_check")}')
+    cursor.execute(f'ALTER TABLE {quote_name(table)} ADD CONSTRAINT {quote_name(f"{table}_pkey")} PRIMARY KEY (id, created_at)')
+    cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {quote_name(table)}.id')
+
+    # 같은 정의의 index가 이미 있는 legacy partition은 index를 새로 만들지 않고 붙이기만 한다.
+    for _, definition in indexes:
+        cursor.execute(definition)
+
+    cursor.execute(
+        f'ALTER TABLE {quote_name(table)} ATTACH PARTITION {quote_name(legacy)} FOR VALUES FROM (MINVALUE) TO (%s)',
+        [legacy_until],
+    )
+    cursor.execute(f'ALTER TABLE {quote_name(legacy)} DROP CONSTRAINT {quote_name(f"{table}_legacy_created_at_check")}')
+    # legacy partition에 같은 foreign key가 있으면 다시 검사하지 않고 그대로 붙는다.
+    for constraint, definition in foreign_keys:
+        cursor.execute(f'ALTER TABLE {quote_name(table)} ADD CONSTRAINT {quote_name(constraint)} {definition}')
+    cursor.execute(f'CREATE TABLE IF NOT EXISTS {quote_name(f"{table}_default")} PARTITION OF {quote_name(table)} DEFAULT')
+
+    # legacy partition이 legacy_until 전까지 덮고 있으므로 그 달부터 월별 partition을 만든다.
+    start = timezone.localdate(legacy_until)
+    for offset in range(months_ahead + 1):
+        month = add_months(datetime.date(start.year, start.month, 1), offset)
+        cursor.execute(
+            CREATE_MONTHLY_PARTITION_SQL.format(
+                partition=quote_name(f'{table}_y{month.year}m{month.month:02d}'), table=quote_name(table),
+            ),
+            [get_month_boundary(month), get_month_boundary(add_months(month, 1))],
+        )
+
+
+def partition_tables(apps, schema_editor):
+    """
+    기존 테이블을 그대로 legacy partition으로 붙이기 때문에 데이터를 옮기지 않습니다.
+    오래 걸리는 index 생성과 CHECK 제약 검사는 lock 없이 먼저 하고,
+    ACCESS EXCLUSIVE lock이 필요한 테이블 교체는 lock_timeout을 걸고 한 transaction에서 짧게 끝냅니다.
+    """
+    today = timezone.localdate()
+    legacy_until = get_month_boundary(add_months(datetime.date(today.year, today.month, 1), 1))
+    quote_name = schema_editor.quote_name
+
+    with schema_editor.connection.cursor() as cursor:
+        for table, replacement_indexes in REPLACEMENT_INDEXES.items():
+            prepare_partitioning(cursor, quote_name, table, legacy_until, replacement_indexes)
+
+    with transaction.atomic(using=schema_editor.connection.alias):
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SET LOCAL lock_timeout = '5s'")
+
+            for table in REPLACEMENT_INDEXES:
+                convert_to_partitioned_table(
+                    cursor, quote_name, table, legacy_until, months_ahead=settings.ORDER_PARTITION_MONTHS_AHEAD,
+                )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('order', '0007_order_is_paid_created_at_idx'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='order',
+                    name='order_uid',
+                    field=models.CharField(db_index=True, max_length=30),
+                ),
+                migrations.AlterField(
+                    model_name='orderproduct',
+                    name='order',
+                    field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='order_products', to='order.Order'),
+                ),
+                migrations.AlterField(
+                    model_name='payment',
+                    name='order',
+                    field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='payment', to='order.Order'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(partition_tables, atomic=False),
+            ],
+        ),
+    ]
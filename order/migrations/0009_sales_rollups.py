@@ -0,0 +1,140 @@
+# Generated by Django 3.0.8 on 2026-10-19 03:40
+
+from django.db import migrations, models
+
+SELECT_PARTITIONS_SQL = '''
+SELECT partition.relname
+FROM pg_inherits
+JOIN pg_class partition ON partition.oid = pg_inherits.inhrelid
+WHERE pg_inherits.inhparent = 'order_product'::regclass
+ORDER BY partition.relname
+'''
+
+
+def create_order_product_updated_at_index(apps, schema_editor):
+    """
+    partition 테이블에는 CREATE INDEX CONCURRENTLY를 할 수 없어서 부모에는 ON ONLY로 만들고
+    partition마다 CONCURRENTLY로 만든 index를 붙입니다.
+    """
+    quote_name = schema_editor.quote_name
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('CREATE INDEX IF NOT EXISTS order_product_updated_at_idx ON ONLY order_product (updated_at)')
+        cursor.execute(SELECT_PARTITIONS_SQL)
+
+        for partition, in cursor.fetchall():
+            partition_index = f'{partition}_updated_at_idx'[:63]
+            cursor.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote_name(partition_index)} '
+                f'ON {quote_name(partition)} (updated_at)'
+            )
+            cursor.execute(f'ALTER INDEX order_product_updated_at_idx ATTACH PARTITION {quote_name(partition_index)}')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('order', '0008_partition_order_order_product_payment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesDailyRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider_id', models.PositiveIntegerField()),
+                ('product_id', models.PositiveIntegerField()),
+                ('product_option_id', models.PositiveIntegerField()),
+                ('order_product_count', models.BigIntegerField(default=0)),
+                ('ordered_quantity', models.BigIntegerField(default=0)),
+                ('ordered_price', models.BigIntegerField(default=0)),
+                ('refunded_quantity', models.BigIntegerField(default=0)),
+                ('refunded_price', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField()),
+                ('date', models.DateField()),
+            ],
+            options={
+                'verbose_name': '일별 매출 집계',
+                'verbose_name_plural': '일별 매출 집계',
+                'db_table': 'sales_daily_rollup',
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesHourlyRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider_id', models.PositiveIntegerField()),
+                ('product_id', models.PositiveIntegerField()),
+                ('product_option_id', models.PositiveIntegerField()),
+                ('order_product_count', models.BigIntegerField(default=0)),
+                ('ordered_quantity', models.BigIntegerField(default=0)),
+                ('ordered_price', models.BigIntegerField(default=0)),
+                ('refunded_quantity', models.BigIntegerField(default=0)),
+                ('refunded_price', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField()),
+                ('hour', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': '시간별 매출 집계',
+                'verbose_name_plural': '시간별 매출 집계',
+                'db_table': 'sales_hourly_rollup',
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesRollupWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('updated_until', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': '매출 집계 위치',
+                'verbose_name_plural': '매출 집계 위치',
+                'db_table': 'sales_rollup_watermark',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='saleshourlyrollup',
+            index=models.Index(fields=['provider_id', 'hour'], name='sales_hourly_provider_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='saleshourlyrollup',
+            index=models.Index(fields=['product_id', 'hour'], name='sales_hourly_product_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='saleshourlyrollup',
+            index=models.Index(fields=['product_option_id', 'hour'], name='sales_hourly_option_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='saleshourlyrollup',
+            constraint=models.UniqueConstraint(fields=('hour', 'product_option_id'), name='unique option for each sales hour'),
+        ),
+        migrations.AddIndex(
+            model_name='salesdailyrollup',
+            index=models.Index(fields=['provider_id', 'date'], name='sales_daily_provider_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salesdailyrollup',
+            index=models.Index(fields=['product_id', 'date'], name='sales_daily_product_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salesdailyrollup',
+            index=models.Index(fields=['product_option_id', 'date'], name='sales_daily_option_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='salesdailyrollup',
+            constraint=models.UniqueConstraint(fields=('date', 'product_option_id'), name='unique option for each sales date'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='orderproduct',
+                    index=models.Index(fields=['updated_at'], name='order_product_updated_at_idx'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_order_product_updated_at_index, atomic=False),
+            ],
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 3.0.8 on 2026-10-19 04:10
+
+from django.db import migrations, models
+
+SELECT_PARTITIONS_SQL = '''
+SELECT partition.relname
+FROM pg_inherits
+JOIN pg_class partition ON partition.oid = pg_inherits.inhrelid
+WHERE pg_inherits.inhparent = 'payment'::regclass
+ORDER BY partition.relname
+'''
+
+
+def create_payment_unknown_order_index(apps, schema_editor):
+    """
+    partition 테이블에는 CREATE INDEX CONCURRENTLY를 할 수 없어서 부모에는 ON ONLY로 만들고
+    partition마다 CONCURRENTLY로 만든 index를 붙입니다.
+    """
+    quote_name = schema_editor.quote_name
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS payment_unknown_order_idx ON ONLY payment (order_id) WHERE status = 3'
+        )
+        cursor.execute(SELECT_PARTITIONS_SQL)
+
+        for partition, in cursor.fetchall():
+            partition_index = f'{partition}_unknown_order_idx'[:63]
+            cursor.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote_name(partition_index)} '
+                f'ON {quote_name(partition)} (order_id) WHERE status = 3'
+            )
+            cursor.execute(f'ALTER INDEX payment_unknown_order_idx ATTACH PARTITION {quote_name(partition_index)}')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('order', '0009_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'PENDING'), (1, 'AUTHORIZED'), (2, 'DECLINED'), (3, 'UNKNOWN')], default=0),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='payment',
+                    index=models.Index(condition=models.Q(status=3), fields=['order'], name='payment_unknown_order_idx'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_payment_unknown_order_index, atomic=False),
+            ],
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 3.0.8 on 2026-10-19 04:40
+
+from django.db import migrations, models
+
+SELECT_PARTITIONS_SQL = '''
+SELECT partition.relname
+FROM pg_inherits
+JOIN pg_class partition ON partition.oid = pg_inherits.inhrelid
+WHERE pg_inherits.inhparent = '"order"'::regclass
+ORDER BY partition.relname
+'''
+
+
+def replace_order_unpaid_index(apps, schema_editor):
+    """
+    결제되지 않았고 취소되지도 않은 주문만 담는 partial index를 만들고 (is_paid, created_at, id) index를 지웁니다.
+    partition 테이블에는 CREATE INDEX CONCURRENTLY를 할 수 없어서 부모에는 ON ONLY로 만들고
+    partition마다 CONCURRENTLY로 만든 index를 붙입니다.
+    """
+    quote_name = schema_editor.quote_name
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS order_unpaid_created_at_idx ON ONLY "order" (created_at, id) '
+            'WHERE NOT is_paid AND NOT is_cancelled'
+        )
+        cursor.execute(SELECT_PARTITIONS_SQL)
+
+        for partition, in cursor.fetchall():
+            partition_index = f'{partition}_unpaid_created_at_idx'[:63]
+            cursor.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote_name(partition_index)} '
+                f'ON {quote_name(partition)} (created_at, id) WHERE NOT is_paid AND NOT is_cancelled'
+            )
+            cursor.execute(f'ALTER INDEX order_unpaid_created_at_idx ATTACH PARTITION {quote_name(partition_index)}')
+
+        cursor.execute('DROP INDEX IF EXISTS order_is_paid_created_at_idx')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('order', '0010_payment_status_unknown'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='is_cancelled',
+            field=models.BooleanField(default=False, verbose_name='결제되지 않아 취소된 주문'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveIndex(
+                    model_name='order',
+                    name='order_is_paid_created_at_idx',
+                ),
+                migrations.AddIndex(
+                    model_name='order',
+                    index=models.Index(condition=models.Q(is_cancelled=False, is_paid=False), fields=['created_at', 'id'], name='order_unpaid_created_at_idx'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(replace_order_unpaid_index, atomic=False),
+            ],
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 3.0.8 on 2026-10-19 05:10
+
+from django.db import migrations, transaction
+
+SELECT_PARTITIONS_SQL = '''
+SELECT partition.relname
+FROM pg_inherits
+JOIN pg_class partition ON partition.oid = pg_inherits.inhrelid
+WHERE pg_inherits.inhparent = %s::regclass
+ORDER BY partition.relname
+'''
+
+SELECT_CHECK_CONSTRAINTS_SQL = '''
+SELECT pg_constraint.conname, pg_get_constraintdef(pg_constraint.oid)
+FROM pg_constraint
+WHERE pg_constraint.contype = 'c'
+  AND pg_constraint.conrelid = %s::regclass
+'''
+
+# 0008 이전부터 있던 테이블은 legacy partition의 CHECK 제약을, order_status_log는 아래 제약을 부모 테이블에 둔다.
+LEGACY_PARTITIONED_TABLES = ('order', 'order_product', 'payment')
+ORDER_STATUS_LOG_CHECK_CONSTRAINTS = [
+    ('order_status_log_from_status_check', 'CHECK (from_status >= 0)'),
+    ('order_status_log_to_status_check', 'CHECK (to_status >= 0)'),
+]
+
+
+def get_check_constraints(cursor, quote_name, table):
+    cursor.execute(SELECT_CHECK_CONSTRAINTS_SQL, [quote_name(table)])
+    return dict(cursor.fetchall())
+
+
+def add_parent_check_constraints(schema_editor, table, constraints):
+    """
+    LIKE ... INCLUDING DEFAULTS로 만든 부모 테이블에는 >= 0 같은 CHECK 제약이 빠져서 새 partition에도 없습니다.
+    partition마다 NOT VALID로 추가한 뒤 쓰기를 막지 않는 VALIDATE로 검사해두면, 부모 테이블에 같은 이름으로 추가할 때
+    partition을 다시 훑지 않고 합쳐지기 때문에 ACCESS EXCLUSIVE lock은 짧게만 잡습니다.
+    """
+    quote_name = schema_editor.quote_name
+
+    with schema_editor.connection.cursor() as cursor:
+        existing = get_check_constraints(cursor, quote_name, table)
+        missing = [(name, definition) for name, definition in constraints if name not in existing]
+
+        if not missing:
+            return
+
+        cursor.execute(SELECT_PARTITIONS_SQL, [quote_name(table)])
+        for partition, in cursor.fetchall():
+            partition_constraints = get_check_constraints(cursor, quote_name, partition)
+
+            for name, definition in missing:
+                if name in partition_constraints:
+                    continue
+                cursor.execute(
+                    f'ALTER TABLE {quote_name(partition)} ADD CONSTRAINT {quote_name(name)} {definition} NOT VALID'
+                )
+                cursor.execute(f'ALTER TABLE {quote_name(partition)} VALIDATE CONSTRAINT {quote_name(name)}')
+
+    with transaction.atomic(using=schema_editor.connection.alias):
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SET LOCAL lock_timeout = '5s'")
+
+            for name, definition in missing:
+                cursor.execute(f'ALTER TABLE {quote_name(table)} ADD CONSTRAINT {quote_name(name)} {definition}')
+
+
+def add_check_constraints(apps, schema_editor):
+    for table in LEGACY_PARTITIONED_TABLES:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute('SELECT to_regclass(%s)', [schema_editor.quote_name(f'{table}_legacy')])
+            if cursor.fetchone()[0] is None:
+                continue
+            constraints = [
+                (name, definition)
+                for name, definition in get_check_constraints(cursor, schema_editor.quote_name, f'{table}_legacy').items()
+                if name != f'{table}_legacy_created_at_check'
+            ]
+
+        add_parent_check_constraints(schema_editor, table, constraints)
+
+    add_parent_check_constraints(schema_editor, 'order_status_log', ORDER_STATUS_LOG_CHECK_CONSTRAINTS)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('order', '0011_order_is_cancelled_unpaid_created_at_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_check_constraints, migrations.RunPython.noop, atomic=False),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 3.0.8 on 2026-10-19 05:40
+
+from django.db import migrations, models, transaction
+
+SELECT_PARTITIONS_SQL = '''
+SELECT partition.relname
+FROM pg_inherits
+JOIN pg_class partition ON partition.oid = pg_inherits.inhrelid
+WHERE pg_inherits.inhparent = 'order_product'::regclass
+ORDER BY partition.relname
+'''
+
+SELECT_CHECK_CONSTRAINT_SQL = '''
+SELECT 1
+FROM pg_constraint
+WHERE pg_constraint.contype = 'c'
+  AND pg_constraint.conrelid = %s::regclass
+  AND pg_constraint.conname = 'order_product_shipping_price_check'
+'''
+
+
+def add_shipping_price(apps, schema_editor):
+    """
+    default 없는 nullable 컬럼은 테이블을 다시 쓰지 않고 바로 추가됩니다.
+    >= 0 CHECK 제약은 컬럼과 같이 추가하면 lock을 잡은 채로 테이블을 훑으므로
+    partition마다 NOT VALID로 추가하고 쓰기를 막지 않는 VALIDATE로 검사한 뒤 부모 테이블에 붙입니다.
+    """
+    quote_name = schema_editor.quote_name
+
+    with transaction.atomic(using=schema_editor.connection.alias):
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SET LOCAL lock_timeout = '5s'")
+            cursor.execute('ALTER TABLE order_product ADD COLUMN IF NOT EXISTS shipping_price integer NULL')
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(SELECT_PARTITIONS_SQL)
+
+        for partition, in cursor.fetchall():
+            cursor.execute(SELECT_CHECK_CONSTRAINT_SQL, [quote_name(partition)])
+            if cursor.fetchone():
+                continue
+            cursor.execute(
+                f'ALTER TABLE {quote_name(partition)} ADD CONSTRAINT order_product_shipping_price_check '
+                f'CHECK (shipping_price >= 0) NOT VALID'
+            )
+            cursor.execute(f'ALTER TABLE {quote_name(partition)} VALIDATE CONSTRAINT order_product_shipping_price_check')
+
+    with transaction.atomic(using=schema_editor.connection.alias):
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SET LOCAL lock_timeout = '5s'")
+            cursor.execute(SELECT_CHECK_CONSTRAINT_SQL, ['order_product'])
+            if not cursor.fetchone():
+                cursor.execute(
+                    'ALTER TABLE order_product ADD CONSTRAINT order_product_shipping_price_check '
+                    'CHECK (shipping_price >= 0)'
+                )
+
+
+def remove_shipping_price(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('ALTER TABLE order_product DROP COLUMN IF EXISTS shipping_price')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('order', '0012_partitioned_table_check_constraints'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name='orderproduct',
+                    name='shipping_price',
+                    field=models.PositiveIntegerField(blank=True, null=True, verbose_name='주문 당시 이 상품에 나눈 배송비'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(add_shipping_price, remove_shipping_price, atomic=False),
+            ],
+        ),
+    ]
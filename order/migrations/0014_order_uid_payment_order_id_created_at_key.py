@@ -0,0 +1,94 @@
+# Generated by Django 3.0.8 on 2026-10-19 06:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+SELECT_PARTITIONS_SQL = '''
+SELECT partition.relname
+FROM pg_inherits
+JOIN pg_class partition ON partition.oid = pg_inherits.inhrelid
+WHERE pg_inherits.inhparent = 'payment'::regclass
+ORDER BY partition.relname
+'''
+
+# partition 테이블로 바꾸기 전에는 order_uid unique 제약이 있었고 이후에는 place_order가 중복을 막았으므로
+# order_uid마다 한 줄만 있어야 하지만, 혹시 있는 중복은 먼저 만든 주문을 남긴다.
+BACKFILL_ORDER_UID_SQL = '''
+INSERT INTO order_uid (order_uid, order_id, created_at)
+SELECT DISTINCT ON (order_uid) order_uid, id, created_at
+FROM "order"
+ORDER BY order_uid, id
+ON CONFLICT (order_uid) DO NOTHING
+'''
+
+
+def backfill_order_uids(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(BACKFILL_ORDER_UID_SQL)
+
+
+def add_payment_order_id_created_at_key(apps, schema_editor):
+    """
+    partition 테이블에는 partition key(created_at)가 포함된 unique index만 만들 수 있습니다.
+    partition 테이블에는 CREATE INDEX CONCURRENTLY를 할 수 없어서 부모에는 ON ONLY로 만들고
+    partition마다 CONCURRENTLY로 만든 index를 붙입니다.
+    """
+    quote_name = schema_editor.quote_name
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE UNIQUE INDEX IF NOT EXISTS payment_order_id_created_at_key ON ONLY payment (order_id, created_at)'
+        )
+        cursor.execute(SELECT_PARTITIONS_SQL)
+
+        for partition, in cursor.fetchall():
+            partition_index = f'{partition}_order_id_created_at_key'[:63]
+            cursor.execute(
+                f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {quote_name(partition_index)} '
+                f'ON {quote_name(partition)} (order_id, created_at)'
+            )
+            cursor.execute(f'ALTER INDEX payment_order_id_created_at_key ATTACH PARTITION {quote_name(partition_index)}')
+
+
+def remove_payment_order_id_created_at_key(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP INDEX IF EXISTS payment_order_id_created_at_key')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('order', '0013_orderproduct_shipping_price'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderUid',
+            fields=[
+                ('order_uid', models.CharField(max_length=30, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(verbose_name='주문의 created_at')),
+                ('order', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='order.Order')),
+            ],
+            options={
+                'verbose_name': '주문 번호',
+                'verbose_name_plural': '주문 번호',
+                'db_table': 'order_uid',
+            },
+        ),
+        migrations.RunPython(backfill_order_uids, migrations.RunPython.noop, atomic=False),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='payment',
+                    constraint=models.UniqueConstraint(fields=('order', 'created_at'), name='payment_order_id_created_at_key'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(
+                    add_payment_order_id_created_at_key, remove_payment_order_id_created_at_key, atomic=False,
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 3.0.8 on 2026-10-19 06:50
+
+from django.db import migrations, models
+
+SELECT_PARTITIONS_SQL = '''
+SELECT partition.relname
+FROM pg_inherits
+JOIN pg_class partition ON partition.oid = pg_inherits.inhrelid
+WHERE pg_inherits.inhparent = 'order_product'::regclass
+ORDER BY partition.relname
+'''
+
+
+def create_order_product_option_created_at_index(apps, schema_editor):
+    """
+    매출 집계가 (시간, 상품 옵션)마다 주문 상품을 다시 읽을 때 사용하는 index입니다.
+    partition 테이블에는 CREATE INDEX CONCURRENTLY를 할 수 없어서 부모에는 ON ONLY로 만들고
+    partition마다 CONCURRENTLY로 만든 index를 붙입니다.
+    """
+    quote_name = schema_editor.quote_name
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS order_product_option_time_idx '
+            'ON ONLY order_product (product_option_id, created_at)'
+        )
+        cursor.execute(SELECT_PARTITIONS_SQL)
+
+        for partition, in cursor.fetchall():
+            partition_index = f'{partition}_option_time_idx'[:63]
+            cursor.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote_name(partition_index)} '
+                f'ON {quote_name(partition)} (product_option_id, created_at)'
+            )
+            cursor.execute(
+                f'ALTER INDEX order_product_option_time_idx ATTACH PARTITION {quote_name(partition_index)}'
+            )
+
+
+def drop_order_product_option_created_at_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP INDEX IF EXISTS order_product_option_time_idx')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('order', '0014_order_uid_payment_order_id_created_at_key'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='orderproduct',
+                    index=models.Index(fields=['product_option', 'created_at'], name='order_product_option_time_idx'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(
+                    create_order_product_option_created_at_index, drop_order_product_option_created_at_index,
+                    atomic=False,
+                ),
+            ],
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.contrib.gis.db import models
+from django.db import connection
 from model_utils import Choices
 
 from common.models import TimeStampModel
@@ -7,6 +8,89 @@ from product.models import ProductOption
 
 User = get_user_model()
 
+UPSERT_CART_SQL = '''
+INSERT INTO cart (user_id, product_option_id, quantity, created_at, updated_at)
+SELECT %(user_id)s, product_option.id, %(quantity)s, now(), now()
+FROM product_option
+WHERE product_option.id = %(product_option_id)s
+  AND product_option.stock >= %(quantity)s
+ON CONFLICT (user_id, product_option_id) DO UPDATE SET
+    quantity = cart.quantity + EXCLUDED.quantity,
+    updated_at = EXCLUDED.updated_at
+WHERE cart.quantity + EXCLUDED.quantity <= (
+    SELECT product_option.stock FROM product_option WHERE product_option.id = EXCLUDED.product_option_id
+)
+RETURNING id, quantity, created_at, updated_at
+'''
+
+# 재고가 충분한 옵션만 수량을 바꾸거나 추가한다. 동시에 같은 옵션을 담아도 unique 제약 위반 없이 한쪽 수량으로 덮어쓴다.
+SET_CART_QUANTITIES_SQL = '''
+INSERT INTO cart (user_id, product_option_id, quantity, created_at, updated_at)
+SELECT %(user_id)s, product_option.id, carts.quantity, now(), now()
+FROM unnest(%(product_option_ids)s::integer[], %(quantities)s::integer[]) AS carts (product_option_id, quantity)
+JOIN product_option ON product_option.id = carts.product_option_id
+WHERE product_option.stock >= carts.quantity
+ORDER BY product_option.id
+ON CONFLICT (user_id, product_option_id) DO UPDATE SET
+    quantity = EXCLUDED.quantity,
+    updated_at = EXCLUDED.updated_at
+RETURNING id, product_option_id, quantity, created_at, updated_at
+'''
+
+
+class CartManager(models.Manager):
+    def upsert(self, user, product_option, quantity):
+        """
+        장바구니에 없으면 추가하고 있으면 수량을 더하는 것을 한번의 쿼리로 처리합니다.
+        합친 수량이 재고보다 많으면 아무것도 바꾸지 않고 None을 돌려줍니다.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(UPSERT_CART_SQL, {
+                'user_id': user.id,
+                'product_option_id': product_option.id,
+                'quantity': quantity,
+            })
+            row = cursor.fetchone()
+
+        if row is None:
+            return None
+
+        cart_id, quantity, created_at, updated_at = row
+        return self.model(
+            id=cart_id,
+            user=user,
+            product_option=product_option,
+            quantity=quantity,
+            created_at=created_at,
+            updated_at=updated_at,
+        )
+
+    def set_quantities(self, user, quantity_by_option_id):
+        """
+        장바구니에 없는 상품 옵션은 추가하고 있는 상품 옵션은 수량을 바꾸는 것을 한번의 쿼리로 처리합니다.
+        재고가 부족한 옵션은 바꾸지 않고, 바꾸거나 추가한 장바구니들만 돌려줍니다.
+        """
+        product_option_ids = sorted(quantity_by_option_id)
+
+        with connection.cursor() as cursor:
+            cursor.execute(SET_CART_QUANTITIES_SQL, {
+                'user_id': user.id,
+                'product_option_ids': product_option_ids,
+                'quantities': [quantity_by_option_id[product_option_id] for product_option_id in product_option_ids],
+            })
+            rows = cursor.fetchall()
+
+        return [
+            self.model(
+                id=cart_id,
+                user=user,
+                product_option_id=product_option_id,
+                quantity=quantity,
+                created_at=created_at,
+                updated_at=updated_at,
+            ) for cart_id, product_option_id, quantity, created_at, updated_at in rows
+        ]
+
 
 class Cart(TimeStampModel):
     user = models.ForeignKey(
@@ -21,6 +105,8 @@ class Cart(TimeStampModel):
     )
     quantity = models.PositiveIntegerField()
 
+    objects = CartManager()
+
     class Meta:
         db_table = 'cart'
         verbose_name = '장바구니'
@@ -34,14 +120,19 @@ class Cart(TimeStampModel):
 
 
 class Order(TimeStampModel):
+    """
+    주문, 상품별 주문, 결제 정보 테이블은 created_at 기준 월별 partition 테이블입니다. (0008 migration)
+    PostgreSQL 11은 partition 테이블을 참조하는 foreign key를 만들 수 없어서 서로의 foreign key는 DB 제약 없이 둡니다.
+    """
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='orders',
     )
+    # partition 테이블에는 created_at이 빠진 unique 제약을 둘 수 없어서 OrderUid 테이블로 중복을 막는다.
     order_uid = models.CharField(
-        unique=True,
         max_length=30,
+        db_index=True,
     )
     shipping_price = models.PositiveIntegerField(
         verbose_name='배송비',
@@ -57,11 +148,49 @@ class Order(TimeStampModel):
     is_paid = models.BooleanField(
         default=False,
     )
+    is_cancelled = models.BooleanField(
+        default=False,
+        verbose_name='결제되지 않아 취소된 주문',
+    )
 
     class Meta:
         db_table = 'order'
         verbose_name = '주문 내역'
         verbose_name_plural = verbose_name
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='order_user_created_at_idx'),
+            models.Index(
+                fields=['created_at', 'id'], name='order_unpaid_created_at_idx',
+                condition=models.Q(is_paid=False, is_cancelled=False),
+            ),
+        ]
+
+
+class OrderUid(models.Model):
+    """
+    order_uid마다 한 줄인 partition되지 않은 테이블입니다. order 테이블에는 order_uid unique 제약을 둘 수 없어서
+    place_order가 주문과 같은 transaction에서 여기에 넣고, primary key로 같은 order_uid의 주문이 두번 만들어지지 않게 합니다.
+    created_at 범위로 찾는 filter_by_order_uids와 달리 order_uid를 만든 시각이나 pruning slack과 상관없이 막습니다.
+    주문이 지워지거나 partition째 archive 되어도 order_uid를 다시 쓰지 않도록 이 테이블의 row는 남겨둡니다.
+    """
+    order_uid = models.CharField(
+        max_length=30,
+        primary_key=True,
+    )
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+    )
+    created_at = models.DateTimeField(
+        verbose_name='주문의 created_at',
+    )
+
+    class Meta:
+        db_table = 'order_uid'
+        verbose_name = '주문 번호'
+        verbose_name_plural = verbose_name
 
 
 class OrderProduct(TimeStampModel):
@@ -92,6 +221,7 @@ class OrderProduct(TimeStampModel):
     order = models.ForeignKey(
         Order,
         on_delete=models.CASCADE,
+        db_constraint=False,
         related_name='order_products',
     )
     product_price = models.PositiveIntegerField(
@@ -103,6 +233,19 @@ class OrderProduct(TimeStampModel):
     ordered_price = models.PositiveIntegerField(
         verbose_name='상품 주문 총액',
     )
+    shipping_price = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='주문 당시 이 상품에 나눈 배송비',
+    )
+    refunded_quantity = models.PositiveIntegerField(
+        default=0,
+        verbose_name='환불 수량',
+    )
+    refunded_price = models.PositiveIntegerField(
+        default=0,
+        verbose_name='환불 금액',
+    )
     status = models.PositiveSmallIntegerField(
         choices=STATUS_CHOICE,
         default=STATUS_CHOICE.PENDING,
@@ -112,6 +255,10 @@ class OrderProduct(TimeStampModel):
         db_table = 'order_product'
         verbose_name = '상품별 주문 내역'
         verbose_name_plural = verbose_name
+        indexes = [
+            models.Index(fields=['updated_at'], name='order_product_updated_at_idx'),
+            models.Index(fields=['product_option', 'created_at'], name='order_product_option_time_idx'),
+        ]
 
 
 class Payment(TimeStampModel):
@@ -119,15 +266,45 @@ class Payment(TimeStampModel):
         (0, 'CARD', 'CARD',),
         (1, 'KAKAO', 'KAKAO',),
     )
+    STATUS_CHOICE = Choices(
+        (0, 'PENDING', 'PENDING',),
+        (1, 'AUTHORIZED', 'AUTHORIZED',),
+        (2, 'DECLINED', 'DECLINED',),
+        (3, 'UNKNOWN', 'UNKNOWN',),
+    )
+    # DB에는 order_id만의 unique 제약을 둘 수 없어서 partition key를 포함한 (order_id, created_at) unique index만 있다.
+    # 이 index는 같은 시각에 두번 들어간 결제만 막으므로 주문당 결제 하나는 place_order가 OrderUid로 주문 중복을 막아서 지키고,
+    # OneToOneField는 order.payment, select_related('payment')를 쓰기 위해 ORM에서만 유지한다.
     order = models.OneToOneField(
         Order,
         on_delete=models.CASCADE,
+        db_constraint=False,
         related_name='payment',
     )
     pay_price = models.PositiveIntegerField()
+    refunded_price = models.PositiveIntegerField(
+        default=0,
+        verbose_name='환불 금액',
+    )
     pay_method = models.PositiveSmallIntegerField(
         choices=PAY_METHOD_CHOICE,
     )
+    status = models.PositiveSmallIntegerField(
+        choices=STATUS_CHOICE,
+        default=STATUS_CHOICE.PENDING,
+    )
+    gateway = models.CharField(
+        max_length=30,
+        null=True,
+        blank=True,
+        verbose_name='결제사',
+    )
+    transaction_id = models.CharField(
+        max_length=100,
+        null=True,
+        blank=True,
+        verbose_name='결제사 거래 번호',
+    )
     additional_information = models.CharField(
         max_length=250,
         null=True,
@@ -138,3 +315,136 @@ class Payment(TimeStampModel):
         db_table = 'payment'
         verbose_name = '결제 정보'
         verbose_name_plural = verbose_name
+        indexes = [
+            models.Index(fields=['order'], name='payment_unknown_order_idx', condition=models.Q(status=3)),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'created_at'], name='payment_order_id_created_at_key'),
+        ]
+
+
+class OrderStatusLog(models.Model):
+    """
+    주문 상품 상태 변경 이력입니다. created_at 기준 월별 partition 테이블이고 추가만 합니다.
+    테이블은 migration의 SQL로 만들기 때문에 Django가 관리하지 않습니다.
+    """
+    id = models.BigAutoField(primary_key=True)
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='status_logs',
+    )
+    order_product = models.ForeignKey(
+        OrderProduct,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='status_logs',
+        null=True,
+        blank=True,
+    )
+    from_status = models.PositiveSmallIntegerField(
+        choices=OrderProduct.STATUS_CHOICE,
+        null=True,
+        blank=True,
+    )
+    to_status = models.PositiveSmallIntegerField(
+        choices=OrderProduct.STATUS_CHOICE,
+    )
+    reason = models.CharField(
+        max_length=50,
+        blank=True,
+        default='',
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        managed = False
+        db_table = 'order_status_log'
+        verbose_name = '주문 상태 변경 이력'
+        verbose_name_plural = verbose_name
+
+
+class SalesRollup(models.Model):
+    """
+    주문 상품을 시간 단위로 모은 매출 집계입니다. 결제된 주문 상품(PAID, REFUND, PARTIAL_REFUND)만 집계하고
+    입점사, 상품, 상품 옵션별로 조회할 수 있도록 id들을 같이 저장합니다.
+    """
+    provider_id = models.PositiveIntegerField()
+    product_id = models.PositiveIntegerField()
+    product_option_id = models.PositiveIntegerField()
+    order_product_count = models.BigIntegerField(
+        default=0,
+    )
+    ordered_quantity = models.BigIntegerField(
+        default=0,
+    )
+    ordered_price = models.BigIntegerField(
+        default=0,
+    )
+    refunded_quantity = models.BigIntegerField(
+        default=0,
+    )
+    refunded_price = models.BigIntegerField(
+        default=0,
+    )
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        abstract = True
+
+
+class SalesHourlyRollup(SalesRollup):
+    hour = models.DateTimeField()
+
+    class Meta:
+        db_table = 'sales_hourly_rollup'
+        verbose_name = '시간별 매출 집계'
+        verbose_name_plural = verbose_name
+        constraints = [
+            models.UniqueConstraint(
+                fields=['hour', 'product_option_id'],
+                name='unique option for each sales hour',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['provider_id', 'hour'], name='sales_hourly_provider_idx'),
+            models.Index(fields=['product_id', 'hour'], name='sales_hourly_product_idx'),
+            models.Index(fields=['product_option_id', 'hour'], name='sales_hourly_option_idx'),
+        ]
+
+
+class SalesDailyRollup(SalesRollup):
+    date = models.DateField()
+
+    class Meta:
+        db_table = 'sales_daily_rollup'
+        verbose_name = '일별 매출 집계'
+        verbose_name_plural = verbose_name
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'product_option_id'],
+                name='unique option for each sales date',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['provider_id', 'date'], name='sales_daily_provider_idx'),
+            models.Index(fields=['product_id', 'date'], name='sales_daily_product_idx'),
+            models.Index(fields=['product_option_id', 'date'], name='sales_daily_option_idx'),
+        ]
+
+
+class SalesRollupWatermark(models.Model):
+    """
+    매출 집계에 반영된 OrderProduct.updated_at의 위치입니다.
+    """
+    name = models.CharField(
+        primary_key=True,
+        max_length=50,
+    )
+    updated_until = models.DateTimeField()
+
+    class Meta:
+        db_table = 'sales_rollup_watermark'
+        verbose_name = '매출 집계 위치'
+        verbose_name_plural = verbose_name
@@ -0,0 +1,96 @@
+import datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+from common.partitions import get_partitions, get_legacy_partition_name
+from common.uid import UID_LENGTH, uid_to_datetime
+
+PARTITIONED_TABLES = ('order', 'order_product', 'payment', 'order_status_log')
+
+_legacy_until = None
+
+
+def get_pruning_slack():
+    return datetime.timedelta(seconds=settings.ORDER_PARTITION_PRUNING_SLACK_SECONDS)
+
+
+def get_legacy_until():
+    """
+    order 테이블의 legacy partition 범위의 끝입니다. partition 테이블로 바꾸기 전의 주문은 모두 이 전에 만들어졌습니다.
+    legacy partition이 없으면 None을 돌려줍니다. partition 범위는 바뀌지 않으므로 프로세스마다 한번만 조회합니다.
+    """
+    global _legacy_until
+
+    if _legacy_until is None:
+        _legacy_until = next(
+            (
+                partition.upper_bound for partition in get_partitions('order')
+                if partition.name == get_legacy_partition_name('order')
+            ),
+            None,
+        )
+
+    return _legacy_until
+
+
+def get_order_uid_created_at_range(order_uid):
+    """
+    Snowflake order_uid를 만든 시각으로 주문의 created_at 범위를 구합니다. created_at 조건을 같이 걸어야 해당 partition만 조회합니다.
+    비동기 주문은 order_uid를 만들고 조금 뒤에 주문이 만들어지기 때문에 앞뒤로 여유를 둡니다.
+
+    Snowflake 이전 형식(만든 날짜와 사용자 id를 이어붙인 값)의 order_uid는 숫자로 읽어도 엉뚱한 시각이 나오므로
+    Snowflake 형식의 자리수이고 읽은 시각이 legacy partition 이후부터 지금까지일 때만 범위를 구하고, 아니면 None을 돌려줍니다.
+    """
+    order_uid = str(order_uid)
+
+    if len(order_uid) != UID_LENGTH or not order_uid.isdigit():
+        return None
+
+    try:
+        created_at = uid_to_datetime(order_uid)
+    except (ValueError, OverflowError, OSError):
+        return None
+
+    slack = get_pruning_slack()
+    legacy_until = get_legacy_until()
+
+    if legacy_until is not None and created_at < legacy_until:
+        return None
+    if created_at > timezone.now() + slack:
+        return None
+
+    return created_at - slack, created_at + slack
+
+
+def filter_by_order_uids(queryset, order_uids):
+    """
+    주문 queryset을 order_uid들로 거릅니다. 모두 Snowflake order_uid이면 만든 시각으로 구한 created_at 범위를 같이 걸어서
+    해당 partition만 조회하고, 다른 형식의 order_uid가 섞여 있으면 order_uid로만 거릅니다.
+    """
+    if not order_uids:
+        return queryset.none()
+
+    created_at_ranges = [get_order_uid_created_at_range(order_uid) for order_uid in order_uids]
+
+    if None in created_at_ranges:
+        return queryset.filter(order_uid__in=order_uids)
+
+    return queryset.filter(
+        order_uid__in=order_uids,
+        created_at__gte=min(created_from for created_from, _ in created_at_ranges),
+        created_at__lte=max(created_to for _, created_to in created_at_ranges),
+    )
+
+
+def get_related_created_at_range(orders):
+    """
+    주문 상품, 결제 정보는 주문과 같은 transaction에서 만들어지므로 주문들의 created_at 범위 안에 있습니다.
+    """
+    if not orders:
+        return None
+
+    created_ats = [order.created_at for order in orders]
+    slack = get_pruning_slack()
+    return min(created_ats) - slack, max(created_ats) + slack
+
@@ -0,0 +1,151 @@
+import time
+from concurrent.futures import TimeoutError
+
+from django.db import transaction
+from django.utils import timezone
+
+from order.models import OrderProduct, Payment, Order
+from order.payments.client import get_gateway_client
+from order.payments.gateways import PaymentGatewayError, PaymentDeclined
+from order.state_machine import transition_order_products, cancel_unpaid_orders
+
+
+def authorize_orders(orders):
+    """
+    place_order로 만든 주문들의 결제 승인을 결제사별 pool에서 동시에 요청하고, 결과를 모아서 한번에 반영합니다.
+    결제사 응답을 기다리는 동안 DB transaction을 잡고 있지 않도록 반드시 transaction.atomic() 밖에서 호출해야 합니다.
+
+    - 승인: 결제는 AUTHORIZED, 주문 상품은 PAID, Order.is_paid는 True
+    - 거절: 결제는 DECLINED, 주문 상품은 NOT_PAID, 재고는 되돌림
+    - 요청하기 전에 실패(circuit이 열림, 동시 요청 수가 가득 참 등): 결제사에 보내지 않아 승인됐을 수 없으므로 거절과 같이 처리함
+    - 요청한 뒤 timeout, 통신 실패: 승인 여부를 모르기 때문에 UNKNOWN으로 바꾸고 reconcile_payments로 나중에 조회함
+    """
+    pending = []
+    not_sent_orders = []
+
+    for order in orders:
+        pay_method = Payment.PAY_METHOD_CHOICE[order.payment.pay_method]
+
+        try:
+            client = get_gateway_client(pay_method)
+            future = client.submit(order.order_uid, order.payment.pay_price, pay_method)
+        except PaymentGatewayError:
+            # PENDING으로 남기면 응답에서도 reconcile_payments에서도 결과가 나지 않으므로 바로 실패시킨다.
+            not_sent_orders.append(order)
+            continue
+
+        pending.append((order, future, time.monotonic() + client.timeout))
+
+    authorized_orders, declined_orders, unknown_orders = wait_for_results(pending)
+    declined_orders += not_sent_orders
+
+    if unknown_orders:
+        Payment.objects.filter(
+            order__in=unknown_orders,
+            status=Payment.STATUS_CHOICE.PENDING,
+        ).update(
+            status=Payment.STATUS_CHOICE.UNKNOWN,
+            updated_at=timezone.now(),
+        )
+
+        for order in unknown_orders:
+            order.payment.status = Payment.STATUS_CHOICE.UNKNOWN
+
+    apply_results(authorized_orders, declined_orders)
+    return authorized_orders, declined_orders
+
+
+def reconcile_payments(orders):
+    """
+    승인 여부를 모르는(UNKNOWN) 결제들의 결과를 결제사에 조회해서 authorize_orders와 같이 반영합니다.
+    조회하지 못한 결제는 UNKNOWN으로 남겨두고 다음에 다시 조회합니다.
+    (승인된 주문들, 거절된 주문들, 아직 모르는 주문들)을 돌려줍니다.
+    """
+    pending = []
+    unknown_orders = []
+
+    for order in orders:
+        try:
+            client = get_gateway_client(Payment.PAY_METHOD_CHOICE[order.payment.pay_method])
+            future = client.submit_lookup(order.order_uid)
+        except PaymentGatewayError:
+            unknown_orders.append(order)
+            continue
+
+        pending.append((order, future, time.monotonic() + client.timeout))
+
+    authorized_orders, declined_orders, not_found_orders = wait_for_results(pending)
+    apply_results(authorized_orders, declined_orders)
+    return authorized_orders, declined_orders, unknown_orders + not_found_orders
+
+
+def get_unknown_payment_orders(batch_size, after_id=None):
+    """
+    승인 여부를 모르는 결제의 주문들을 id 순서로 batch_size개씩 가져옵니다.
+    """
+    queryset = Order.objects.select_related('payment').filter(payment__status=Payment.STATUS_CHOICE.UNKNOWN)
+
+    if after_id is not None:
+        queryset = queryset.filter(id__gt=after_id)
+
+    return list(queryset.order_by('id')[:batch_size])
+
+
+def wait_for_results(pending):
+    """
+    [(주문, Future, deadline)]의 결과를 deadline까지 기다려서 (승인된 주문들, 거절된 주문들, 결과를 모르는 주문들)로 나눕니다.
+    """
+    authorized_orders, declined_orders, unknown_orders = [], [], []
+
+    for order, future, deadline in pending:
+        try:
+            result = future.result(timeout=max(deadline - time.monotonic(), 0))
+        except PaymentDeclined:
+            declined_orders.append(order)
+        except (PaymentGatewayError, TimeoutError):
+            unknown_orders.append(order)
+        else:
+            order.payment.status = Payment.STATUS_CHOICE.AUTHORIZED
+            order.payment.gateway = result.gateway
+            order.payment.transaction_id = result.transaction_id
+            order.payment.updated_at = timezone.now()
+            authorized_orders.append(order)
+
+    return authorized_orders, declined_orders, unknown_orders
+
+
+def apply_results(authorized_orders, declined_orders):
+    if authorized_orders:
+        with transaction.atomic():
+            Payment.objects.bulk_update(
+                [order.payment for order in authorized_orders], ['status', 'gateway', 'transaction_id', 'updated_at'],
+            )
+            transition_order_products(
+                OrderProduct.STATUS_CHOICE.PAID,
+                order_ids=[order.id for order in authorized_orders],
+                reason='authorized',
+            )
+        set_order_statuses(authorized_orders, OrderProduct.STATUS_CHOICE.PAID, is_paid=True)
+
+    if declined_orders:
+        with transaction.atomic():
+            Payment.objects.filter(
+                order__in=declined_orders,
+            ).exclude(
+                status=Payment.STATUS_CHOICE.AUTHORIZED,
+            ).update(
+                status=Payment.STATUS_CHOICE.DECLINED,
+            )
+            cancel_unpaid_orders([order.id for order in declined_orders], reason='declined')
+
+        for order in declined_orders:
+            order.payment.status = Payment.STATUS_CHOICE.DECLINED
+        set_order_statuses(declined_orders, OrderProduct.STATUS_CHOICE.NOT_PAID, is_paid=False)
+
+
+def set_order_statuses(orders, status, is_paid):
+    # 응답을 직렬화할 때 다시 조회하지 않도록 메모리의 객체도 같이 바꾼다.
+    for order in orders:
+        order.is_paid = is_paid
+        for order_product in getattr(order, '_prefetched_objects_cache', {}).get('order_products', []):
+            order_product.status = status
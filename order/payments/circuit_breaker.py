@@ -0,0 +1,47 @@
+import threading
+import time
+
+
+class CircuitBreaker:
+    """
+    연속으로 failure_threshold번 실패하면 recovery_timeout초 동안 요청을 막고(OPEN),
+    그 이후에는 한번의 요청만 보내보고(HALF_OPEN) 성공하면 다시 요청을 받습니다(CLOSED).
+    프로세스마다 따로 상태를 가집니다.
+    """
+    CLOSED = 'CLOSED'
+    OPEN = 'OPEN'
+    HALF_OPEN = 'HALF_OPEN'
+
+    def __init__(self, failure_threshold, recovery_timeout):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failure_count = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow_request(self):
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+                self.state = self.HALF_OPEN
+                return True
+
+            # HALF_OPEN에서는 보내본 요청의 결과가 나올 때까지 다른 요청을 막는다.
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failure_count = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failure_count += 1
+
+            if self.state == self.HALF_OPEN or self.failure_count >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
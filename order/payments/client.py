@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+from django.utils.module_loading import import_string
+
+from order.payments.circuit_breaker import CircuitBreaker
+from order.payments.gateways import PaymentGatewayError, PaymentGatewayUnavailable, PaymentDeclined
+
+
+class PaymentGatewayClient:
+    """
+    결제사 하나에 대한 thread pool, 동시 요청 수 제한, circuit breaker를 묶은 client입니다.
+    요청은 pool에서 실행되므로 호출한 쪽은 timeout까지만 기다리고 돌아갈 수 있고,
+    timeout이 지난 요청도 끝날 때까지 자리를 차지하기 때문에 느린 결제사가 thread를 계속 늘리지 못합니다.
+    """
+
+    def __init__(self, gateway, timeout, max_concurrency, failure_threshold, recovery_timeout):
+        self.gateway = gateway
+        self.timeout = timeout
+        self.circuit_breaker = CircuitBreaker(failure_threshold, recovery_timeout)
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=f'payment-{gateway.name}')
+
+    def submit(self, order_uid, amount, pay_method):
+        """
+        승인 요청을 pool에 넣고 Future를 돌려줍니다.
+        circuit이 열려있으면 바로, 동시 요청 수가 timeout 동안 가득 차있으면 PaymentGatewayUnavailable이 발생합니다.
+        """
+        return self.submit_call(self.gateway.authorize, order_uid, amount, pay_method)
+
+    def submit_lookup(self, order_uid):
+        """
+        승인 여부를 모르는 결제의 결과 조회를 pool에 넣고 Future를 돌려줍니다. 승인 요청과 같은 자리와 circuit을 사용합니다.
+        """
+        return self.submit_call(self.gateway.get_authorization, order_uid)
+
+    def submit_call(self, func, *args):
+        if not self.circuit_breaker.allow_request():
+            raise PaymentGatewayUnavailable(f'{self.gateway.name} 결제사의 circuit이 열려있습니다.')
+
+        if not self.slots.acquire(timeout=self.timeout):
+            # 자리가 나지 않는 것도 결제사가 느려진 것이므로 실패로 센다.
+            self.circuit_breaker.record_failure()
+            raise PaymentGatewayUnavailable(f'{self.gateway.name} 결제사의 동시 요청 수가 가득 찼습니다.')
+
+        started_at = time.monotonic()
+        future = self.executor.submit(func, *args)
+        future.add_done_callback(lambda done: self.on_done(done, started_at))
+        return future
+
+    def on_done(self, future, started_at):
+        self.slots.release()
+        error = future.exception()
+
+        # timeout보다 늦게 온 응답도 결제사가 느려진 것이므로 실패로 센다.
+        if (error is not None and not isinstance(error, PaymentDeclined)) or (
+                time.monotonic() - started_at > self.timeout
+        ):
+            self.circuit_breaker.record_failure()
+        else:
+            self.circuit_breaker.record_success()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_gateway_client(pay_method):
+    """
+    settings.PAYMENT_GATEWAYS에 설정된 결제 수단별 client를 프로세스마다 한번만 만듭니다.
+    """
+    with _clients_lock:
+        if pay_method not in _clients:
+            if pay_method not in settings.PAYMENT_GATEWAYS:
+                raise PaymentGatewayError(f'{pay_method} 결제 수단의 결제사가 설정되어 있지 않습니다.')
+
+            config = settings.PAYMENT_GATEWAYS[pay_method]
+            gateway = import_string(config['BACKEND'])(config.get('NAME', pay_method), **config.get('OPTIONS', {}))
+            _clients[pay_method] = PaymentGatewayClient(
+                gateway,
+                timeout=config.get('TIMEOUT', 3),
+                max_concurrency=config.get('MAX_CONCURRENCY', 20),
+                failure_threshold=config.get('FAILURE_THRESHOLD', 5),
+                recovery_timeout=config.get('RECOVERY_TIMEOUT', 30),
+            )
+
+        return _clients[pay_method]
+
+
+def reset_gateway_clients(shutdown=True):
+    global _clients, _clients_lock
+
+    if shutdown:
+        for client in _clients.values():
+            client.shutdown()
+
+    _clients = {}
+    _clients_lock = threading.Lock()
+
+
+# fork된 프로세스에는 부모의 pool thread가 없으므로 client를 새로 만든다.
+os.register_at_fork(after_in_child=lambda: reset_gateway_clients(shutdown=False))
+
+
+@receiver(setting_changed)
+def reset_gateway_clients_on_setting_changed(setting, **kwargs):
+    if setting == 'PAYMENT_GATEWAYS':
+        reset_gateway_clients()
@@ -0,0 +1,132 @@
+import queue
+import random
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+AuthorizationResult = namedtuple('AuthorizationResult', ['gateway', 'transaction_id'])
+
+
+class PaymentGatewayError(Exception):
+    """
+    결제사와 통신하지 못해서 승인 여부를 모르는 경우입니다. 결제는 UNKNOWN으로 바꾸고 나중에 결과를 조회합니다.
+    """
+
+
+class PaymentGatewayUnavailable(PaymentGatewayError):
+    """
+    circuit이 열려있거나 동시 요청 수가 가득 차서 결제사에 요청하지 않은 경우입니다.
+    """
+
+
+class PaymentGatewayTimeout(PaymentGatewayError):
+    pass
+
+
+class PaymentDeclined(Exception):
+    """
+    결제사가 승인을 거절한 경우입니다.
+    """
+
+
+class PaymentGateway:
+    """
+    결제사 adapter의 interface입니다. authorize는 결제사 client의 thread pool에서 호출되므로 thread safe 해야 하고,
+    결제사별 connection pool은 adapter가 직접 관리합니다.
+    """
+
+    def __init__(self, name, **options):
+        self.name = name
+
+    def authorize(self, order_uid, amount, pay_method):
+        """
+        승인되면 AuthorizationResult를 돌려주고, 거절되면 PaymentDeclined, 통신에 실패하면 PaymentGatewayError가 발생합니다.
+        """
+        raise NotImplementedError
+
+    def get_authorization(self, order_uid):
+        """
+        timeout이나 통신 실패로 승인 여부를 모르는 결제의 결과를 order_uid로 조회합니다.
+        승인되어 있으면 AuthorizationResult를 돌려주고, 승인된 적이 없으면 PaymentDeclined,
+        아직 처리중이거나 조회하지 못하면 PaymentGatewayError가 발생합니다.
+        """
+        raise NotImplementedError
+
+
+class FakePaymentGateway(PaymentGateway):
+    """
+    로컬 개발과 부하 테스트를 위한 결제사입니다. 응답 지연, 통신 실패율, 거절율을 설정할 수 있고
+    connection을 새로 맺을 때만 connect_latency만큼 더 기다립니다.
+    """
+
+    def __init__(
+            self, name, latency=0, jitter=0, failure_rate=0, decline_rate=0, pool_size=10, connect_latency=0,
+            **options
+    ):
+        super().__init__(name, **options)
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.decline_rate = decline_rate
+        self.connect_latency = connect_latency
+        self.connections = queue.LifoQueue(maxsize=pool_size)
+        self.lock = threading.Lock()
+        self.authorizing_order_uids = set()
+        self.authorizations = {}
+
+    def get_connection(self):
+        try:
+            return self.connections.get_nowait()
+        except queue.Empty:
+            time.sleep(self.connect_latency)
+            return object()
+
+    def release_connection(self, connection):
+        try:
+            self.connections.put_nowait(connection)
+        except queue.Full:
+            pass
+
+    def authorize(self, order_uid, amount, pay_method):
+        with self.lock:
+            self.authorizing_order_uids.add(order_uid)
+
+        try:
+            result = self.request_authorization()
+
+            with self.lock:
+                self.authorizations[order_uid] = result
+            return result
+        finally:
+            with self.lock:
+                self.authorizing_order_uids.discard(order_uid)
+
+    def get_authorization(self, order_uid):
+        with self.lock:
+            if order_uid in self.authorizing_order_uids:
+                raise PaymentGatewayError(f'{self.name} 결제사가 아직 승인을 처리하고 있습니다.')
+            if order_uid not in self.authorizations:
+                raise PaymentDeclined(f'{self.name} 결제사에 승인된 결제가 없습니다.')
+            return self.authorizations[order_uid]
+
+    def request_authorization(self):
+        connection = self.get_connection()
+
+        try:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+            value = random.random()
+
+            if value < self.failure_rate:
+                raise PaymentGatewayError(f'{self.name} 결제사와 통신하지 못했습니다.')
+            if value < self.failure_rate + self.decline_rate:
+                raise PaymentDeclined(f'{self.name} 결제사가 승인을 거절했습니다.')
+        except PaymentGatewayError:
+            # 실패한 connection은 재사용하지 않는다.
+            connection = None
+            raise
+        finally:
+            if connection is not None:
+                self.release_connection(connection)
+
+        return AuthorizationResult(gateway=self.name, transaction_id=f'{self.name}-{uuid.uuid4().hex}')
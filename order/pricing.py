@@ -0,0 +1,80 @@
+from collections import namedtuple
+
+QuoteLine = namedtuple('QuoteLine', ['cart', 'product_price', 'quantity', 'ordered_price', 'shipping_price'])
+Quote = namedtuple('Quote', ['lines', 'products_price', 'shipping_price', 'pay_price', 'providers'])
+ProviderQuote = namedtuple('ProviderQuote', ['provider_id', 'products_price', 'shipping_price'])
+
+
+def allocate_shipping_prices(products):
+    """
+    주문 상품마다의 상품(products[i]는 i번째 주문 상품의 상품)으로 배송비를 주문 상품마다 나눈 리스트를 돌려줍니다.
+    묶음배송 가능한 상품은 입점사별로 가장 싼 배송비 하나만, 묶음배송이 안되는 상품은 상품마다 배송비를 받습니다.
+    같은 상품이 여러 옵션으로 담겨있어도 배송비는 상품의 첫 주문 상품에 한번만 넣고,
+    묶음배송 배송비는 입점사별로 배송비가 가장 싼 상품의 첫 주문 상품에 넣습니다.
+    """
+    shipping_prices = [0] * len(products)
+    first_index_by_product_id = {}
+    bundle_index_by_provider_id = {}
+
+    for index, product in enumerate(products):
+        first_index_by_product_id.setdefault(product.id, index)
+
+    for index in first_index_by_product_id.values():
+        product = products[index]
+
+        if not product.can_bundle:
+            shipping_prices[index] = product.shipping_price
+        elif (
+                product.provider_id not in bundle_index_by_provider_id
+                or product.shipping_price < products[bundle_index_by_provider_id[product.provider_id]].shipping_price
+        ):
+            bundle_index_by_provider_id[product.provider_id] = index
+
+    for index in bundle_index_by_provider_id.values():
+        shipping_prices[index] = products[index].shipping_price
+
+    return shipping_prices
+
+
+def quote_carts(carts):
+    """
+    select_related('product_option__product')로 이미 불러온 장바구니들로 주문 금액을 계산합니다.
+    쿼리를 하지 않기 때문에 주문 생성과 금액 미리보기에서 같이 사용할 수 있습니다.
+    """
+    carts = list(carts)
+    lines = [
+        QuoteLine(
+            cart=cart,
+            product_price=cart.product_option.product.price,
+            quantity=cart.quantity,
+            ordered_price=cart.product_option.product.price * cart.quantity,
+            shipping_price=shipping_price,
+        ) for cart, shipping_price in zip(
+            carts, allocate_shipping_prices([cart.product_option.product for cart in carts]),
+        )
+    ]
+
+    # 입점사 배송비는 장바구니마다 나눈 배송비를 더해서 주문 상품에 저장하는 배송비와 항상 같게 한다.
+    products_price_by_provider_id = {}
+    shipping_price_by_provider_id = {}
+    for line in lines:
+        provider_id = line.cart.product_option.product.provider_id
+        products_price_by_provider_id[provider_id] = products_price_by_provider_id.get(provider_id, 0) + line.ordered_price
+        shipping_price_by_provider_id[provider_id] = shipping_price_by_provider_id.get(provider_id, 0) + line.shipping_price
+
+    products_price = sum(products_price_by_provider_id.values())
+    shipping_price = sum(shipping_price_by_provider_id.values())
+
+    return Quote(
+        lines=lines,
+        products_price=products_price,
+        shipping_price=shipping_price,
+        pay_price=products_price + shipping_price,
+        providers=[
+            ProviderQuote(
+                provider_id=provider_id,
+                products_price=products_price_by_provider_id[provider_id],
+                shipping_price=shipping_price,
+            ) for provider_id, shipping_price in shipping_price_by_provider_id.items()
+        ],
+    )
@@ -0,0 +1,104 @@
+from collections import namedtuple, defaultdict
+
+from django.db import connection, transaction
+
+from order.models import OrderProduct
+from order.state_machine import LOG_TRANSITIONS_SQL, get_from_statuses
+from product.stock import release_stocks
+
+RefundResult = namedtuple('RefundResult', ['refunded_quantity_by_id', 'skipped_ids'])
+
+# quantity가 NULL이면 남은 수량을 모두 환불한다.
+REFUND_ORDER_PRODUCTS_SQL = '''
+WITH refunds AS (
+    SELECT order_product.id,
+           order_product.status AS from_status,
+           coalesce(requested.quantity, order_product.ordered_quantity - order_product.refunded_quantity) AS quantity
+    FROM order_product
+    JOIN unnest(%(order_product_ids)s::integer[], %(quantities)s::integer[]) AS requested (id, quantity)
+        ON requested.id = order_product.id
+    WHERE order_product.status = ANY(%(refundable_statuses)s::smallint[])
+    ORDER BY order_product.id
+    FOR UPDATE OF order_product
+), refunded AS (
+    UPDATE order_product SET
+        refunded_quantity = order_product.refunded_quantity + refunds.quantity,
+        refunded_price = order_product.refunded_price + order_product.product_price * refunds.quantity,
+        status = CASE
+            WHEN order_product.refunded_quantity + refunds.quantity = order_product.ordered_quantity THEN %(refund)s
+            ELSE %(partial_refund)s
+        END,
+        updated_at = now()
+    FROM refunds
+    WHERE order_product.id = refunds.id
+      AND refunds.quantity > 0
+      AND order_product.refunded_quantity + refunds.quantity <= order_product.ordered_quantity
+    RETURNING order_product.id, order_product.order_id, order_product.product_option_id, refunds.quantity,
+              refunds.from_status, order_product.status AS to_status
+), logged AS (''' + LOG_TRANSITIONS_SQL.format(source='refunded') + ''')
+SELECT refunded.id, refunded.order_id, refunded.product_option_id, refunded.quantity
+FROM refunded
+'''
+
+# 주문 상품이 모두 환불된 주문은 배송비까지 환불한다.
+RECALCULATE_PAYMENTS_SQL = '''
+UPDATE payment SET
+    refunded_price = refunds.refunded_price,
+    updated_at = now()
+FROM (
+    SELECT order_product.order_id,
+           sum(order_product.refunded_price)
+           + CASE WHEN bool_and(order_product.status = %(refund)s) THEN min("order".shipping_price) ELSE 0 END
+           AS refunded_price
+    FROM order_product
+    JOIN "order" ON "order".id = order_product.order_id
+    WHERE order_product.order_id = ANY(%(order_ids)s::integer[])
+    GROUP BY order_product.order_id
+) AS refunds
+WHERE payment.order_id = refunds.order_id
+'''
+
+
+def refund_order_products(quantity_by_order_product_id):
+    """
+    {order_product_id: 환불 수량(None이면 남은 수량 전부)}를 한번에 환불합니다.
+    주문 상품 상태/환불 금액, 결제 환불 금액, 재고를 각각 한번의 UPDATE로 바꾸기 때문에
+    요청 수와 상관없이 쿼리 수가 같습니다.
+    결제 완료(PAID, PARTIAL_REFUND) 상태가 아니거나 남은 수량보다 많이 환불하려는 주문 상품은 건너뜁니다.
+    """
+    order_product_ids = list(quantity_by_order_product_id)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(REFUND_ORDER_PRODUCTS_SQL, {
+            'order_product_ids': order_product_ids,
+            'quantities': [quantity_by_order_product_id[order_product_id] for order_product_id in order_product_ids],
+            'refundable_statuses': get_from_statuses(OrderProduct.STATUS_CHOICE.REFUND),
+            'refund': OrderProduct.STATUS_CHOICE.REFUND,
+            'partial_refund': OrderProduct.STATUS_CHOICE.PARTIAL_REFUND,
+            'reason': 'refund',
+        })
+        rows = cursor.fetchall()
+
+        refunded_quantity_by_id = {}
+        quantity_by_option_id = defaultdict(int)
+        order_ids = set()
+
+        for order_product_id, order_id, product_option_id, quantity in rows:
+            refunded_quantity_by_id[order_product_id] = quantity
+            quantity_by_option_id[product_option_id] += quantity
+            order_ids.add(order_id)
+
+        if order_ids:
+            cursor.execute(RECALCULATE_PAYMENTS_SQL, {
+                'order_ids': sorted(order_ids),
+                'refund': OrderProduct.STATUS_CHOICE.REFUND,
+            })
+            release_stocks(quantity_by_option_id)
+
+    return RefundResult(
+        refunded_quantity_by_id=refunded_quantity_by_id,
+        skipped_ids=[
+            order_product_id for order_product_id in order_product_ids
+            if order_product_id not in refunded_quantity_by_id
+        ],
+    )
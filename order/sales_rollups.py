@@ -0,0 +1,173 @@
+import datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from order.models import OrderProduct, SalesRollupWatermark
+
+SALES_ROLLUP_WATERMARK = 'sales'
+
+SALES_STATUSES = (
+    OrderProduct.STATUS_CHOICE.PAID,
+    OrderProduct.STATUS_CHOICE.REFUND,
+    OrderProduct.STATUS_CHOICE.PARTIAL_REFUND,
+)
+
+SALES_ROLLUP_COLUMNS = (
+    'provider_id', 'product_id', 'product_option_id', 'order_product_count',
+    'ordered_quantity', 'ordered_price', 'refunded_quantity', 'refunded_price', 'updated_at',
+)
+
+# 집계하는 시간(주문 상품의 created_at)에 들어가는 주문 상품 전체를 다시 집계해서 덮어쓰기 때문에 여러 번 실행해도 결과가 같다.
+REFRESH_HOURLY_ROLLUPS_SQL = '''
+INSERT INTO sales_hourly_rollup (hour, {columns})
+SELECT date_trunc('hour', order_product.created_at), product.provider_id, product.id, order_product.product_option_id,
+       COUNT(*), SUM(order_product.ordered_quantity), SUM(order_product.ordered_price),
+       SUM(order_product.refunded_quantity), SUM(order_product.refunded_price), now()
+FROM {source}
+JOIN product_option ON product_option.id = order_product.product_option_id
+JOIN product ON product.id = product_option.product_id
+WHERE order_product.status = ANY(%(statuses)s)
+  AND {where}
+GROUP BY 1, 2, 3, 4
+ON CONFLICT (hour, product_option_id) DO UPDATE SET {updates}
+RETURNING hour, product_option_id
+'''
+
+# updated_at이 바뀐 주문 상품이 속한 (시간, 상품 옵션)만 created_at 범위로 다시 집계한다.
+# 다시 집계할 때 order_product_option_time_idx로 해당 시간의 partition에서 옵션의 주문 상품만 읽는다.
+CHANGED_ORDER_PRODUCTS_SOURCE = '''(
+    SELECT DISTINCT date_trunc('hour', order_product.created_at) AS hour, order_product.product_option_id
+    FROM order_product
+    WHERE order_product.updated_at > %(updated_from)s
+      AND order_product.updated_at <= %(updated_to)s
+) AS changed
+JOIN order_product ON order_product.product_option_id = changed.product_option_id
+ AND order_product.created_at >= changed.hour
+ AND order_product.created_at < changed.hour + interval '1 hour'
+'''
+
+CREATED_ORDER_PRODUCTS_WHERE = 'order_product.created_at >= %(created_from)s AND order_product.created_at < %(created_to)s'
+
+REFRESH_DAILY_ROLLUPS_SQL = '''
+INSERT INTO sales_daily_rollup (date, {columns})
+SELECT (sales_hourly_rollup.hour AT TIME ZONE %(time_zone)s)::date, sales_hourly_rollup.provider_id,
+       sales_hourly_rollup.product_id, sales_hourly_rollup.product_option_id,
+       SUM(sales_hourly_rollup.order_product_count), SUM(sales_hourly_rollup.ordered_quantity),
+       SUM(sales_hourly_rollup.ordered_price), SUM(sales_hourly_rollup.refunded_quantity),
+       SUM(sales_hourly_rollup.refunded_price), now()
+FROM {source}
+WHERE {where}
+GROUP BY 1, 2, 3, 4
+ON CONFLICT (date, product_option_id) DO UPDATE SET {updates}
+RETURNING date, product_option_id
+'''
+
+CHANGED_HOURLY_ROLLUPS_SOURCE = '''unnest(%(dates)s::date[], %(product_option_ids)s::integer[]) AS changed (date, product_option_id)
+JOIN sales_hourly_rollup ON sales_hourly_rollup.product_option_id = changed.product_option_id
+ AND sales_hourly_rollup.hour >= changed.date::timestamp AT TIME ZONE %(time_zone)s
+ AND sales_hourly_rollup.hour < (changed.date + 1)::timestamp AT TIME ZONE %(time_zone)s
+'''
+
+CREATED_HOURLY_ROLLUPS_WHERE = 'sales_hourly_rollup.hour >= %(created_from)s AND sales_hourly_rollup.hour < %(created_to)s'
+
+
+def _refresh_rollups(sql, source, where, params):
+    sql = sql.format(
+        columns=', '.join(SALES_ROLLUP_COLUMNS),
+        source=source,
+        where=where,
+        updates=', '.join(f'{column} = EXCLUDED.{column}' for column in SALES_ROLLUP_COLUMNS),
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {'statuses': list(SALES_STATUSES), 'time_zone': settings.TIME_ZONE, **params})
+        return cursor.fetchall()
+
+
+def refresh_changed_sales_rollups(updated_from, updated_to):
+    """
+    updated_at이 (updated_from, updated_to] 사이인 주문 상품이 속한 시간별, 일별 집계를 다시 만들고
+    다시 만든 시간별 집계 수를 돌려줍니다.
+    """
+    changed = _refresh_rollups(REFRESH_HOURLY_ROLLUPS_SQL, CHANGED_ORDER_PRODUCTS_SOURCE, 'TRUE', {
+        'updated_from': updated_from,
+        'updated_to': updated_to,
+    })
+
+    if changed:
+        changed_days = {(timezone.localtime(hour).date(), product_option_id) for hour, product_option_id in changed}
+        _refresh_rollups(REFRESH_DAILY_ROLLUPS_SQL, CHANGED_HOURLY_ROLLUPS_SOURCE, 'TRUE', {
+            'dates': [date for date, _ in changed_days],
+            'product_option_ids': [product_option_id for _, product_option_id in changed_days],
+        })
+
+    return len(changed)
+
+
+def refresh_sales_rollups_between(date_from, date_to):
+    """
+    date_from ~ date_to(포함하지 않음)에 만들어진 주문 상품의 시간별, 일별 집계를 다시 만들고
+    다시 만든 시간별 집계 수를 돌려줍니다. 날짜 단위로 나눠서 backfill할 때 사용합니다.
+    """
+    params = {
+        'created_from': timezone.make_aware(datetime.datetime.combine(date_from, datetime.time())),
+        'created_to': timezone.make_aware(datetime.datetime.combine(date_to, datetime.time())),
+    }
+
+    with transaction.atomic():
+        changed = _refresh_rollups(REFRESH_HOURLY_ROLLUPS_SQL, 'order_product', CREATED_ORDER_PRODUCTS_WHERE, params)
+        _refresh_rollups(REFRESH_DAILY_ROLLUPS_SQL, 'sales_hourly_rollup', CREATED_HOURLY_ROLLUPS_WHERE, params)
+
+    return len(changed)
+
+
+def get_rollup_until(now=None):
+    # updated_at은 transaction 안에서 정해지기 때문에 늦게 commit된 주문 상품을 놓치지 않도록 lag만큼 늦게 따라간다.
+    return (now or timezone.now()) - datetime.timedelta(seconds=settings.SALES_ROLLUP_LAG_SECONDS)
+
+
+def get_rescan_from(updated_until):
+    # 집계는 시간 전체를 다시 계산해서 덮어쓰므로 이미 반영한 구간을 다시 훑어도 결과가 같다.
+    return updated_until - datetime.timedelta(seconds=settings.SALES_ROLLUP_RESCAN_SECONDS)
+
+
+def start_sales_rollups(now=None):
+    """
+    backfill을 시작하기 전에 watermark를 만들어둡니다. backfill하는 동안 바뀐 주문 상품은 이후 update_sales_rollups가 반영합니다.
+    이미 watermark가 있으면 그대로 둡니다.
+    """
+    watermark, _ = SalesRollupWatermark.objects.get_or_create(
+        name=SALES_ROLLUP_WATERMARK,
+        defaults={'updated_until': get_rollup_until(now)},
+    )
+    return watermark.updated_until
+
+
+def update_sales_rollups(now=None):
+    """
+    watermark 이후에 바뀐 주문 상품들을 집계에 반영하고 watermark를 옮깁니다.
+    watermark가 없으면(backfill 전) None을, 아니면 다시 만든 시간별 집계 수를 돌려줍니다.
+
+    updated_at은 commit보다 먼저 정해지므로 SALES_ROLLUP_LAG_SECONDS보다 오래 열려있던 transaction의 주문 상품은
+    commit됐을 때 이미 watermark 뒤에 있습니다. 그래서 매번 watermark보다 SALES_ROLLUP_RESCAN_SECONDS 앞에서부터 다시 훑고,
+    lag + rescan보다 오래 열려있던 transaction만 backfill_sales_rollups로 다시 집계해야 합니다.
+    """
+    with transaction.atomic():
+        # 여러 프로세스가 동시에 실행해도 같은 구간을 한번만 반영하도록 watermark row를 잠근다.
+        watermark = SalesRollupWatermark.objects.select_for_update().filter(name=SALES_ROLLUP_WATERMARK).first()
+
+        if watermark is None:
+            return None
+
+        updated_until = get_rollup_until(now)
+
+        if updated_until <= watermark.updated_until:
+            return 0
+
+        refreshed_count = refresh_changed_sales_rollups(get_rescan_from(watermark.updated_until), updated_until)
+        watermark.updated_until = updated_until
+        watermark.save(update_fields=['updated_until'])
+
+    return refreshed_count
@@ -1,23 +1,22 @@
+from django.conf import settings
 from django.db import transaction
-from django.db.models import Sum, Value, Min
-from django.db.models.functions import Coalesce
-from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.relations import PrimaryKeyRelatedField
 
+from order.cart_store import is_redis_cart_backend, sync_carts
+from order.cart_summary import invalidate_cart_summaries
+from order.checkout import load_carts, create_order_uid, place_order
 from order.models import Cart, OrderProduct, Payment, Order
-from product.models import ProductOption, Product
+from order.payments.authorization import authorize_orders
+from product.models import ProductOption
 from product.serializers import ProductOptionWithProductSerializer
+from product.stock import is_stock_mirror_enabled, get_stocks
 from user.serializers import UserSerializer
 
 
 class MeCartSerializer(serializers.ModelSerializer):
-    product_option_id = PrimaryKeyRelatedField(
-        queryset=ProductOption.objects.all(),
-        write_only=True,
-        source='product_option',
-    )
+    product_option_id = serializers.IntegerField(write_only=True)
     product_option = ProductOptionWithProductSerializer(read_only=True)
 
     class Meta:
@@ -28,23 +27,179 @@ class MeCartSerializer(serializers.ModelSerializer):
         )
 
     def validate(self, attrs):
-        if Cart.objects.filter(
+        """
+        재고 미러를 사용하면 상품옵션 row를 읽기 전에 미러의 재고로 먼저 검사하고,
+        Redis 장바구니는 캐시된 상품옵션으로 응답을 만들기 때문에 상품옵션 row를 읽지 않습니다.
+        """
+        product_option_id = attrs['product_option_id']
+        product_option = None
+
+        if is_stock_mirror_enabled():
+            stock = get_stocks([product_option_id]).get(product_option_id)
+            self.validate_stock(stock, attrs['quantity'])
+
+        if not (is_stock_mirror_enabled() and is_redis_cart_backend()):
+            product_option = ProductOption.objects.filter(id=product_option_id).first()
+
+            if not is_stock_mirror_enabled():
+                stock = product_option and product_option.stock
+                self.validate_stock(stock, attrs['quantity'])
+            elif product_option is None:
+                self.validate_stock(None, attrs['quantity'])
+
+        # upsert 모드에서는 이미 담긴 옵션이면 수량을 합치고, Redis 장바구니는 담을 때 중복을 검사한다.
+        if not (settings.CART_UPSERT_ENABLED or is_redis_cart_backend()) and Cart.objects.filter(
                 user=self.context['request'].user,
-                product_option=attrs['product_option'],
+                product_option_id=product_option_id,
         ).exists():
             raise ValidationError('이미 장바구니에 있는 상품 옵션입니다.')
 
-        if attrs['product_option'].stock < attrs['quantity']:
-            raise ValidationError('해당 옵션의 재고가 부족합니다.')
-
+        attrs['product_option'] = product_option
+        attrs['stock'] = stock
         return attrs
 
+    def validate_stock(self, stock, quantity):
+        if stock is None:
+            raise ValidationError({'product_option_id': ['존재하지 않는 상품 옵션입니다.']})
+
+        if stock < quantity:
+            raise ValidationError('해당 옵션의 재고가 부족합니다.')
+
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
+        # product_option으로 저장하므로 검증할 때만 쓴 값들은 뺀다.
+        del validated_data['product_option_id'], validated_data['stock']
+
+        if settings.CART_UPSERT_ENABLED:
+            instance = Cart.objects.upsert(**validated_data)
+            if instance is None:
+                raise ValidationError({'non_field_errors': ['해당 옵션의 재고가 부족합니다.']})
+            invalidate_cart_summaries([instance.user_id])
+            return instance
+
         instance = super().create(validated_data)
         return instance
 
 
+class MeCartBulkListSerializer(serializers.ListSerializer):
+    def validate(self, attrs):
+        quantity_by_option_id = {item['product_option_id']: item['quantity'] for item in attrs}
+
+        if len(quantity_by_option_id) != len(attrs):
+            raise ValidationError('같은 상품 옵션이 중복으로 포함되어 있습니다.')
+
+        if is_stock_mirror_enabled():
+            # 상품옵션 row는 재고가 부족해서 에러 메시지에 이름이 필요한 옵션만 읽는다.
+            stocks = get_stocks(list(quantity_by_option_id))
+
+            if len(stocks) != len(quantity_by_option_id):
+                raise ValidationError('존재하지 않는 상품 옵션이 포함되어 있습니다.')
+
+            no_stock_option_ids = [
+                product_option_id for product_option_id, quantity in quantity_by_option_id.items()
+                if stocks[product_option_id] < quantity
+            ]
+            if no_stock_option_ids:
+                self.raise_no_stock_error(
+                    ProductOption.objects.filter(id__in=no_stock_option_ids).select_related('product').order_by('id')
+                )
+
+            return attrs
+
+        product_options = ProductOption.objects.filter(
+            id__in=quantity_by_option_id,
+        ).select_related(
+            'product',
+        ).in_bulk()
+
+        if len(product_options) != len(quantity_by_option_id):
+            raise ValidationError('존재하지 않는 상품 옵션이 포함되어 있습니다.')
+
+        self.raise_no_stock_error([
+            product_option for product_option_id, product_option in sorted(product_options.items())
+            if product_option.stock < quantity_by_option_id[product_option_id]
+        ])
+
+        return attrs
+
+    def raise_no_stock_error(self, product_options):
+        if product_options:
+            raise ValidationError({'non_field_errors': [', '.join(
+                f'{product_option.product.name}/{product_option.name}' for product_option in product_options
+            ) + ' 의 재고가 부족합니다']})
+
+    def create(self, validated_data):
+        """
+        장바구니에 이미 있는 옵션은 수량을 바꾸고, 없는 옵션은 추가하는 것을 한번의 upsert로 처리합니다.
+        같은 옵션을 동시에 담아도 unique 제약에 걸리지 않고, 재고는 upsert할 때 DB의 값으로 다시 확인합니다.
+        """
+        user = self.context['request'].user
+        quantity_by_option_id = {item['product_option_id']: item['quantity'] for item in validated_data}
+
+        with transaction.atomic():
+            carts = Cart.objects.set_quantities(user, quantity_by_option_id)
+            no_stock_option_ids = set(quantity_by_option_id) - {cart.product_option_id for cart in carts}
+
+            if no_stock_option_ids:
+                # 검증한 뒤에 재고가 줄어든 경우이므로 바꾼 장바구니를 모두 rollback 한다.
+                self.raise_no_stock_error(
+                    ProductOption.objects.filter(id__in=no_stock_option_ids).select_related('product').order_by('id')
+                )
+
+            # upsert는 signal을 보내지 않는다.
+            invalidate_cart_summaries([user.id])
+
+        return carts
+
+
+class MeCartBulkItemSerializer(serializers.Serializer):
+    product_option_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        list_serializer_class = MeCartBulkListSerializer
+
+
+class OrderProductRefundListSerializer(serializers.ListSerializer):
+    def validate(self, attrs):
+        if len({item['order_product_id'] for item in attrs}) != len(attrs):
+            raise ValidationError('같은 주문 상품이 중복으로 포함되어 있습니다.')
+
+        return attrs
+
+
+class OrderProductRefundSerializer(serializers.Serializer):
+    order_product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, required=False, allow_null=True, default=None)
+
+    class Meta:
+        list_serializer_class = OrderProductRefundListSerializer
+
+
+class SalesRollupQuerySerializer(serializers.Serializer):
+    date_from = serializers.DateField()
+    date_to = serializers.DateField()
+    provider_id = serializers.IntegerField(required=False)
+    product_id = serializers.IntegerField(required=False)
+    product_option_id = serializers.IntegerField(required=False)
+    group_by = serializers.ChoiceField(choices=('provider', 'product', 'product_option'), default='provider')
+
+    def validate(self, attrs):
+        if attrs['date_from'] > attrs['date_to']:
+            raise ValidationError('date_from은 date_to보다 이후일 수 없습니다.')
+
+        max_days = self.context['max_days']
+        if (attrs['date_to'] - attrs['date_from']).days >= max_days:
+            raise ValidationError(f'한번에 {max_days}일까지 조회할 수 있습니다.')
+
+        return attrs
+
+
+class SettlementExportQuerySerializer(serializers.Serializer):
+    month = serializers.DateField(input_formats=['%Y-%m'])
+    provider_id = serializers.IntegerField(required=False)
+
+
 class MeOrderProductSerializer(serializers.ModelSerializer):
     product_option = ProductOptionWithProductSerializer()
 
@@ -52,7 +207,7 @@ class MeOrderProductSerializer(serializers.ModelSerializer):
         model = OrderProduct
         fields = (
             'id', 'product_price', 'ordered_quantity',
-            'ordered_price', 'status', 'product_option',
+            'ordered_price', 'refunded_quantity', 'refunded_price', 'status', 'product_option',
         )
 
     def to_representation(self, instance):
@@ -65,12 +220,13 @@ class PaymentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = (
-            'id', 'pay_price', 'pay_method', 'additional_information',
+            'id', 'pay_price', 'refunded_price', 'pay_method', 'status', 'additional_information',
         )
 
     def to_representation(self, instance):
         result = super().to_representation(instance)
         result['pay_method'] = Payment.PAY_METHOD_CHOICE[int(result['pay_method'])]
+        result['status'] = Payment.STATUS_CHOICE[int(result['status'])]
         return result
 
 
@@ -98,86 +254,72 @@ class MeOrderSerializer(serializers.ModelSerializer):
             'updated_at': {'read_only': True},
         }
 
-    def validate_cart_ids(self, cart_ids):
-        if Cart.objects.filter(
-                user=self.context['request'].user,
-                id__in=cart_ids,
-        ).count() != len(cart_ids):
-            raise ValidationError('잘못된 cart id가 포함되어 있습니다.')
-        return cart_ids
-
     def validate_pay_method(self, pay_method):
         if pay_method not in Payment.PAY_METHOD_CHOICE._identifier_map:
             raise ValidationError('올바른 pay_method를 입력 해주세요.')
         return pay_method
 
     def validate(self, attrs):
-        carts = Cart.objects.filter(id__in=attrs['cart_ids']).select_related('product_option__product')
+        if is_redis_cart_backend():
+            # 주문은 cart 테이블을 기준으로 만들기 때문에 Redis 장바구니를 먼저 기록한다.
+            sync_carts([self.context['request'].user.id])
+
+        if is_stock_mirror_enabled():
+            # 주문을 만들 상품옵션 row를 읽기 전에 장바구니 수량과 미러의 재고로 먼저 거절한다.
+            quantity_by_option_id = {}
+            for product_option_id, quantity in Cart.objects.filter(
+                    user=self.context['request'].user,
+                    id__in=attrs['cart_ids'],
+            ).values_list(
+                'product_option_id', 'quantity',
+            ):
+                quantity_by_option_id[product_option_id] = quantity_by_option_id.get(product_option_id, 0) + quantity
 
+            stocks = get_stocks(list(quantity_by_option_id))
+            self.raise_no_stock_error(ProductOption.objects.filter(
+                id__in=[
+                    product_option_id for product_option_id, quantity in quantity_by_option_id.items()
+                    if quantity > stocks.get(product_option_id, 0)
+                ],
+            ).select_related(
+                'product',
+            ).order_by(
+                'id',
+            ))
+
+        carts = load_carts(self.context['request'].user, attrs['cart_ids'])
+
+        if len(carts) != len(attrs['cart_ids']):
+            raise ValidationError({'cart_ids': ['잘못된 cart id가 포함되어 있습니다.']})
+
+        if not is_stock_mirror_enabled():
+            self.raise_no_stock_error([
+                cart.product_option for cart in carts if cart.quantity > cart.product_option.stock
+            ])
+
+        attrs['carts'] = carts
+        return attrs
+
+    def raise_no_stock_error(self, product_options):
         no_stock_option_list = [
-            f'{cart.product_option.product.name}/{cart.product_option.name}'
-            for cart in carts if cart.quantity > cart.product_option.stock
+            f'{product_option.product.name}/{product_option.name}' for product_option in product_options
         ]
         if no_stock_option_list:
             raise ValidationError(
                 ', '.join(no_stock_option_list) + ' 의 재고가 부족합니다'
             )
 
-        attrs['carts'] = carts
-        return attrs
-
-    def get_calculated_products_shipping_price(self, product_ids):
-        return Product.objects.filter(
-            id__in=product_ids, can_bundle=True
-        ).values(
-            'provider_id'
-        ).annotate(
-            min_shipping_price_group_by_provider_id=Min('shipping_price')
-        ).aggregate(
-            sum=Coalesce(Sum('min_shipping_price_group_by_provider_id'), Value(0))
-        )['sum'] + Product.objects.filter(
-            id__in=product_ids, can_bundle=False
-        ).aggregate(sum=Coalesce(Sum('shipping_price'), Value(0)))['sum']
-
-    def create_order_uid(self):
-        utc_now = timezone.now()
-        return f'{utc_now.year}{utc_now.month}{utc_now.day}' \
-               f'{utc_now.hour}{utc_now.minute}{utc_now.second}' \
-               f'{str(utc_now.microsecond)[:2]}{self.context["request"].user.id}'
-
     def create(self, validated_data):
-        carts = validated_data['carts']
-        product_ids = [cart.product_option.product_id for cart in carts]
         request_user = self.context['request'].user
 
-        with transaction.atomic():
-            order = Order.objects.create(
-                user=request_user,
-                order_uid=self.create_order_uid(),
-                shipping_price=self.get_calculated_products_shipping_price(product_ids),
-                shipping_address=validated_data['shipping_address'],
-                shipping_request_note=validated_data['shipping_request_note'],
-                is_paid=False,
-            )
-
-            order_products = [
-                OrderProduct(
-                    user=request_user,
-                    cart=cart,
-                    product_option=cart.product_option,
-                    order=order,
-                    product_price=cart.product_option.product.price,
-                    ordered_quantity=cart.quantity,
-                    ordered_price=cart.product_option.product.price * cart.quantity,
-                    status=OrderProduct.STATUS_CHOICE.PENDING,
-                ) for cart in carts
-            ]
-            OrderProduct.objects.bulk_create(order_products)
-
-            Payment.objects.create(
-                order=order,
-                pay_price=order.shipping_price + sum([order_product.ordered_price for order_product in order_products]),
-                pay_method=getattr(Payment.PAY_METHOD_CHOICE, validated_data['pay_method'])
-            )
-
+        order = place_order(
+            request_user,
+            validated_data['carts'],
+            create_order_uid(),
+            shipping_address=validated_data['shipping_address'],
+            shipping_request_note=validated_data['shipping_request_note'],
+            pay_method=validated_data['pay_method'],
+        )
+        # 주문 transaction이 commit된 뒤에 결제사에 승인을 요청한다.
+        authorize_orders([order])
         return order
@@ -0,0 +1,154 @@
+import csv
+import io
+import zlib
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from common.partitions import add_months, get_month_boundary
+from order.models import OrderProduct
+from order.partitions import get_pruning_slack
+from order.pricing import allocate_shipping_prices
+
+SETTLEMENT_HEADER = (
+    'order_uid', 'order_product_id', 'ordered_at', 'product_id', 'product_name', 'product_option_name', 'status',
+    'product_price', 'ordered_quantity', 'ordered_price', 'refunded_quantity', 'refunded_price', 'shipping_share',
+)
+
+SettlementLine = namedtuple('SettlementLine', [
+    'order_id', 'order_uid', 'order_product_id', 'ordered_at', 'product_id', 'product_name', 'product_option_name',
+    'can_bundle', 'shipping_price', 'status', 'product_price', 'ordered_quantity', 'ordered_price',
+    'refunded_quantity', 'refunded_price', 'shipping_share',
+])
+
+# 배송비를 저장하기 전의 주문에서 allocate_shipping_prices에 넘기는 상품 (Product와 같은 속성만 가짐)
+SettlementProduct = namedtuple('SettlementProduct', ['id', 'provider_id', 'can_bundle', 'shipping_price'])
+
+
+def get_settlement_lines(provider_id, month):
+    """
+    입점사의 month 한 달 동안의 주문 상품들을 order_id 순서로 chunk_size개씩 server-side cursor로 가져옵니다.
+    주문 상품과 주문 모두 created_at 범위를 걸어서 해당 달의 partition만 조회합니다.
+
+    transaction 밖에서 만든 server-side cursor는 WITH HOLD라서 첫 chunk를 받기 전에 결과 전체를 만들어두므로
+    generator가 다 읽을 때까지 transaction을 직접 잡고 있습니다. 정렬 없이 partition의 order_id index를 따라가는 plan을
+    고르도록 cursor_tuple_fraction을 낮추기 때문에 첫 줄까지의 시간은 한 달 치 정렬이 아니라
+    입점사의 첫 주문 상품이 나올 때까지 index를 훑는 시간입니다.
+    """
+    created_from, created_to = get_month_boundary(month), get_month_boundary(add_months(month, 1))
+    slack = get_pruning_slack()
+
+    # 한 주문의 주문 상품들이 이어서 나와야 배송비를 나눌 수 있으므로 order_id로만 정렬한다.
+    # (order_id, id)로 정렬하면 order_id index만으로는 순서가 맞지 않아서 첫 줄을 보내기 전에 한 달 치를 전부 정렬해야 한다.
+    queryset = OrderProduct.objects.filter(
+        product_option__product__provider_id=provider_id,
+        created_at__gte=created_from,
+        created_at__lt=created_to,
+        order__created_at__gte=created_from - slack,
+        order__created_at__lt=created_to + slack,
+    ).order_by(
+        'order_id',
+    ).values_list(
+        'order_id', 'order__order_uid', 'id', 'created_at', 'product_option__product_id',
+        'product_option__product__name', 'product_option__name', 'product_option__product__can_bundle',
+        'product_option__product__shipping_price', 'status', 'product_price', 'ordered_quantity', 'ordered_price',
+        'refunded_quantity', 'refunded_price', 'shipping_price',
+    )
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SET LOCAL cursor_tuple_fraction = %s', [settings.SETTLEMENT_EXPORT_CURSOR_TUPLE_FRACTION],
+            )
+
+        for row in queryset.iterator(chunk_size=settings.SETTLEMENT_EXPORT_CHUNK_SIZE):
+            yield SettlementLine(*row)
+
+
+def allocate_shipping_shares(provider_id, lines):
+    """
+    한 주문에서 입점사의 주문 상품들에 나눈 배송비를 돌려줍니다. 주문할 때 나눠서 저장한 배송비(OrderProduct.shipping_price)를 사용합니다.
+    배송비를 저장하기 전에 만들어진 주문만 주문할 때와 같은 allocate_shipping_prices로 현재 상품의 배송비 설정에서 나눕니다.
+    """
+    if all(line.shipping_share is not None for line in lines):
+        return {line.order_product_id: line.shipping_share for line in lines}
+
+    products = [
+        SettlementProduct(
+            id=line.product_id, provider_id=provider_id, can_bundle=line.can_bundle, shipping_price=line.shipping_price,
+        ) for line in lines
+    ]
+    return {
+        line.order_product_id: shipping_share
+        for line, shipping_share in zip(lines, allocate_shipping_prices(products))
+    }
+
+
+def iter_settlement_rows(provider_id, lines):
+    """
+    주문 하나의 주문 상품들만 모아뒀다가 배송비를 나눠서 CSV row로 내보냅니다.
+    """
+    def flush(order_lines):
+        order_lines.sort(key=lambda line: line.order_product_id)
+        shipping_share_by_id = allocate_shipping_shares(provider_id, order_lines)
+
+        for line in order_lines:
+            yield (
+                line.order_uid, line.order_product_id, timezone.localtime(line.ordered_at).isoformat(),
+                line.product_id, line.product_name, line.product_option_name,
+                OrderProduct.STATUS_CHOICE[line.status], line.product_price, line.ordered_quantity,
+                line.ordered_price, line.refunded_quantity, line.refunded_price,
+                shipping_share_by_id[line.order_product_id],
+            )
+
+    order_lines = []
+
+    for line in lines:
+        if order_lines and order_lines[0].order_id != line.order_id:
+            yield from flush(order_lines)
+            order_lines = []
+        order_lines.append(line)
+
+    if order_lines:
+        yield from flush(order_lines)
+
+
+def iter_gzip_csv(header, rows):
+    """
+    CSV를 SETTLEMENT_EXPORT_FLUSH_BYTES만큼 모일 때마다 gzip으로 압축해서 내보냅니다. 전체를 메모리에 올리지 않습니다.
+    header는 바로 flush해서 쿼리 결과를 기다리는 동안에도 첫 bytes를 보냅니다.
+    """
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(header)
+    yield compressor.compress(buffer.getvalue().encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    buffer.seek(0)
+    buffer.truncate()
+
+    for row in rows:
+        writer.writerow(row)
+
+        if buffer.tell() >= settings.SETTLEMENT_EXPORT_FLUSH_BYTES:
+            chunk = compressor.compress(buffer.getvalue().encode())
+            buffer.seek(0)
+            buffer.truncate()
+            if chunk:
+                yield chunk
+
+    yield compressor.compress(buffer.getvalue().encode()) + compressor.flush()
+
+
+def export_settlement(provider_id, month):
+    """
+    입점사의 월 정산 파일(gzip으로 압축한 CSV)을 조금씩 만들어서 bytes로 내보내는 generator입니다.
+    """
+    lines = get_settlement_lines(provider_id, month)
+    return iter_gzip_csv(SETTLEMENT_HEADER, iter_settlement_rows(provider_id, lines))
+
+
+def get_settlement_filename(provider_id, month):
+    return f'settlement-{provider_id}-{month:%Y-%m}.csv.gz'
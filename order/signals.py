@@ -0,0 +1,33 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from order.cache import bump_cart_version
+from order.cart_store import is_redis_cart_backend, save_db_cart, delete_db_cart
+from order.cart_summary import invalidate_cart_summaries
+from order.models import Cart
+
+
+@receiver(post_save, sender=Cart)
+@receiver(post_delete, sender=Cart)
+def invalidate_cart_summary(sender, instance, **kwargs):
+    invalidate_cart_summaries([instance.user_id])
+
+
+@receiver(post_delete, sender=Cart)
+def invalidate_cart_version(sender, instance, **kwargs):
+    # 커밋 전에 다른 요청이 이전 장바구니로 새 version의 응답을 만들지 않도록 커밋 이후에도 한번 더 올린다.
+    bump_cart_version(instance.user_id)
+    transaction.on_commit(lambda: bump_cart_version(instance.user_id))
+
+
+@receiver(post_save, sender=Cart)
+def save_redis_cart(sender, instance, **kwargs):
+    if is_redis_cart_backend():
+        save_db_cart(instance)
+
+
+@receiver(post_delete, sender=Cart)
+def delete_redis_cart(sender, instance, **kwargs):
+    if is_redis_cart_backend():
+        delete_db_cart(instance)
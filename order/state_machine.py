@@ -0,0 +1,146 @@
+from collections import namedtuple, defaultdict
+
+from django.db import connection, transaction
+
+from order.models import OrderProduct
+from product.stock import release_stocks
+
+STATUS_CHOICE = OrderProduct.STATUS_CHOICE
+
+# {이전 상태: 바꿀 수 있는 상태들}
+ORDER_PRODUCT_TRANSITIONS = {
+    STATUS_CHOICE.PENDING: (STATUS_CHOICE.NOT_PAID, STATUS_CHOICE.PAID),
+    STATUS_CHOICE.PAID: (STATUS_CHOICE.REFUND, STATUS_CHOICE.PARTIAL_REFUND),
+    STATUS_CHOICE.PARTIAL_REFUND: (STATUS_CHOICE.REFUND, STATUS_CHOICE.PARTIAL_REFUND),
+}
+
+# 환불 수량/금액, 결제 환불 금액, 재고를 같이 바꿔야 하는 상태라서 refund_order_products로만 바꿀 수 있다.
+REFUND_STATUSES = (STATUS_CHOICE.REFUND, STATUS_CHOICE.PARTIAL_REFUND)
+
+# 상태가 row마다 다른 경우(환불 등)에도 쓸 수 있도록 변경된 row를 기록하는 CTE를 따로 둔다.
+LOG_TRANSITIONS_SQL = '''
+INSERT INTO order_status_log (order_id, order_product_id, from_status, to_status, reason, created_at)
+SELECT {source}.order_id, {source}.id, {source}.from_status, {source}.to_status, %(reason)s, now()
+FROM {source}
+'''
+
+TRANSITION_ORDER_PRODUCTS_SQL = '''
+WITH previous AS (
+    SELECT order_product.id, order_product.status
+    FROM order_product
+    WHERE {condition}
+      AND order_product.status = ANY(%(from_statuses)s::smallint[])
+    ORDER BY order_product.id
+    {lock}
+), transitioned AS (
+    UPDATE order_product
+    SET status = %(to_status)s, updated_at = now()
+    FROM previous
+    WHERE order_product.id = previous.id
+    RETURNING order_product.id, order_product.order_id, order_product.product_option_id,
+              order_product.ordered_quantity - order_product.refunded_quantity AS quantity,
+              previous.status AS from_status, order_product.status AS to_status
+), logged AS (''' + LOG_TRANSITIONS_SQL.format(source='transitioned') + '''){order_updates}
+SELECT transitioned.order_id, transitioned.id, transitioned.product_option_id, transitioned.quantity
+FROM transitioned
+'''
+
+PAID_ORDERS_SQL = ''', paid_orders AS (
+    UPDATE "order"
+    SET is_paid = true, updated_at = now()
+    WHERE "order".id IN (SELECT transitioned.order_id FROM transitioned)
+      AND NOT "order".is_paid
+)'''
+
+# 남은 PENDING 주문 상품 없이 모두 NOT_PAID로 바뀐 주문은 만료 대상에서 빠지도록 취소로 표시한다.
+CANCELLED_ORDERS_SQL = ''', cancelled_orders AS (
+    UPDATE "order"
+    SET is_cancelled = true, updated_at = now()
+    WHERE "order".id IN (SELECT transitioned.order_id FROM transitioned)
+      AND NOT "order".is_cancelled
+      AND NOT EXISTS (
+          SELECT 1
+          FROM order_product
+          WHERE order_product.order_id = "order".id
+            AND order_product.status = ANY(%(from_statuses)s::smallint[])
+            AND order_product.id NOT IN (SELECT transitioned.id FROM transitioned)
+      )
+)'''
+
+TransitionedOrderProduct = namedtuple(
+    'TransitionedOrderProduct', ['order_id', 'order_product_id', 'product_option_id', 'quantity'],
+)
+
+
+class InvalidTransition(Exception):
+    pass
+
+
+def get_from_statuses(to_status):
+    return sorted(
+        from_status for from_status, to_statuses in ORDER_PRODUCT_TRANSITIONS.items()
+        if to_status in to_statuses
+    )
+
+
+def transition_order_products(to_status, order_ids=None, order_product_ids=None, reason='', skip_locked=False):
+    """
+    주문(order_ids) 또는 주문 상품(order_product_ids)의 상태를 한번의 쿼리로 to_status로 바꾸고
+    바뀐 row마다 order_status_log에 이력을 남깁니다. 바꿀 수 없는 상태의 주문 상품은 그대로 둡니다.
+    PAID로 바뀐 주문은 Order.is_paid를, 주문 상품이 모두 NOT_PAID로 바뀐 주문은 Order.is_cancelled를 같이 바꿉니다.
+    환불 상태로는 바꿀 수 없습니다.
+    skip_locked=True이면 다른 transaction이 잡고 있는 주문 상품은 기다리지 않고 건너뜁니다.
+    바뀐 주문 상품들의 TransitionedOrderProduct 목록을 돌려줍니다.
+    """
+    from_statuses = get_from_statuses(to_status)
+
+    if to_status in REFUND_STATUSES:
+        raise InvalidTransition(f'{STATUS_CHOICE[to_status]} 상태는 refund_order_products로만 바꿀 수 있습니다.')
+    if not from_statuses:
+        raise InvalidTransition(f'{STATUS_CHOICE[to_status]} 상태로 바꿀 수 없습니다.')
+    if (order_ids is None) == (order_product_ids is None):
+        raise ValueError('order_ids, order_product_ids 중 하나만 넘겨야 합니다.')
+
+    if order_ids is not None:
+        condition = 'order_product.order_id = ANY(%(ids)s::integer[])'
+        ids = order_ids
+    else:
+        condition = 'order_product.id = ANY(%(ids)s::integer[])'
+        ids = order_product_ids
+
+    sql = TRANSITION_ORDER_PRODUCTS_SQL.format(
+        condition=condition,
+        order_updates={
+            STATUS_CHOICE.PAID: PAID_ORDERS_SQL,
+            STATUS_CHOICE.NOT_PAID: CANCELLED_ORDERS_SQL,
+        }.get(to_status, ''),
+        lock='FOR UPDATE SKIP LOCKED' if skip_locked else 'FOR UPDATE',
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {
+            'ids': list(ids),
+            'from_statuses': from_statuses,
+            'to_status': to_status,
+            'reason': reason,
+        })
+        return [TransitionedOrderProduct(*row) for row in cursor.fetchall()]
+
+
+def cancel_unpaid_orders(order_ids, reason='', skip_locked=False):
+    """
+    결제되지 않은 주문의 주문 상품들을 NOT_PAID로 바꾸고 차감했던 재고를 한번의 UPDATE로 되돌립니다.
+    """
+    with transaction.atomic():
+        transitioned = transition_order_products(
+            STATUS_CHOICE.NOT_PAID, order_ids=order_ids, reason=reason, skip_locked=skip_locked,
+        )
+        quantity_by_option_id = defaultdict(int)
+
+        for order_product in transitioned:
+            quantity_by_option_id[order_product.product_option_id] += order_product.quantity
+
+        if quantity_by_option_id:
+            release_stocks(quantity_by_option_id)
+
+    return transitioned
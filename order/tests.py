@@ -1,13 +1,52 @@
+import csv
+import datetime
+import gzip
 import json
-
+import os
+import tempfile
+import time
+import uuid
+from io import StringIO
+from unittest import mock, skip
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, IntegrityError, OperationalError
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 
 from common.cache import has_obtained_redis_lock, release_redis_lock
+from common.cache_keys import IDEMPOTENCY_KEY_
+from common.fast_serializers import FastSerializer
+from common.mixins import IdempotentCreateMixin
+from common.pagination import KeysetPagination
+from common.partitions import (
+    add_months, create_monthly_partition, get_month_start, get_monthly_partition_name, get_partitions,
+)
 from common.tests import ToyTestCase
-from order.cache_keys import CART_CREATE_LOCK_USER_, ORDER_CREATE_LOCK_USER_
-from order.models import Cart, OrderProduct, Payment, Order
+from order.cache_keys import (
+    CART_CREATE_LOCK_USER_, ORDER_CREATE_LOCK_USER_, CART_QUANTITIES_USER_, CART_IDS_USER_, CART_SUMMARY_USER_,
+)
+from order.checkout import (
+    load_carts, create_order_uid, place_order, pop_checkout_intents, requeue_stale_checkout_intents,
+)
+from order.expiry import sweep_unpaid_orders
+from order.models import Cart, OrderProduct, Payment, Order, OrderStatusLog, SalesRollupWatermark
+from order.partitions import PARTITIONED_TABLES, filter_by_order_uids
+from order.payments.authorization import authorize_orders, get_unknown_payment_orders, reconcile_payments
+from order.payments.circuit_breaker import CircuitBreaker
+from order.payments.gateways import AuthorizationResult, PaymentGatewayError, PaymentGatewayUnavailable
+from order.refund import refund_order_products
+from order.sales_rollups import update_sales_rollups
+from order.serializers import MeCartSerializer
+from order.state_machine import transition_order_products, InvalidTransition
 from product.models import Product, ProductOption
+from product.stock import set_mirrored_stocks, get_stocks
 
 User = get_user_model()
 
@@ -75,6 +114,72 @@ class TestMeCartListCreateAPIViewPOST(ToyTestCase):
             {'id', 'user_id', 'quantity', 'product_option'}
         )
 
+    def test_같은_Idempotency_Key로_다시_요청하면_저장된_응답을_돌려주고_장바구니는_한번만_추가됨_201_성공(self):
+        count_query = Cart.objects.filter(user=self.normal_user)
+        cart_count_before_cart_create = count_query.count()
+        idempotency_key = str(uuid.uuid4())
+
+        self.client.force_authenticate(user=self.normal_user)
+        responses = [
+            self.client.post(
+                path=self.api_url,
+                content_type='application/json',
+                data=json.dumps({
+                    'product_option_id': self.product1_option.id,
+                    'quantity': 1
+                }),
+                HTTP_IDEMPOTENCY_KEY=idempotency_key,
+            ) for _ in range(2)
+        ]
+
+        self.assertEqual([response.status_code for response in responses], [201, 201])
+        self.assertEqual(responses[0].json(), responses[1].json())
+        self.assertNotIn('Idempotent-Replayed', responses[0])
+        self.assertEqual(responses[1]['Idempotent-Replayed'], 'true')
+        self.assertEqual(count_query.count(), cart_count_before_cart_create + 1)
+
+    def test_같은_Idempotency_Key로_다른_내용을_요청하면_422_에러(self):
+        idempotency_key = str(uuid.uuid4())
+
+        self.client.force_authenticate(user=self.normal_user)
+        responses = [
+            self.client.post(
+                path=self.api_url,
+                content_type='application/json',
+                data=json.dumps({
+                    'product_option_id': product_option.id,
+                    'quantity': 1
+                }),
+                HTTP_IDEMPOTENCY_KEY=idempotency_key,
+            ) for product_option in (self.product1_option, self.product2_option)
+        ]
+
+        self.assertEqual([response.status_code for response in responses], [201, 422])
+        self.assertEqual(Cart.objects.filter(user=self.normal_user).count(), 1)
+
+    @override_settings(IDEMPOTENCY_WAIT_TIMEOUT=0)
+    def test_같은_Idempotency_Key의_요청이_처리중이면_기다리다가_409_에러(self):
+        idempotency_key = str(uuid.uuid4())
+        cache.add(
+            IDEMPOTENCY_KEY_(self.normal_user.id, 'MeCartListCreateAPIView', idempotency_key),
+            {'fingerprint': 'fingerprint', 'response': None},
+        )
+
+        self.client.force_authenticate(user=self.normal_user)
+        with mock.patch.object(IdempotentCreateMixin, 'get_request_fingerprint', return_value='fingerprint'):
+            response = self.client.post(
+                path=self.api_url,
+                content_type='application/json',
+                data=json.dumps({
+                    'product_option_id': self.product1_option.id,
+                    'quantity': 1
+                }),
+                HTTP_IDEMPOTENCY_KEY=idempotency_key,
+            )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Cart.objects.filter(user=self.normal_user).exists())
+
     def test_로그인을_하지_않은_사용자가_장바구니에_상품옵션을_장바구니에_추가하려고하면_401_에러(self):
         count_query = Cart.objects.filter(user=self.normal_user)
         cart_count_before_cart_create = count_query.count()
@@ -155,6 +260,110 @@ class TestMeCartListCreateAPIViewPOST(ToyTestCase):
         self.assertEqual(count_query.count(), cart_count_after_cart_create + 0)
         self.assertEqual(response.json(), {'non_field_errors': ['이미 장바구니에 있는 상품 옵션입니다.']})
 
+    @override_settings(PRODUCT_STOCK_MIRROR_ENABLED=True)
+    def test_재고_미러를_사용하면_미러링된_재고가_부족한_상품옵션을_장바구니에_담으려할_때_400_에러(self):
+        set_mirrored_stocks({self.product1_option.id: 0})
+        count_query = Cart.objects.filter(user=self.normal_user)
+        cart_count_before_cart_create = count_query.count()
+
+        self.client.force_authenticate(user=self.normal_user)
+        response = self.client.post(
+            path=self.api_url,
+            content_type='application/json',
+            data=json.dumps({
+                'product_option_id': self.product1_option.id,
+                'quantity': 1
+            })
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(count_query.count(), cart_count_before_cart_create + 0)
+        self.assertEqual(response.json(), {'non_field_errors': ['해당 옵션의 재고가 부족합니다.']})
+
+    @override_settings(PRODUCT_STOCK_MIRROR_ENABLED=True)
+    def test_재고_미러의_재고가_부족하면_상품옵션_row를_읽지_않고_400_에러(self):
+        set_mirrored_stocks({self.product1_option.id: 0})
+
+        self.client.force_authenticate(user=self.normal_user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                path=self.api_url,
+                content_type='application/json',
+                data=json.dumps({
+                    'product_option_id': self.product1_option.id,
+                    'quantity': 1
+                })
+            )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse([query for query in queries if '"product_option"' in query['sql']])
+
+    @override_settings(PRODUCT_STOCK_MIRROR_ENABLED=True)
+    def test_재고_미러에_없는_상품옵션의_재고는_DB에서_읽어서_미러에_채움(self):
+        self.product2_option.stock = 7
+        self.product2_option.save()
+
+        self.assertEqual(get_stocks([self.product2_option.id]), {self.product2_option.id: 7})
+
+        ProductOption.objects.filter(id=self.product2_option.id).update(stock=3)
+
+        self.assertEqual(get_stocks([self.product2_option.id]), {self.product2_option.id: 7})
+
+    @override_settings(CART_UPSERT_ENABLED=True)
+    def test_upsert_모드에서_이미_장바구니에_있는_상품옵션을_다시_담으면_수량이_합쳐지고_201_성공(self):
+        self.client.force_authenticate(user=self.normal_user)
+        responses = [
+            self.client.post(
+                path=self.api_url,
+                content_type='application/json',
+                data=json.dumps({
+                    'product_option_id': self.product1_option.id,
+                    'quantity': quantity,
+                })
+            ) for quantity in (3, 4)
+        ]
+
+        self.assertEqual([response.status_code for response in responses], [201, 201])
+        self.assertEqual(responses[0].json()['id'], responses[1].json()['id'])
+        self.assertEqual(responses[1].json()['quantity'], 7)
+        self.assertEqual(Cart.objects.get(user=self.normal_user, product_option=self.product1_option).quantity, 7)
+
+    @override_settings(CART_UPSERT_ENABLED=True)
+    def test_upsert_모드에서_합쳐진_수량이_재고보다_많으면_수량이_바뀌지_않고_400_에러(self):
+        Cart.objects.create(user=self.normal_user, product_option=self.product1_option, quantity=8)
+
+        self.client.force_authenticate(user=self.normal_user)
+        response = self.client.post(
+            path=self.api_url,
+            content_type='application/json',
+            data=json.dumps({
+                'product_option_id': self.product1_option.id,
+                'quantity': 3,
+            })
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'non_field_errors': ['해당 옵션의 재고가 부족합니다.']})
+        self.assertEqual(Cart.objects.get(user=self.normal_user, product_option=self.product1_option).quantity, 8)
+
+    @override_settings(CART_UPSERT_ENABLED=True)
+    def test_upsert_모드에서는_레디스_락_없이_장바구니에_담고_201_성공(self):
+        lock_key = CART_CREATE_LOCK_USER_(self.normal_user.id)
+        has_obtained_redis_lock(lock_key, 5)
+
+        self.client.force_authenticate(user=self.normal_user)
+        response = self.client.post(
+            path=self.api_url,
+            content_type='application/json',
+            data=json.dumps({
+                'product_option_id': self.product1_option.id,
+                'quantity': 1,
+            })
+        )
+        release_redis_lock(lock_key)
+
+        self.assertEqual(response.status_code, 201)
+
     def test_로그인한_사용자가_장바구니에_상품옵션을_담으려할_때_잘못된_형식의_값들을_Request_Body에_포함하면_400_에러(self):
         count_query = Cart.objects.filter(user=self.normal_user)
         cart_count_before_cart_create = count_query.count()
@@ -239,6 +448,274 @@ class TestMeCartListCreateAPIViewPOST(ToyTestCase):
         self.assertEqual(response.json(), '처리중입니다.')
 
 
+class WriteBehindAPIClient(APIClient):
+    """
+    요청마다 Redis 장바구니를 cart 테이블에 기록해서 DB 장바구니와 같은 assertion으로 검사할 수 있게 합니다.
+    """
+    def request(self, **kwargs):
+        response = super().request(**kwargs)
+        call_command('flush_cart_store', once=True, stdout=StringIO())
+        return response
+
+
+class RedisCartBackendMixin:
+    def setUp(self):
+        super().setUp()
+        # 이전 테스트에서 같은 user id로 남은 Redis 장바구니를 지운다.
+        cache.delete_many([
+            cart_key(user_id)
+            for user_id in User.objects.values_list('id', flat=True)
+            for cart_key in (CART_QUANTITIES_USER_, CART_IDS_USER_)
+        ])
+        self.client = WriteBehindAPIClient()
+
+
+@override_settings(CART_BACKEND='redis')
+class TestMeCartListCreateAPIViewPOSTRedisBackend(RedisCartBackendMixin, TestMeCartListCreateAPIViewPOST):
+    @skip('Redis 장바구니는 한번의 명령으로 담기 때문에 lock을 잡지 않습니다.')
+    def test_로그인한_사용자가_장바구니에_상품을_담을_때_중복_요청으로_이미_프로세스가_진행중인_경우_423_에러(self):
+        pass
+
+    def test_Redis_장바구니는_레디스_락과_상관없이_담고_201_성공(self):
+        lock_key = CART_CREATE_LOCK_USER_(self.normal_user.id)
+        has_obtained_redis_lock(lock_key, 5)
+        self.client.force_authenticate(user=self.normal_user)
+        response = self.client.post(
+            path=self.api_url,
+            content_type='application/json',
+            data=json.dumps({
+                'product_option_id': self.product1_option.id,
+                'quantity': 1
+            })
+        )
+        release_redis_lock(lock_key)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Cart.objects.filter(user=self.normal_user).count(), 1)
+
+
+class TestMeCartBulkCreateAPIViewPOST(ToyTestCase):
+    api_url = '/users/me/carts/bulk'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.normal_user = self.create_normal_user()
+        self.provider = self.create_provider(
+            username='Ably',
+            name='Ably',
+            phone_number='01033333333',
+            email='ddd@naver.com',
+        )
+        self.product_options = []
+
+        for index in range(3):
+            product = Product.objects.create(
+                provider=self.provider,
+                name=f'product{index}',
+                price=3000,
+                shipping_price=0,
+                is_on_sale=True,
+                can_bundle=True,
+            )
+            self.product_options.append(ProductOption.objects.create(
+                product=product,
+                stock=10,
+                name='anything',
+            ))
+
+        self.normal_user_cart = Cart.objects.create(
+            user=self.normal_user,
+            product_option=self.product_options[0],
+            quantity=1,
+        )
+
+    def test_로그인한_사용자가_여러_상품옵션을_한번에_담으면_없는_옵션은_추가하고_있는_옵션은_수량을_바꾼_장바구니_201_성공(self):
+        self.client.force_authenticate(user=self.normal_user)
+        response = self.client.post(
+            path=self.api_url,
+            content_type='application/json',
+            data=json.dumps([
+                {'product_option_id': product_option.id, 'quantity': 3}
+                for product_option in self.product_options
+            ])
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            {cart['product_option']['id']: cart['quantity'] for cart in response.json()},
+            {product_option.id: 3 for product_option in self.product_options},
+        )
+        self.assertEqual(Cart.objects.filter(user=self.normal_user).count(), len(self.product_options))
+        self.normal_user_cart.refresh_from_db()
+        self.assertEqual(self.normal_user_cart.quantity, 3)
+
+    def test_로그인한_사용자가_여러_상품옵션을_한번에_담을_때_재고가_부족한_옵션이_있으면_아무것도_담기지_않고_400_에러(self):
+        self.client.force_authenticate(user=self.normal_user)
+        response = self.client.post(
+            path=self.api_url,
+            content_type='application/json',
+            data=json.dumps([
+                {'product_option_id': self.product_options[1].id, 'quantity': 1},
+                {'product_option_id': self.product_options[2].id, 'quantity': 11},
+            ])
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'non_field_errors': ['product2/anything 의 재고가 부족합니다']})
+        self.assertEqual(Cart.objects.filter(user=self.normal_user).count(), 1)
+
+    @override_settings(PRODUCT_STOCK_MIRROR_ENABLED=True)
+    def test_재고_미러로_검증한_뒤_DB_재고가_부족해지면_upsert에서_다시_확인해서_아무것도_바뀌지_않고_400_에러(self):
+        set_mirrored_stocks({product_option.id: 10 for product_option in self.product_options})
+        ProductOption.objects.filter(id=self.product_options[0].id).update(stock=2)
+
+        self.client.force_authenticate(user=self.normal_user)
+        response = self.client.post(
+            path=self.api_url,
+            content_type='application/json',
+            data=json.dumps([
+                {'product_option_id': product_option.id, 'quantity': 3}
+                for product_option in self.product_options
+            ])
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'non_field_errors': ['product0/anything 의 재고가 부족합니다']})
+        self.assertEqual(Cart.objects.filter(user=self.normal_user).count(), 1)
+        self.normal_user_cart.refresh_from_db()
+        self.assertEqual(self.normal_user_cart.quantity, 1)
+
+    def test_로그인한_사용자가_여러_상품옵션을_한번에_담을_때_같은_옵션이_중복되거나_없는_옵션이면_400_에러(self):
+        self.client.force_authenticate(user=self.normal_user)
+
+        for items, message in (
+                (
+                    [{'product_option_id': self.product_options[1].id, 'quantity': 1}] * 2,
+                    '같은 상품 옵션이 중복으로 포함되어 있습니다.',
+                ),
+                (
+                    [{'product_option_id': 0, 'quantity': 1}],
+                    '존재하지 않는 상품 옵션이 포함되어 있습니다.',
+                ),
+        ):
+            response = self.client.post(path=self.api_url, content_type='application/json', data=json.dumps(items))
+
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'non_field_errors': [message]})
+
+        self.assertEqual(Cart.objects.filter(user=self.normal_user).count(), 1)
+
+
+@override_settings(CART_BACKEND='redis')
+class TestMeCartRedisBackend(ToyTestCase):
+    api_url = '/users/me/carts'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.normal_user = self.create_normal_user()
+        self.provider = self.create_provider(
+            username='Ably',
+            name='Ably',
+            phone_number='01033333333',
+            email='ddd@naver.com',
+        )
+        self.product_options = []
+
+        for index in range(2):
+            product = Product.objects.create(
+                provider=self.provider,
+                name=f'product{index}',
+                price=3000,
+                shipping_price=2000,
+                is_on_sale=True,
+                can_bundle=True,
+            )
+            self.product_options.append(ProductOption.objects.create(
+                product=product,
+                stock=10,
+                name='anything',
+            ))
+
+        # 이전 테스트에서 같은 user id로 남은 Redis 장바구니를 지운다.
+        cache.delete_many([
+            CART_QUANTITIES_USER_(self.normal_user.id),
+            CART_IDS_USER_(self.normal_user.id),
+        ])
+        self.client.force_authenticate(user=self.normal_user)
+
+    def add_cart(self, product_option, quantity=1):
+        return self.client.post(
+            path=self.api_url,
+            content_type='application/json',
+            data=json.dumps({
+                'product_option_id': product_option.id,
+                'quantity': quantity,
+            })
+        )
+
+    def test_Redis_장바구니에_담은_상품옵션은_DB_장바구니와_같은_모양으로_조회되고_기록_후에는_같은_id로_저장됨(self):
+        response = self.add_cart(self.product_options[0], quantity=2)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(Cart.objects.filter(user=self.normal_user).exists())
+
+        response = self.client.get(self.api_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 1)
+        redis_cart = response.json()['results'][0]
+
+        call_command('flush_cart_store', once=True, stdout=StringIO())
+
+        cart = Cart.objects.get(user=self.normal_user)
+        self.assertEqual((cart.id, cart.quantity), (redis_cart['id'], 2))
+        self.assertEqual(
+            json.loads(JSONRenderer().render(MeCartSerializer(
+                Cart.objects.select_related('user', 'product_option__product__provider').get(id=cart.id)
+            ).data)),
+            redis_cart,
+        )
+
+    def test_DB에_있던_장바구니를_Redis로_불러오고_이미_있는_상품옵션을_담으면_400_에러(self):
+        cart = Cart.objects.create(user=self.normal_user, product_option=self.product_options[0], quantity=1)
+
+        response = self.add_cart(self.product_options[0])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'non_field_errors': ['이미 장바구니에 있는 상품 옵션입니다.']})
+        self.assertEqual([result['id'] for result in self.client.get(self.api_url).json()['results']], [cart.id])
+
+    def test_Redis_장바구니로_주문하면_주문_전에_DB에_기록되어_주문_201_성공(self):
+        cart_ids = [self.add_cart(product_option).json()['id'] for product_option in self.product_options]
+
+        response = self.client.post(
+            path='/users/me/orders',
+            content_type='application/json',
+            data=json.dumps({
+                'cart_ids': cart_ids,
+                'shipping_address': '서울시 동작구 아무곳이나',
+                'shipping_request_note': '경비실에 맡겨주세요',
+                'pay_method': 'CARD',
+            })
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            sorted(order_product['product_option']['id'] for order_product in response.json()['order_products']),
+            sorted(product_option.id for product_option in self.product_options),
+        )
+
+    def test_Redis_장바구니가_evict되어도_기록할_때_DB_장바구니가_지워지지_않음(self):
+        cart = Cart.objects.create(user=self.normal_user, product_option=self.product_options[0], quantity=1)
+        self.add_cart(self.product_options[1])
+
+        # 두 hash 중 하나만 evict되어도 다시 불러와야 한다.
+        cache.delete(CART_QUANTITIES_USER_(self.normal_user.id))
+        call_command('flush_cart_store', once=True, stdout=StringIO())
+
+        self.assertTrue(Cart.objects.filter(id=cart.id, quantity=1).exists())
+        self.assertIn(cart.id, [result['id'] for result in self.client.get(self.api_url).json()['results']])
+
+
 class TestMeCartListCreateAPIViewGET(ToyTestCase):
     api_url = '/users/me/carts'
 
@@ -332,6 +809,64 @@ class TestMeCartListCreateAPIViewGET(ToyTestCase):
             }
         )
 
+    def test_로그인한_사용자의_장바구니_리스트는_DRF_serializer로_직렬화한_결과와_바이트_단위로_같음_200_성공(self):
+        queryset = Cart.objects.select_related(
+            'user', 'product_option__product__provider'
+        ).filter(
+            user=self.me
+        ).order_by(
+            '-id'
+        )
+
+        self.client.force_authenticate(user=self.me)
+        response = self.client.get(path=self.api_url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            JSONRenderer().render(response.json()['results']),
+            JSONRenderer().render(MeCartSerializer(queryset, many=True).data),
+        )
+
+        fast_serializer = FastSerializer(MeCartSerializer)
+        self.assertEqual(
+            JSONRenderer().render(fast_serializer.serialize(fast_serializer.values_list(queryset))),
+            JSONRenderer().render(MeCartSerializer(queryset, many=True).data),
+        )
+
+    def test_로그인한_사용자의_장바구니가_변경되지_않았으면_If_None_Match로_요청할_때_304_성공(self):
+        self.client.force_authenticate(user=self.me)
+        response = self.client.get(path=self.api_url)
+
+        self.assertEqual(response.status_code, 200)
+
+        not_modified_response = self.client.get(path=self.api_url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(not_modified_response.status_code, 304)
+        self.assertEqual(not_modified_response.content, b'')
+
+        self.me_cart_option1.quantity = 3
+        self.me_cart_option1.save()
+        modified_response = self.client.get(path=self.api_url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(modified_response.status_code, 200)
+        self.assertNotEqual(modified_response['ETag'], response['ETag'])
+
+    def test_장바구니를_삭제하면_If_Modified_Since로_요청해도_304가_아닌_200_성공(self):
+        self.client.force_authenticate(user=self.me)
+        response = self.client.get(path=self.api_url)
+
+        self.assertEqual(response.status_code, 200)
+
+        deleted_cart_id = self.me_cart_option1.id
+        with mock.patch('order.cache.time.time', return_value=time.time() + 10):
+            self.me_cart_option1.delete()
+
+        modified_response = self.client.get(path=self.api_url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+
+        self.assertEqual(modified_response.status_code, 200)
+        self.assertNotEqual(modified_response['ETag'], response['ETag'])
+        self.assertNotIn(deleted_cart_id, [cart['id'] for cart in modified_response.json()['results']])
+
     def test_로그인하지_않은_사용자가_장바구니_리스트를_확인하려고_할_시_401_에러(self):
         response = self.client.get(path=self.api_url)
 
@@ -339,46 +874,171 @@ class TestMeCartListCreateAPIViewGET(ToyTestCase):
         self.assertEqual(response.json(), {'detail': '자격 인증데이터(authentication credentials)가 제공되지 않았습니다.'})
 
 
-class TestMeOrderCreateAPIViewPOST(ToyTestCase):
-    api_url = '/users/me/orders'
+@override_settings(CART_BACKEND='redis')
+class TestMeCartListCreateAPIViewGETRedisBackend(RedisCartBackendMixin, TestMeCartListCreateAPIViewGET):
+    pass
+
+
+class TestMeCartSummaryAPIViewGET(ToyTestCase):
+    api_url = '/users/me/carts/summary'
 
     def setUp(self):
         self.client = APIClient()
         self.me = self.create_normal_user()
-        self.provider1 = self.create_provider(
+        self.provider = self.create_provider(
             username='Ably',
             name='Ably',
             phone_number='01033333333',
             email='ddd@naver.com',
         )
-        self.provider2 = self.create_provider(
-            username='zigzag',
-            name='셀럽입점사',
-            phone_number='01033334444',
-            email='aaa@naver.com',
+        self.other_provider = self.create_provider(
+            username='Musinsa',
+            name='Musinsa',
+            phone_number='01044444444',
+            email='eee@naver.com',
         )
-
-        self.product1 = Product.objects.create(
-            provider=self.provider1,
-            name='product1',
+        self.bundle_product = Product.objects.create(
+            provider=self.provider,
+            name='bundle',
             price=3000,
-            shipping_price=2000,
+            shipping_price=2500,
             is_on_sale=True,
             can_bundle=True,
         )
-        self.product1_option1 = ProductOption.objects.create(
-            product=self.product1,
-            stock=10,
-            name='anything',
+        self.cheap_bundle_product = Product.objects.create(
+            provider=self.provider,
+            name='cheap bundle',
+            price=1000,
+            shipping_price=2000,
+            is_on_sale=True,
+            can_bundle=True,
         )
-
-        self.product2 = Product.objects.create(
-            provider=self.provider1,
-            name='product2',
-            price=3000,
+        self.no_bundle_product = Product.objects.create(
+            provider=self.other_provider,
+            name='no bundle',
+            price=5000,
             shipping_price=3000,
             is_on_sale=True,
-            can_bundle=True,
+            can_bundle=False,
+        )
+        self.product_options = [
+            ProductOption.objects.create(product=product, stock=100, name=name)
+            for product, name in (
+                (self.bundle_product, 'S'),
+                (self.bundle_product, 'M'),
+                (self.cheap_bundle_product, 'S'),
+                (self.no_bundle_product, 'S'),
+            )
+        ]
+        self.me_carts = [
+            Cart.objects.create(user=self.me, product_option=product_option, quantity=2)
+            for product_option in self.product_options[:3]
+        ]
+        cache.delete(CART_SUMMARY_USER_(self.me.id))
+
+    def test_장바구니_요약은_주문할_때와_같은_규칙으로_입점사별_묶음배송비를_계산하고_200_성공(self):
+        self.client.force_authenticate(user=self.me)
+        response = self.client.get(self.api_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'cart_count': 3,
+            'products_price': 3000 * 2 + 3000 * 2 + 1000 * 2,
+            'shipping_price': 2000,
+            'total_price': 14000 + 2000,
+            'providers': [
+                {
+                    'provider_id': self.provider.id,
+                    'provider_name': 'Ably',
+                    'products_price': 14000,
+                    'shipping_price': 2000,
+                },
+            ],
+        })
+
+        order = place_order(
+            self.me,
+            load_carts(self.me, [cart.id for cart in self.me_carts]),
+            create_order_uid(),
+            shipping_address='서울시 동작구 아무곳이나',
+            shipping_request_note='경비실에 맡겨주세요',
+            pay_method='CARD',
+        )
+        self.assertEqual(order.shipping_price, response.json()['shipping_price'])
+        self.assertEqual(order.payment.pay_price, response.json()['total_price'])
+
+    def test_장바구니와_상품이_바뀌지_않았으면_쿼리_없이_캐시된_요약을_돌려주고_200_성공(self):
+        self.client.force_authenticate(user=self.me)
+        first_response = self.client.get(self.api_url)
+        self.assertEqual(first_response.status_code, 200)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.api_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), first_response.json())
+        self.assertEqual(len(context.captured_queries), 0)
+
+    def test_장바구니에_상품을_담거나_상품_가격이_바뀌면_요약이_다시_계산되고_200_성공(self):
+        self.client.force_authenticate(user=self.me)
+        self.client.get(self.api_url)
+
+        Cart.objects.create(user=self.me, product_option=self.product_options[3], quantity=1)
+        response = self.client.get(self.api_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['cart_count'], 4)
+        self.assertEqual(response.json()['products_price'], 14000 + 5000)
+        self.assertEqual(response.json()['shipping_price'], 2000 + 3000)
+
+        self.cheap_bundle_product.price = 1500
+        self.cheap_bundle_product.save()
+        response = self.client.get(self.api_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['products_price'], 15000 + 5000)
+
+    def test_로그인하지_않은_사용자가_장바구니_요약을_확인하려고_할_시_401_에러(self):
+        response = self.client.get(self.api_url)
+        self.assertEqual(response.status_code, 401)
+
+
+class TestMeOrderCreateAPIViewPOST(ToyTestCase):
+    api_url = '/users/me/orders'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.me = self.create_normal_user()
+        self.provider1 = self.create_provider(
+            username='Ably',
+            name='Ably',
+            phone_number='01033333333',
+            email='ddd@naver.com',
+        )
+        self.provider2 = self.create_provider(
+            username='zigzag',
+            name='셀럽입점사',
+            phone_number='01033334444',
+            email='aaa@naver.com',
+        )
+
+        self.product1 = Product.objects.create(
+            provider=self.provider1,
+            name='product1',
+            price=3000,
+            shipping_price=2000,
+            is_on_sale=True,
+            can_bundle=True,
+        )
+        self.product1_option1 = ProductOption.objects.create(
+            product=self.product1,
+            stock=10,
+            name='anything',
+        )
+
+        self.product2 = Product.objects.create(
+            provider=self.provider1,
+            name='product2',
+            price=3000,
+            shipping_price=3000,
+            is_on_sale=True,
+            can_bundle=True,
         )
         self.product2_option1 = ProductOption.objects.create(
             product=self.product2,
@@ -722,6 +1382,82 @@ class TestMeOrderCreateAPIViewPOST(ToyTestCase):
             }
         )
 
+    def test_주문하는_장바구니_개수와_상관없이_같은_수의_쿼리로_주문_201_성공(self):
+        self.client.force_authenticate(user=self.me)
+        query_counts = []
+
+        for cart_ids_to_order in (
+                [self.me_cart_option1.id],
+                [self.me_cart_option1.id, self.me_cart_option2.id, self.me_cart_option3.id, self.me_cart_option4.id],
+        ):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(
+                    path=self.api_url,
+                    content_type='application/json',
+                    data=json.dumps({
+                        'cart_ids': cart_ids_to_order,
+                        'shipping_address': '서울시 동작구 아무곳이나',
+                        'shipping_request_note': '경비실에 맡겨주세요',
+                        'pay_method': 'CARD',
+                    })
+                )
+
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(response.json()['order_products']), len(cart_ids_to_order))
+            query_counts.append(len(context.captured_queries))
+
+        self.assertEqual(query_counts[0], query_counts[1])
+
+    def test_로그인한_사용자가_본인_장바구니에_있는_상품옵션들을_주문하면_주문한_수량만큼_재고가_차감되고_201_성공(self):
+        cart_ids_to_order = [self.me_cart_option1.id, self.me_cart_option2.id]
+
+        self.client.force_authenticate(user=self.me)
+        response = self.client.post(
+            path=self.api_url,
+            content_type='application/json',
+            data=json.dumps({
+                'cart_ids': cart_ids_to_order,
+                'shipping_address': '서울시 동작구 아무곳이나',
+                'shipping_request_note': '경비실에 맡겨주세요',
+                'pay_method': 'CARD',
+            })
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.product1_option1.refresh_from_db()
+        self.product2_option1.refresh_from_db()
+        self.product3_option1.refresh_from_db()
+        self.assertEqual(self.product1_option1.stock, 10 - self.me_cart_option1.quantity)
+        self.assertEqual(self.product2_option1.stock, 10 - self.me_cart_option2.quantity)
+        self.assertEqual(self.product3_option1.stock, 10)
+
+    @override_settings(PRODUCT_STOCK_MIRROR_ENABLED=True)
+    def test_검증_이후에_재고가_부족해지면_주문_전체가_rollback_되고_400_에러(self):
+        order_count_query = Order.objects.filter(user=self.me)
+        order_count_before_order_create = order_count_query.count()
+        set_mirrored_stocks({self.product1_option1.id: 10, self.product2_option1.id: 10})
+        ProductOption.objects.filter(id=self.product2_option1.id).update(stock=1)
+
+        self.client.force_authenticate(user=self.me)
+        response = self.client.post(
+            path=self.api_url,
+            content_type='application/json',
+            data=json.dumps({
+                'cart_ids': [self.me_cart_option1.id, self.me_cart_option2.id],
+                'shipping_address': '서울시 동작구 아무곳이나',
+                'shipping_request_note': '경비실에 맡겨주세요',
+                'pay_method': 'CARD',
+            })
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'non_field_errors': ['product2/anything 의 재고가 부족합니다']})
+        self.assertEqual(order_count_query.count(), order_count_before_order_create)
+        self.product1_option1.refresh_from_db()
+        self.product2_option1.refresh_from_db()
+        self.assertEqual(self.product1_option1.stock, 10)
+        self.assertEqual(self.product2_option1.stock, 1)
+
     def test_로그인한_사용자가_본인_장바구니에_있는_상품옵션을_주문할_때_다른_사용자_주문의_레디스_락과_상관없이_201_성공(self):
         order_count_query = Order.objects.filter(user=self.me)
         order_product_count_query = OrderProduct.objects.filter(user=self.me)
@@ -815,3 +1551,1109 @@ class TestMeOrderCreateAPIViewPOST(ToyTestCase):
         self.assertEqual(order_count_query.count(), order_count_before_order_create + 0)
         self.assertEqual(order_product_count_query.count(), order_product_count_before_order_create + 0)
         self.assertEqual(payment_count_query.count(), payment_count_before_order_create + 0)
+
+
+@override_settings(ORDER_CHECKOUT_MODE='async')
+class TestMeOrderAsyncCheckout(ToyTestCase):
+    api_url = '/users/me/orders'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.me = self.create_normal_user()
+        self.provider = self.create_provider(
+            username='Ably',
+            name='Ably',
+            phone_number='01033333333',
+            email='ddd@naver.com',
+        )
+        self.product = Product.objects.create(
+            provider=self.provider,
+            name='product1',
+            price=3000,
+            shipping_price=2000,
+            is_on_sale=True,
+            can_bundle=True,
+        )
+        self.product_option = ProductOption.objects.create(
+            product=self.product,
+            stock=10,
+            name='anything',
+        )
+        self.me_cart = Cart.objects.create(
+            user=self.me,
+            product_option=self.product_option,
+            quantity=3,
+        )
+
+    def request_checkout(self):
+        self.client.force_authenticate(user=self.me)
+        return self.client.post(
+            path=self.api_url,
+            content_type='application/json',
+            data=json.dumps({
+                'cart_ids': [self.me_cart.id],
+                'shipping_address': '서울시 동작구 아무곳이나',
+                'shipping_request_note': '경비실에 맡겨주세요',
+                'pay_method': 'CARD',
+            })
+        )
+
+    def get_checkout_status(self, order_uid):
+        return self.client.get(f'{self.api_url}/{order_uid}/status')
+
+    def test_비동기_주문은_202로_접수되고_worker가_처리하면_주문이_만들어짐_성공(self):
+        response = self.request_checkout()
+
+        self.assertEqual(response.status_code, 202)
+        order_uid = response.json()['order_uid']
+        self.assertEqual(response.json()['status'], 'PENDING')
+        self.assertFalse(Order.objects.filter(order_uid=order_uid).exists())
+        self.assertEqual(self.get_checkout_status(order_uid).json()['status'], 'PENDING')
+
+        call_command('run_checkout_workers', once=True, stdout=StringIO())
+
+        order = Order.objects.get(order_uid=order_uid)
+        response = self.get_checkout_status(order_uid)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {'order_uid': order_uid, 'status': 'CREATED', 'order_id': order.id, 'errors': None},
+        )
+        self.assertEqual(order.payment.pay_price, 3000 * 3 + 2000)
+        self.product_option.refresh_from_db()
+        self.assertEqual(self.product_option.stock, 7)
+
+    def test_비동기_주문을_처리할_때_재고가_부족하면_주문_상태가_FAILED(self):
+        order_uid = self.request_checkout().json()['order_uid']
+        ProductOption.objects.filter(id=self.product_option.id).update(stock=1)
+
+        call_command('run_checkout_workers', once=True, stdout=StringIO())
+
+        response = self.get_checkout_status(order_uid)
+        self.assertEqual(response.json()['status'], 'FAILED')
+        self.assertEqual(response.json()['errors'], {'non_field_errors': ['product1/anything 의 재고가 부족합니다']})
+        self.assertFalse(Order.objects.filter(order_uid=order_uid).exists())
+
+    def test_worker가_주문_요청을_꺼낸_뒤_죽어도_처리중_리스트에서_다시_큐에_넣어_주문이_만들어짐_성공(self):
+        order_uid = self.request_checkout().json()['order_uid']
+
+        # 주문 요청을 꺼내고 처리하기 전에 worker가 죽은 경우
+        self.assertEqual(len(pop_checkout_intents(10, timeout=0)), 1)
+        self.assertEqual(pop_checkout_intents(10, timeout=0), [])
+        self.assertEqual(self.get_checkout_status(order_uid).json()['status'], 'PENDING')
+
+        self.assertEqual(requeue_stale_checkout_intents(0), 1)
+        call_command('run_checkout_workers', once=True, stdout=StringIO())
+
+        order = Order.objects.get(order_uid=order_uid)
+        self.assertEqual(self.get_checkout_status(order_uid).json()['order_id'], order.id)
+        self.assertEqual(requeue_stale_checkout_intents(0), 0)
+
+    def test_주문_요청_처리중_예상하지_못한_예외가_발생하면_다른_요청은_처리하고_실패한_요청은_ack하지_않음(self):
+        failed_order_uid = self.request_checkout().json()['order_uid']
+        order_uid = self.request_checkout().json()['order_uid']
+        place_order_ = place_order
+
+        def fail_first_order(user, carts, order_uid, **kwargs):
+            if order_uid == failed_order_uid:
+                raise RuntimeError('connection lost')
+            return place_order_(user, carts, order_uid, **kwargs)
+
+        stderr = StringIO()
+        with mock.patch('order.checkout.place_order', side_effect=fail_first_order):
+            call_command('run_checkout_workers', once=True, stdout=StringIO(), stderr=stderr)
+
+        self.assertIn(failed_order_uid, stderr.getvalue())
+        self.assertTrue(Order.objects.filter(order_uid=order_uid).exists())
+        self.assertFalse(Order.objects.filter(order_uid=failed_order_uid).exists())
+        self.assertEqual(self.get_checkout_status(failed_order_uid).json()['status'], 'PENDING')
+
+        with override_settings(ORDER_CHECKOUT_MAX_ATTEMPTS=1):
+            self.assertEqual(requeue_stale_checkout_intents(0), 0)
+
+        self.assertEqual(self.get_checkout_status(failed_order_uid).json()['status'], 'FAILED')
+
+    def test_주문을_commit한_뒤_ack하기_전에_worker가_죽은_요청은_최대_시도_횟수가_지나도_CREATED(self):
+        order_uid = self.request_checkout().json()['order_uid']
+        item, = pop_checkout_intents(10, timeout=0)
+        intent = json.loads(item)
+        order = place_order(
+            self.me, load_carts(self.me, intent['cart_ids']), order_uid,
+            shipping_address=intent['shipping_address'],
+            shipping_request_note=intent['shipping_request_note'],
+            pay_method=intent['pay_method'],
+        )
+
+        with override_settings(ORDER_CHECKOUT_MAX_ATTEMPTS=1):
+            self.assertEqual(requeue_stale_checkout_intents(0), 0)
+
+        response = self.get_checkout_status(order_uid)
+        self.assertEqual(response.json()['status'], 'CREATED')
+        self.assertEqual(response.json()['order_id'], order.id)
+
+    def test_다른_사용자의_주문_상태를_조회하면_404_에러(self):
+        order_uid = self.request_checkout().json()['order_uid']
+        other_user = User.objects.create_user(
+            username='other',
+            password='toyproject12!@',
+            name='다른사용자',
+            email='other@gmail.com',
+            phone_number='01011112222',
+        )
+
+        self.client.force_authenticate(user=other_user)
+        response = self.get_checkout_status(order_uid)
+
+        self.assertEqual(response.status_code, 404)
+
+
+class TestMeOrderListRetrieveAPIViewGET(ToyTestCase):
+    api_url = '/users/me/orders'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.me = self.create_normal_user()
+        self.provider = self.create_provider(
+            username='Ably',
+            name='Ably',
+            phone_number='01033333333',
+            email='ddd@naver.com',
+        )
+        self.product_options = []
+
+        for index in range(2):
+            product = Product.objects.create(
+                provider=self.provider,
+                name=f'product{index}',
+                price=3000,
+                shipping_price=2000,
+                is_on_sale=True,
+                can_bundle=True,
+            )
+            self.product_options.append(ProductOption.objects.create(
+                product=product,
+                stock=100,
+                name='anything',
+            ))
+
+        self.me_carts = [
+            Cart.objects.create(user=self.me, product_option=product_option, quantity=1)
+            for product_option in self.product_options
+        ]
+
+    def create_order(self, carts):
+        return place_order(
+            self.me,
+            load_carts(self.me, [cart.id for cart in carts]),
+            create_order_uid(),
+            shipping_address='서울시 동작구 아무곳이나',
+            shipping_request_note='경비실에 맡겨주세요',
+            pay_method='CARD',
+        )
+
+    def test_주문_내역은_주문_수와_주문_상품_수에_상관없이_같은_수의_쿼리로_조회되고_200_성공(self):
+        self.client.force_authenticate(user=self.me)
+        self.create_order(self.me_carts[:1])
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.api_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 1)
+        query_count_with_one_order = len(context.captured_queries)
+
+        for _ in range(3):
+            self.create_order(self.me_carts)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.api_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 4)
+        self.assertEqual(len(context.captured_queries), query_count_with_one_order)
+
+    def test_주문_내역은_최신순으로_cursor를_따라가면_중복_없이_모두_조회되고_200_성공(self):
+        orders = [self.create_order(self.me_carts) for _ in range(5)]
+        self.client.force_authenticate(user=self.me)
+        order_ids = []
+
+        with mock.patch.object(KeysetPagination, 'page_size', 2):
+            url = self.api_url
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                order_ids.extend(order['id'] for order in response.json()['results'])
+                url = response.json()['next']
+
+        self.assertEqual(order_ids, [order.id for order in reversed(orders)])
+
+    def test_주문_상세는_order_uid로_조회되고_다른_사용자의_주문은_404_에러(self):
+        order = self.create_order(self.me_carts)
+        other_user = User.objects.create_user(
+            username='other',
+            password='toyproject12!@',
+            name='다른사용자',
+            email='other@gmail.com',
+            phone_number='01011112222',
+        )
+
+        self.client.force_authenticate(user=self.me)
+        response = self.client.get(f'{self.api_url}/{order.order_uid}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], order.id)
+        self.assertEqual(len(response.json()['order_products']), len(self.me_carts))
+
+        self.client.force_authenticate(user=other_user)
+        response = self.client.get(f'{self.api_url}/{order.order_uid}')
+        self.assertEqual(response.status_code, 404)
+
+    def test_Snowflake_이전_형식의_order_uid로_만든_주문도_order_uid로_조회되고_200_성공(self):
+        legacy_order_uid = '2020718153045127'
+        legacy_created_at = datetime.datetime(2020, 7, 18, 15, 30, 45, tzinfo=datetime.timezone.utc)
+        order = place_order(
+            self.me,
+            load_carts(self.me, [cart.id for cart in self.me_carts]),
+            legacy_order_uid,
+            shipping_address='서울시 동작구 아무곳이나',
+            shipping_request_note='경비실에 맡겨주세요',
+            pay_method='CARD',
+        )
+        for model in (OrderProduct, Payment):
+            model.objects.filter(order_id=order.id).update(created_at=legacy_created_at)
+        Order.objects.filter(id=order.id).update(created_at=legacy_created_at)
+
+        self.client.force_authenticate(user=self.me)
+        response = self.client.get(f'{self.api_url}/{legacy_order_uid}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['id'], response.json()['order_uid']), (order.id, legacy_order_uid))
+        self.assertEqual(len(response.json()['order_products']), len(self.me_carts))
+
+        with self.assertRaises(IntegrityError):
+            place_order(
+                self.me,
+                load_carts(self.me, [self.me_carts[0].id]),
+                legacy_order_uid,
+                shipping_address='서울시 동작구 아무곳이나',
+                shipping_request_note='경비실에 맡겨주세요',
+                pay_method='CARD',
+            )
+
+    def test_order_uid_형식이_잘못되면_404_에러(self):
+        self.create_order(self.me_carts)
+        self.client.force_authenticate(user=self.me)
+
+        response = self.client.get(f'{self.api_url}/not-a-uid')
+        self.assertEqual(response.status_code, 404)
+
+    def test_같은_order_uid로_주문을_다시_만들면_IntegrityError(self):
+        order = self.create_order(self.me_carts[:1])
+
+        with self.assertRaises(IntegrityError):
+            place_order(
+                self.me,
+                load_carts(self.me, [self.me_carts[1].id]),
+                order.order_uid,
+                shipping_address='서울시 동작구 아무곳이나',
+                shipping_request_note='경비실에 맡겨주세요',
+                pay_method='CARD',
+            )
+        self.assertEqual(Order.objects.filter(order_uid=order.order_uid).count(), 1)
+
+    def test_pruning_slack_밖으로_옮겨진_주문의_order_uid로_다시_만들어도_IntegrityError(self):
+        order = self.create_order(self.me_carts[:1])
+        Order.objects.filter(id=order.id).update(created_at=order.created_at - datetime.timedelta(days=40))
+        self.assertFalse(filter_by_order_uids(Order.objects, [order.order_uid]).exists())
+
+        with self.assertRaises(IntegrityError):
+            place_order(
+                self.me,
+                load_carts(self.me, [self.me_carts[1].id]),
+                order.order_uid,
+                shipping_address='서울시 동작구 아무곳이나',
+                shipping_request_note='경비실에 맡겨주세요',
+                pay_method='CARD',
+            )
+        self.assertEqual(Order.objects.filter(order_uid=order.order_uid).count(), 1)
+
+
+class TestOrderProductRefundAPIViewPOST(ToyTestCase):
+    api_url = '/order-products/refunds'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.me = self.create_normal_user()
+        self.admin = User.objects.create_user(
+            username='admin',
+            password='toyproject12!@',
+            name='관리자',
+            email='admin@gmail.com',
+            phone_number='01099999999',
+            is_staff=True,
+        )
+        self.provider = self.create_provider(
+            username='Ably',
+            name='Ably',
+            phone_number='01033333333',
+            email='ddd@naver.com',
+        )
+        self.product_options = []
+
+        for index in range(2):
+            product = Product.objects.create(
+                provider=self.provider,
+                name=f'product{index}',
+                price=3000,
+                shipping_price=2000,
+                is_on_sale=True,
+                can_bundle=True,
+            )
+            self.product_options.append(ProductOption.objects.create(
+                product=product,
+                stock=100,
+                name='anything',
+            ))
+
+        carts = [
+            Cart.objects.create(user=self.me, product_option=product_option, quantity=3)
+            for product_option in self.product_options
+        ]
+        self.order = place_order(
+            self.me,
+            load_carts(self.me, [cart.id for cart in carts]),
+            create_order_uid(),
+            shipping_address='서울시 동작구 아무곳이나',
+            shipping_request_note='경비실에 맡겨주세요',
+            pay_method='CARD',
+        )
+        self.order_products = list(self.order.order_products.order_by('id'))
+        OrderProduct.objects.filter(order=self.order).update(status=OrderProduct.STATUS_CHOICE.PAID)
+
+    def test_부분_환불과_전체_환불을_하면_상태_환불_금액_재고가_바뀌고_모두_환불되면_배송비까지_환불_200_성공(self):
+        self.client.force_authenticate(user=self.admin)
+        first, second = self.order_products
+
+        response = self.client.post(self.api_url, [
+            {'order_product_id': first.id, 'quantity': 1},
+            {'order_product_id': second.id},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'refunded': [
+                {'order_product_id': first.id, 'quantity': 1},
+                {'order_product_id': second.id, 'quantity': 3},
+            ],
+            'skipped_order_product_ids': [],
+        })
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, OrderProduct.STATUS_CHOICE.PARTIAL_REFUND)
+        self.assertEqual(first.refunded_price, 3000)
+        self.assertEqual(second.status, OrderProduct.STATUS_CHOICE.REFUND)
+        self.assertEqual(second.refunded_price, 9000)
+        self.assertEqual(Payment.objects.get(order=self.order).refunded_price, 3000 + 9000)
+        self.assertEqual(
+            list(ProductOption.objects.order_by('id').values_list('stock', flat=True)),
+            [100 - 3 + 1, 100],
+        )
+
+        response = self.client.post(self.api_url, [{'order_product_id': first.id}], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['refunded'], [{'order_product_id': first.id, 'quantity': 2}])
+        self.assertEqual(Payment.objects.get(order=self.order).refunded_price, 3000 * 6 + 2000)
+
+    def test_남은_수량보다_많이_환불하거나_결제되지_않은_주문_상품은_건너뛰고_200_성공(self):
+        self.client.force_authenticate(user=self.admin)
+        first, second = self.order_products
+        OrderProduct.objects.filter(id=second.id).update(status=OrderProduct.STATUS_CHOICE.PENDING)
+
+        response = self.client.post(self.api_url, [
+            {'order_product_id': first.id, 'quantity': 4},
+            {'order_product_id': second.id},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['refunded'], [])
+        self.assertEqual(response.json()['skipped_order_product_ids'], [first.id, second.id])
+        self.assertFalse(OrderProduct.objects.filter(refunded_quantity__gt=0).exists())
+
+    def test_환불하는_주문_상품_수와_상관없이_같은_수의_쿼리로_환불_200_성공(self):
+        self.client.force_authenticate(user=self.admin)
+        first, second = self.order_products
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.post(self.api_url, [{'order_product_id': first.id, 'quantity': 1}], format='json')
+        query_count_with_one_order_product = len(context.captured_queries)
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.post(self.api_url, [
+                {'order_product_id': first.id, 'quantity': 1},
+                {'order_product_id': second.id, 'quantity': 1},
+            ], format='json')
+        self.assertEqual(len(context.captured_queries), query_count_with_one_order_product)
+
+    def test_CSV_파일로_환불하면_batch_단위로_환불_성공(self):
+        first, second = self.order_products
+        file = StringIO(
+            'order_product_id,quantity\n'
+            f'{first.id},1\n'
+            f'{first.id},1\n'
+            f'{second.id},\n'
+            'wrong,1\n'
+        )
+        stdout, stderr = StringIO(), StringIO()
+
+        with mock.patch('sys.stdin', file):
+            call_command('refund_order_products', '-', batch_size=1, stdout=stdout, stderr=stderr)
+
+        self.assertIn('3 refunded, 0 skipped', stdout.getvalue())
+        self.assertIn('1 rows rejected', stdout.getvalue())
+        self.assertEqual(
+            list(OrderProduct.objects.order_by('id').values_list('refunded_quantity', flat=True)),
+            [2, 3],
+        )
+
+    def test_관리자가_아닌_사용자가_환불하려고_하면_403_에러(self):
+        self.client.force_authenticate(user=self.me)
+        response = self.client.post(
+            self.api_url, [{'order_product_id': self.order_products[0].id}], format='json',
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class TestOrderStateMachine(ToyTestCase):
+    def setUp(self):
+        self.me = self.create_normal_user()
+        self.provider = self.create_provider(
+            username='Ably',
+            name='Ably',
+            phone_number='01033333333',
+            email='ddd@naver.com',
+        )
+        product = Product.objects.create(
+            provider=self.provider,
+            name='product',
+            price=3000,
+            shipping_price=2000,
+            is_on_sale=True,
+            can_bundle=True,
+        )
+        self.product_options = [
+            ProductOption.objects.create(product=product, stock=100, name=f'option{index}')
+            for index in range(2)
+        ]
+        self.carts = [
+            Cart.objects.create(user=self.me, product_option=product_option, quantity=2)
+            for product_option in self.product_options
+        ]
+
+    def create_orders(self, count):
+        return [
+            place_order(
+                self.me,
+                load_carts(self.me, [cart.id for cart in self.carts]),
+                create_order_uid(),
+                shipping_address='서울시 동작구 아무곳이나',
+                shipping_request_note='경비실에 맡겨주세요',
+                pay_method='CARD',
+            ) for _ in range(count)
+        ]
+
+    def test_여러_주문의_상태를_한번의_쿼리로_바꾸고_바뀐_주문_상품마다_이력이_남음(self):
+        orders = self.create_orders(3)
+
+        with CaptureQueriesContext(connection) as context:
+            transitioned = transition_order_products(
+                OrderProduct.STATUS_CHOICE.PAID, order_ids=[order.id for order in orders], reason='paid',
+            )
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertEqual(len(transitioned), 6)
+        self.assertFalse(Order.objects.filter(is_paid=False).exists())
+        self.assertEqual(
+            set(OrderStatusLog.objects.values_list('from_status', 'to_status', 'reason')),
+            {(OrderProduct.STATUS_CHOICE.PENDING, OrderProduct.STATUS_CHOICE.PAID, 'paid')},
+        )
+        self.assertEqual(OrderStatusLog.objects.count(), 6)
+
+    def test_허용되지_않은_상태에서는_바뀌지_않고_이력도_남지_않음(self):
+        order, = self.create_orders(1)
+        transition_order_products(OrderProduct.STATUS_CHOICE.NOT_PAID, order_ids=[order.id])
+
+        transitioned = transition_order_products(OrderProduct.STATUS_CHOICE.PAID, order_ids=[order.id])
+        self.assertEqual(transitioned, [])
+        self.assertFalse(Order.objects.get(id=order.id).is_paid)
+        self.assertEqual(OrderStatusLog.objects.filter(to_status=OrderProduct.STATUS_CHOICE.PAID).count(), 0)
+
+        with self.assertRaises(InvalidTransition):
+            transition_order_products(OrderProduct.STATUS_CHOICE.PENDING, order_ids=[order.id])
+
+    def test_환불_상태로는_refund_order_products로만_바꿀_수_있음(self):
+        order, = self.create_orders(1)
+        transition_order_products(OrderProduct.STATUS_CHOICE.PAID, order_ids=[order.id])
+
+        for to_status in (OrderProduct.STATUS_CHOICE.REFUND, OrderProduct.STATUS_CHOICE.PARTIAL_REFUND):
+            with self.assertRaises(InvalidTransition):
+                transition_order_products(to_status, order_ids=[order.id])
+
+        self.assertFalse(order.order_products.exclude(status=OrderProduct.STATUS_CHOICE.PAID).exists())
+        self.assertFalse(OrderStatusLog.objects.filter(to_status=OrderProduct.STATUS_CHOICE.REFUND).exists())
+
+    def test_환불로_바뀐_상태도_이력이_남음(self):
+        order, = self.create_orders(1)
+        first, second = order.order_products.order_by('id')
+        transition_order_products(OrderProduct.STATUS_CHOICE.PAID, order_ids=[order.id])
+
+        refund_order_products({first.id: 1, second.id: None})
+        self.assertEqual(
+            set(OrderStatusLog.objects.filter(reason='refund').values_list('order_product_id', 'to_status')),
+            {
+                (first.id, OrderProduct.STATUS_CHOICE.PARTIAL_REFUND),
+                (second.id, OrderProduct.STATUS_CHOICE.REFUND),
+            },
+        )
+
+    def test_이미_만들어진_partition은_다시_만들지_않음(self):
+        call_command('create_order_partitions', stdout=StringIO())
+        stdout = StringIO()
+        call_command('create_order_partitions', stdout=stdout)
+        self.assertEqual(stdout.getvalue(), '')
+
+    def test_partition을_만들때_lock을_잡지_못하면_다시_시도함(self):
+        months_ahead = settings.ORDER_PARTITION_MONTHS_AHEAD + 1
+        last_month = add_months(get_month_start(timezone.localdate()), months_ahead)
+        calls = []
+
+        def fail_once(table, month, lock_timeout_ms=None):
+            calls.append((table, lock_timeout_ms))
+            if len(calls) == 1:
+                raise OperationalError('canceling statement due to lock timeout')
+            create_monthly_partition(table, month, lock_timeout_ms=lock_timeout_ms)
+
+        stdout, stderr = StringIO(), StringIO()
+        with mock.patch('order.management.commands.create_order_partitions.create_monthly_partition', fail_once), \
+                mock.patch('order.management.commands.create_order_partitions.time.sleep'):
+            call_command(
+                'create_order_partitions', months_ahead=months_ahead, lock_timeout_ms=100, stdout=stdout, stderr=stderr,
+            )
+
+        self.assertIn('다시 만들어봅니다', stderr.getvalue())
+        self.assertEqual(calls[0], calls[1])
+        self.assertEqual({lock_timeout_ms for _, lock_timeout_ms in calls}, {100})
+        for table in PARTITIONED_TABLES:
+            partition = get_monthly_partition_name(table, last_month)
+            self.assertIn(f'{partition} partition을 만들었습니다.', stdout.getvalue())
+            self.assertIn(partition, [partition.name for partition in get_partitions(table)])
+
+
+def fake_payment_gateways(timeout=3, **options):
+    return {
+        pay_method: {
+            'BACKEND': 'order.payments.gateways.FakePaymentGateway',
+            'OPTIONS': options,
+            'TIMEOUT': timeout,
+            'MAX_CONCURRENCY': 4,
+            'FAILURE_THRESHOLD': 5,
+            'RECOVERY_TIMEOUT': 30,
+        } for pay_method in ('CARD', 'KAKAO')
+    }
+
+
+class TestPaymentAuthorization(ToyTestCase):
+    api_url = '/users/me/orders'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.me = self.create_normal_user()
+        self.provider = self.create_provider(
+            username='Ably',
+            name='Ably',
+            phone_number='01033333333',
+            email='ddd@naver.com',
+        )
+        product = Product.objects.create(
+            provider=self.provider,
+            name='product',
+            price=3000,
+            shipping_price=2000,
+            is_on_sale=True,
+            can_bundle=True,
+        )
+        self.product_option = ProductOption.objects.create(product=product, stock=10, name='anything')
+        self.cart = Cart.objects.create(user=self.me, product_option=self.product_option, quantity=2)
+
+    def create_order(self):
+        return place_order(
+            self.me,
+            load_carts(self.me, [self.cart.id]),
+            create_order_uid(),
+            shipping_address='서울시 동작구 아무곳이나',
+            shipping_request_note='경비실에 맡겨주세요',
+            pay_method='CARD',
+        )
+
+    def test_주문하면_결제가_승인되고_주문_상품이_PAID로_바뀌어_201_성공(self):
+        self.client.force_authenticate(user=self.me)
+        response = self.client.post(self.api_url, {
+            'cart_ids': [self.cart.id],
+            'shipping_address': '서울시 동작구 아무곳이나',
+            'shipping_request_note': '경비실에 맡겨주세요',
+            'pay_method': 'CARD',
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.json()['is_paid'])
+        self.assertEqual(response.json()['payment']['status'], 'AUTHORIZED')
+        self.assertEqual([line['status'] for line in response.json()['order_products']], ['PAID'])
+
+        order = Order.objects.select_related('payment').get(id=response.json()['id'])
+        self.assertTrue(order.is_paid)
+        self.assertEqual(order.payment.status, Payment.STATUS_CHOICE.AUTHORIZED)
+        self.assertTrue(order.payment.transaction_id.startswith('CARD-'))
+
+    @override_settings(PAYMENT_GATEWAYS=fake_payment_gateways(decline_rate=1))
+    def test_결제가_거절되면_주문_상품이_NOT_PAID로_바뀌고_재고가_돌아옴(self):
+        order = self.create_order()
+        self.assertEqual(ProductOption.objects.get(id=self.product_option.id).stock, 8)
+
+        authorized_orders, declined_orders = authorize_orders([order])
+        self.assertEqual((authorized_orders, declined_orders), ([], [order]))
+        self.assertEqual(Payment.objects.get(order=order).status, Payment.STATUS_CHOICE.DECLINED)
+        self.assertEqual(
+            list(OrderProduct.objects.filter(order=order).values_list('status', flat=True)),
+            [OrderProduct.STATUS_CHOICE.NOT_PAID],
+        )
+        self.assertEqual(ProductOption.objects.get(id=self.product_option.id).stock, 10)
+
+    @override_settings(PAYMENT_GATEWAYS=fake_payment_gateways(timeout=0.05, latency=0.5))
+    def test_결제사가_느리면_timeout까지만_기다리고_결제는_UNKNOWN으로_남았다가_조회해서_승인이_반영됨(self):
+        order = self.create_order()
+
+        started_at = time.monotonic()
+        authorized_orders, declined_orders = authorize_orders([order])
+        self.assertLess(time.monotonic() - started_at, 0.5)
+        self.assertEqual((authorized_orders, declined_orders), ([], []))
+        self.assertEqual(Payment.objects.get(order=order).status, Payment.STATUS_CHOICE.UNKNOWN)
+        self.assertFalse(Order.objects.get(id=order.id).is_paid)
+
+        # 결제사가 아직 처리중이면 UNKNOWN으로 남는다.
+        self.assertEqual(reconcile_payments(get_unknown_payment_orders(10)), ([], [], [order]))
+        self.assertEqual(Payment.objects.get(order=order).status, Payment.STATUS_CHOICE.UNKNOWN)
+
+        time.sleep(0.6)
+        authorized_orders, declined_orders, unknown_orders = reconcile_payments(get_unknown_payment_orders(10))
+        self.assertEqual(([order.id for order in authorized_orders], declined_orders, unknown_orders), ([order.id], [], []))
+        self.assertEqual(Payment.objects.get(order=order).status, Payment.STATUS_CHOICE.AUTHORIZED)
+        self.assertTrue(Order.objects.get(id=order.id).is_paid)
+        self.assertEqual(
+            list(OrderProduct.objects.filter(order=order).values_list('status', flat=True)),
+            [OrderProduct.STATUS_CHOICE.PAID],
+        )
+
+    @override_settings(PAYMENT_GATEWAYS=fake_payment_gateways(failure_rate=1))
+    def test_통신에_실패한_결제는_조회해서_승인된_적이_없으면_NOT_PAID로_바뀌고_재고가_돌아옴(self):
+        order = self.create_order()
+
+        authorize_orders([order])
+        self.assertEqual(Payment.objects.get(order=order).status, Payment.STATUS_CHOICE.UNKNOWN)
+
+        stdout = StringIO()
+        call_command('reconcile_payments', once=True, stdout=stdout)
+        self.assertIn('0개는 승인, 1개는 취소', stdout.getvalue())
+        self.assertEqual(Payment.objects.get(order=order).status, Payment.STATUS_CHOICE.DECLINED)
+        self.assertEqual(
+            list(OrderProduct.objects.filter(order=order).values_list('status', flat=True)),
+            [OrderProduct.STATUS_CHOICE.NOT_PAID],
+        )
+        self.assertEqual(ProductOption.objects.get(id=self.product_option.id).stock, 10)
+
+    def test_circuit이_열려서_결제사에_보내지_못한_결제는_PENDING으로_남지_않고_거절되고_재고가_돌아옴(self):
+        order = self.create_order()
+
+        with mock.patch(
+                'order.payments.client.PaymentGatewayClient.submit',
+                side_effect=PaymentGatewayUnavailable('circuit이 열려있습니다.'),
+        ):
+            authorized_orders, declined_orders = authorize_orders([order])
+
+        self.assertEqual((authorized_orders, declined_orders), ([], [order]))
+        self.assertEqual(Payment.objects.get(order=order).status, Payment.STATUS_CHOICE.DECLINED)
+        self.assertEqual(
+            list(OrderProduct.objects.filter(order=order).values_list('status', flat=True)),
+            [OrderProduct.STATUS_CHOICE.NOT_PAID],
+        )
+        self.assertEqual(ProductOption.objects.get(id=self.product_option.id).stock, 10)
+
+    def test_연속으로_실패하면_circuit이_열리고_recovery_timeout이_지나면_한번만_보내본_뒤_닫힘(self):
+        circuit_breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=30)
+
+        with mock.patch('order.payments.circuit_breaker.time.monotonic', return_value=100):
+            circuit_breaker.record_failure()
+            self.assertTrue(circuit_breaker.allow_request())
+            circuit_breaker.record_failure()
+            self.assertFalse(circuit_breaker.allow_request())
+
+        with mock.patch('order.payments.circuit_breaker.time.monotonic', return_value=130):
+            self.assertTrue(circuit_breaker.allow_request())
+            self.assertFalse(circuit_breaker.allow_request())
+            circuit_breaker.record_success()
+            self.assertTrue(circuit_breaker.allow_request())
+
+
+class TestExpireUnpaidOrders(ToyTestCase):
+    def setUp(self):
+        self.me = self.create_normal_user()
+        self.provider = self.create_provider(
+            username='Ably',
+            name='Ably',
+            phone_number='01033333333',
+            email='ddd@naver.com',
+        )
+        product = Product.objects.create(
+            provider=self.provider,
+            name='product',
+            price=3000,
+            shipping_price=2000,
+            is_on_sale=True,
+            can_bundle=True,
+        )
+        self.product_option = ProductOption.objects.create(product=product, stock=10, name='anything')
+        self.cart = Cart.objects.create(user=self.me, product_option=self.product_option, quantity=2)
+
+    def create_order(self, created_at=None):
+        order = place_order(
+            self.me,
+            load_carts(self.me, [self.cart.id]),
+            create_order_uid(),
+            shipping_address='서울시 동작구 아무곳이나',
+            shipping_request_note='경비실에 맡겨주세요',
+            pay_method='CARD',
+        )
+        if created_at:
+            Order.objects.filter(id=order.id).update(created_at=created_at)
+        return order
+
+    def test_결제_기한이_지난_주문만_NOT_PAID로_바뀌고_재고가_돌아옴(self):
+        expired_at = timezone.now() - datetime.timedelta(seconds=settings.ORDER_PAYMENT_EXPIRE_SECONDS + 60)
+        expired_orders = [self.create_order(created_at=expired_at) for _ in range(2)]
+        paid_order = self.create_order(created_at=expired_at)
+        transition_order_products(OrderProduct.STATUS_CHOICE.PAID, order_ids=[paid_order.id])
+        recent_order = self.create_order()
+        self.assertEqual(ProductOption.objects.get(id=self.product_option.id).stock, 2)
+
+        stdout = StringIO()
+        call_command('expire_unpaid_orders', '--once', batch_size=1, stdout=stdout)
+        self.assertIn('주문 상품 2개를 만료했습니다', stdout.getvalue())
+
+        self.assertEqual(
+            dict(OrderProduct.objects.values_list('order_id', 'status')),
+            {
+                expired_orders[0].id: OrderProduct.STATUS_CHOICE.NOT_PAID,
+                expired_orders[1].id: OrderProduct.STATUS_CHOICE.NOT_PAID,
+                paid_order.id: OrderProduct.STATUS_CHOICE.PAID,
+                recent_order.id: OrderProduct.STATUS_CHOICE.PENDING,
+            },
+        )
+        self.assertEqual(ProductOption.objects.get(id=self.product_option.id).stock, 2 + 2 * 2)
+        self.assertEqual(OrderStatusLog.objects.filter(reason='expired').count(), 2)
+
+    def test_이미_만료된_주문은_취소로_표시되어_다시_훑지_않고_재고가_두번_돌아오지_않음(self):
+        expired_at = timezone.now() - datetime.timedelta(seconds=settings.ORDER_PAYMENT_EXPIRE_SECONDS + 60)
+        order = self.create_order(created_at=expired_at)
+
+        self.assertEqual(sweep_unpaid_orders(batch_size=10), (1, 1))
+        self.assertTrue(Order.objects.get(id=order.id).is_cancelled)
+        self.assertEqual(sweep_unpaid_orders(batch_size=10), (0, 0))
+        self.assertEqual(ProductOption.objects.get(id=self.product_option.id).stock, 10)
+
+    def test_승인_여부를_모르는_결제의_주문은_결제사에_조회해서_확인될_때까지_만료하지_않음(self):
+        expired_at = timezone.now() - datetime.timedelta(seconds=settings.ORDER_PAYMENT_EXPIRE_SECONDS + 60)
+        order = self.create_order(created_at=expired_at)
+        Payment.objects.filter(order=order).update(status=Payment.STATUS_CHOICE.UNKNOWN)
+
+        with mock.patch(
+                'order.payments.gateways.FakePaymentGateway.get_authorization',
+                side_effect=PaymentGatewayError('결제사에 조회하지 못했습니다.'),
+        ):
+            self.assertEqual(sweep_unpaid_orders(batch_size=10), (1, 0))
+        self.assertEqual(Payment.objects.get(order=order).status, Payment.STATUS_CHOICE.UNKNOWN)
+        self.assertEqual(ProductOption.objects.get(id=self.product_option.id).stock, 8)
+
+        with mock.patch(
+                'order.payments.gateways.FakePaymentGateway.get_authorization',
+                return_value=AuthorizationResult(gateway='CARD', transaction_id='CARD-1'),
+        ):
+            self.assertEqual(sweep_unpaid_orders(batch_size=10), (1, 0))
+        self.assertEqual(Payment.objects.get(order=order).status, Payment.STATUS_CHOICE.AUTHORIZED)
+        self.assertEqual(
+            list(OrderProduct.objects.filter(order=order).values_list('status', flat=True)),
+            [OrderProduct.STATUS_CHOICE.PAID],
+        )
+        self.assertEqual(ProductOption.objects.get(id=self.product_option.id).stock, 8)
+        self.assertEqual(sweep_unpaid_orders(batch_size=10), (0, 0))
+
+
+class TestOrderPartitions(ToyTestCase):
+    def test_주문_partition_테이블마다_앞으로의_월별_partition을_만듦(self):
+        call_command('create_order_partitions', stdout=StringIO())
+        last_month = add_months(get_month_start(timezone.localdate()), settings.ORDER_PARTITION_MONTHS_AHEAD)
+
+        for table in PARTITIONED_TABLES:
+            partition_names = [partition.name for partition in get_partitions(table)]
+            self.assertIn(get_monthly_partition_name(table, last_month), partition_names)
+            self.assertIn(f'{table}_default', partition_names)
+
+    def test_이번_달_partition과_DEFAULT_partition은_떼어내지_않음(self):
+        out = StringIO()
+        call_command(
+            'detach_order_partitions', '--before', timezone.localdate().strftime('%Y-%m'), '--dry-run', stdout=out,
+        )
+        self.assertEqual(out.getvalue(), '')
+
+
+class TestSalesRollups(ToyTestCase):
+    api_url = '/sales/daily'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.me = self.create_normal_user()
+        self.admin = User.objects.create_user(
+            username='admin',
+            password='toyproject12!@',
+            name='관리자',
+            email='admin@gmail.com',
+            phone_number='01099999999',
+            is_staff=True,
+        )
+        self.provider = self.create_provider(
+            username='Ably',
+            name='Ably',
+            phone_number='01033333333',
+            email='ddd@naver.com',
+        )
+        self.other_provider = self.create_provider(
+            username='Zigzag',
+            name='Zigzag',
+            phone_number='01044444444',
+            email='eee@naver.com',
+        )
+        self.product_options = []
+
+        for index, provider in enumerate((self.provider, self.provider, self.other_provider)):
+            product = Product.objects.create(
+                provider=provider,
+                name=f'product{index}',
+                price=3000,
+                shipping_price=2000,
+                is_on_sale=True,
+                can_bundle=True,
+            )
+            self.product_options.append(ProductOption.objects.create(product=product, stock=100, name='anything'))
+
+        carts = [
+            Cart.objects.create(user=self.me, product_option=product_option, quantity=2)
+            for product_option in self.product_options
+        ]
+        self.order = place_order(
+            self.me,
+            load_carts(self.me, [cart.id for cart in carts]),
+            create_order_uid(),
+            shipping_address='서울시 동작구 아무곳이나',
+            shipping_request_note='경비실에 맡겨주세요',
+            pay_method='CARD',
+        )
+        transition_order_products(OrderProduct.STATUS_CHOICE.PAID, order_ids=[self.order.id])
+        self.today = timezone.localdate().isoformat()
+
+    def get_daily_sales(self, user, **params):
+        self.client.force_authenticate(user=user)
+        return self.client.get(self.api_url, {'date_from': self.today, 'date_to': self.today, **params})
+
+    def test_backfill한_일별_매출을_입점사별로_조회_200_성공(self):
+        call_command('backfill_sales_rollups', '--processes', '1', stdout=StringIO())
+
+        response = self.get_daily_sales(self.admin)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['provider_id'], row['order_products'], row['quantity'], row['gross_price'], row['net_price'])
+             for row in response.json()['results']],
+            [(self.provider.id, 2, 4, 12000, 12000), (self.other_provider.id, 1, 2, 6000, 6000)],
+        )
+        self.assertTrue(SalesRollupWatermark.objects.exists())
+
+    def test_watermark_이후에_바뀐_주문_상품만_다시_집계해서_환불이_반영됨(self):
+        updated_from = timezone.now() - datetime.timedelta(hours=1)
+        SalesRollupWatermark.objects.create(name='sales', updated_until=updated_from)
+        now = timezone.now() + datetime.timedelta(seconds=settings.SALES_ROLLUP_LAG_SECONDS + 1)
+
+        self.assertEqual(update_sales_rollups(now=now), 3)
+        self.assertEqual(update_sales_rollups(now=now), 0)
+
+        order_product = self.order.order_products.get(product_option=self.product_options[0])
+        refund_order_products({order_product.id: 1})
+        # 테스트는 하나의 transaction이라 SQL의 now()가 처음과 같으므로 watermark를 되돌려서 다시 반영한다.
+        SalesRollupWatermark.objects.update(updated_until=updated_from)
+        update_sales_rollups(now=now)
+
+        response = self.get_daily_sales(self.admin, group_by='product_option', provider_id=self.provider.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['product_option_id'], row['refund_quantity'], row['net_price'])
+             for row in response.json()['results']],
+            [(self.product_options[0].id, 1, 3000), (self.product_options[1].id, 0, 6000)],
+        )
+
+    def test_lag보다_늦게_commit되어_watermark_앞에_있는_주문_상품도_rescan_구간에서_반영됨(self):
+        # 주문 상품의 updated_at보다 뒤로 watermark가 이미 옮겨진 뒤에 commit된 것과 같다.
+        SalesRollupWatermark.objects.create(name='sales', updated_until=timezone.now())
+        now = timezone.now() + datetime.timedelta(seconds=settings.SALES_ROLLUP_LAG_SECONDS + 1)
+
+        self.assertEqual(update_sales_rollups(now=now), 3)
+
+        response = self.get_daily_sales(self.admin)
+        self.assertEqual(
+            [(row['provider_id'], row['order_products']) for row in response.json()['results']],
+            [(self.provider.id, 2), (self.other_provider.id, 1)],
+        )
+
+    def test_입점사는_자기_매출만_조회되고_입점사가_아닌_사용자는_403_에러(self):
+        call_command('backfill_sales_rollups', '--processes', '1', stdout=StringIO())
+
+        for params in ({}, {'provider_id': self.other_provider.id}):
+            response = self.get_daily_sales(self.provider.user, **params)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([row['provider_id'] for row in response.json()['results']], [self.provider.id])
+
+        response = self.get_daily_sales(self.me)
+        self.assertEqual(response.status_code, 403)
+
+    def test_조회_기간이_최대_기간보다_길면_400_에러(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get('/sales/hourly', {
+            'date_from': '2020-01-01',
+            'date_to': '2020-02-01',
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+class TestSettlementExport(ToyTestCase):
+    api_url = '/settlements/export'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.me = self.create_normal_user()
+        self.provider = self.create_provider(
+            username='Ably',
+            name='Ably',
+            phone_number='01033333333',
+            email='ddd@naver.com',
+        )
+        self.other_provider = self.create_provider(
+            username='Zigzag',
+            name='Zigzag',
+            phone_number='01044444444',
+            email='eee@naver.com',
+        )
+        bundle_product = Product.objects.create(
+            provider=self.provider, name='bundle', price=3000, shipping_price=2000, is_on_sale=True, can_bundle=True,
+        )
+        single_product = Product.objects.create(
+            provider=self.provider, name='single', price=5000, shipping_price=3000, is_on_sale=True, can_bundle=False,
+        )
+        other_product = Product.objects.create(
+            provider=self.other_provider, name='other', price=1000, shipping_price=2500, is_on_sale=True,
+            can_bundle=True,
+        )
+        self.product_options = [
+            ProductOption.objects.create(product=bundle_product, stock=100, name='S'),
+            ProductOption.objects.create(product=bundle_product, stock=100, name='M'),
+            ProductOption.objects.create(product=single_product, stock=100, name='free'),
+            ProductOption.objects.create(product=other_product, stock=100, name='free'),
+        ]
+        carts = [
+            Cart.objects.create(user=self.me, product_option=product_option, quantity=2)
+            for product_option in self.product_options
+        ]
+        self.order = place_order(
+            self.me,
+            load_carts(self.me, [cart.id for cart in carts]),
+            create_order_uid(),
+            shipping_address='서울시 동작구 아무곳이나',
+            shipping_request_note='경비실에 맡겨주세요',
+            pay_method='CARD',
+        )
+        self.month = timezone.localdate().strftime('%Y-%m')
+
+    def read_rows(self, content):
+        return list(csv.DictReader(StringIO(gzip.decompress(content).decode())))
+
+    def test_입점사의_주문_상품마다_배송비를_나눠서_gzip_CSV로_내려받음_200_성공(self):
+        self.client.force_authenticate(user=self.provider.user)
+        response = self.client.get(self.api_url, {'month': self.month})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn(f'settlement-{self.provider.id}-{self.month}.csv.gz', response['Content-Disposition'])
+
+        rows = self.read_rows(b''.join(response.streaming_content))
+        order_products = list(self.order.order_products.order_by('id'))
+        self.assertEqual(
+            [(int(row['order_product_id']), row['order_uid'], int(row['ordered_price']), int(row['shipping_share']))
+             for row in rows],
+            [
+                (order_products[0].id, self.order.order_uid, 6000, 2000),
+                (order_products[1].id, self.order.order_uid, 6000, 0),
+                (order_products[2].id, self.order.order_uid, 10000, 3000),
+            ],
+        )
+
+    def test_주문_후에_상품_배송비_설정이_바뀌어도_주문할_때_나눈_배송비로_정산함(self):
+        order_products = list(self.order.order_products.order_by('id'))
+        self.assertEqual(
+            [order_product.shipping_price for order_product in order_products],
+            [2000, 0, 3000, 2500],
+        )
+        Product.objects.filter(provider=self.provider).update(shipping_price=9000, can_bundle=False)
+
+        self.client.force_authenticate(user=self.provider.user)
+        response = self.client.get(self.api_url, {'month': self.month})
+
+        rows = self.read_rows(b''.join(response.streaming_content))
+        self.assertEqual([int(row['shipping_share']) for row in rows], [2000, 0, 3000])
+        self.assertEqual(sum(int(row['shipping_share']) for row in rows) + 2500, self.order.shipping_price)
+
+    def test_배송비를_저장하기_전의_주문은_주문할_때와_같은_규칙으로_현재_배송비를_나눔(self):
+        OrderProduct.objects.filter(order=self.order).update(shipping_price=None)
+
+        self.client.force_authenticate(user=self.provider.user)
+        response = self.client.get(self.api_url, {'month': self.month})
+
+        rows = self.read_rows(b''.join(response.streaming_content))
+        self.assertEqual([int(row['shipping_share']) for row in rows], [2000, 0, 3000])
+
+    def test_export_settlement_명령어로_정산_파일을_만듦(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'settlement.csv.gz')
+            call_command(
+                'export_settlement',
+                '--provider-id', str(self.other_provider.id),
+                '--month', self.month,
+                '--output', path,
+                stdout=StringIO(),
+            )
+
+            with open(path, 'rb') as file:
+                rows = self.read_rows(file.read())
+
+        self.assertEqual([(row['product_name'], row['shipping_share']) for row in rows], [('other', '2500')])
+
+    def test_관리자가_입점사를_입력하지_않으면_400_입점사가_아니면_403_에러(self):
+        admin = User.objects.create_user(
+            username='admin',
+            password='toyproject12!@',
+            name='관리자',
+            email='admin@gmail.com',
+            phone_number='01099999999',
+            is_staff=True,
+        )
+        self.client.force_authenticate(user=admin)
+        self.assertEqual(self.client.get(self.api_url, {'month': self.month}).status_code, 400)
+
+        self.client.force_authenticate(user=self.me)
+        self.assertEqual(self.client.get(self.api_url, {'month': self.month}).status_code, 403)
@@ -1,18 +1,44 @@
+import datetime
+import hashlib
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db.models import Count, Max, Prefetch, Q, Sum, prefetch_related_objects
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import quote_etag
 from rest_framework import status
-from rest_framework.generics import ListCreateAPIView, CreateAPIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from rest_framework.generics import ListCreateAPIView, CreateAPIView, RetrieveAPIView, GenericAPIView
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 
-from common.cache import has_obtained_redis_lock, release_redis_lock
+from common.fast_serializers import FastSerializer
+from common.mixins import FastListModelMixin, ConditionalGetMixin, IdempotentCreateMixin
+from common.pagination import KeysetPagination
+from order.cache import get_cart_version_state
 from order.cache_keys import CART_CREATE_LOCK_USER_, ORDER_CREATE_LOCK_USER_
-from order.models import Cart, Order
-from order.serializers import MeCartSerializer, MeOrderSerializer
+from order.cart_store import is_redis_cart_backend, get_cart_state, get_carts, add_cart, set_cart_quantities
+from order.cart_summary import get_cart_summary
+from order.checkout import is_async_checkout_enabled, enqueue_checkout, get_checkout_status, CHECKOUT_STATUS_CHOICE
+from order.models import Cart, Order, OrderProduct, Payment, SalesDailyRollup, SalesHourlyRollup
+from order.partitions import filter_by_order_uids, get_related_created_at_range
+from order.refund import refund_order_products
+from order.settlement import export_settlement, get_settlement_filename
+from order.serializers import (
+    MeCartSerializer, MeCartBulkItemSerializer, MeOrderSerializer, OrderProductRefundSerializer,
+    SalesRollupQuerySerializer, SettlementExportQuerySerializer,
+)
+from product.cache import get_catalog_state
+from product.stock import get_stocks
 
 
-class MeCartListCreateAPIView(ListCreateAPIView):
+class MeCartListCreateAPIView(IdempotentCreateMixin, ConditionalGetMixin, FastListModelMixin, ListCreateAPIView):
     permission_classes = (IsAuthenticated,)
     serializer_class = MeCartSerializer
+    fast_serializer = FastSerializer(MeCartSerializer)
     queryset = Cart.objects.select_related('user', 'product_option__product__provider')
+    create_lock_key = staticmethod(CART_CREATE_LOCK_USER_)
 
     def get_queryset(self):
         return super().get_queryset().order_by('-id')
@@ -20,38 +46,315 @@ class MeCartListCreateAPIView(ListCreateAPIView):
     def filter_queryset(self, queryset):
         return super().filter_queryset(queryset).filter(user=self.request.user)
 
-    def create(self, request, *args, **kwargs):
-        lock_key = CART_CREATE_LOCK_USER_(request.user.id)
+    def list(self, request, *args, **kwargs):
+        if not is_redis_cart_backend():
+            return super().list(request, *args, **kwargs)
 
-        if has_obtained_redis_lock(lock_key, 3):
-            try:
-                response = super().create(request, *args, **kwargs)
-            finally:
-                release_redis_lock(lock_key)
-        else:
-            response = Response('처리중입니다.', status=status.HTTP_423_LOCKED)
+        page = self.paginate_queryset(get_carts(request.user))
+        return self.get_paginated_response(page)
 
-        return response
+    def get_conditional_validators(self):
+        if is_redis_cart_backend():
+            catalog_version, _ = get_catalog_state()
+            cart_state = get_cart_state(self.request.user.id)
+            # 재고가 바뀌어도 catalog version이 올라가지 않으므로 재고를 같이 넣는다.
+            stocks = get_stocks(list(cart_state))
+            etag = quote_etag(hashlib.md5(
+                f'{self.request.user.id}:{sorted(cart_state.items())}:{sorted(stocks.items())}:{catalog_version}:'
+                f'{self.request.get_full_path()}'.encode()
+            ).hexdigest())
+            return etag, None
+
+        cart_state = Cart.objects.filter(
+            user=self.request.user,
+        ).aggregate(
+            count=Count('id'),
+            last_updated_at=Max('updated_at'),
+            stocks=ArrayAgg('product_option__stock', ordering=('product_option_id',)),
+        )
+        catalog_version, catalog_updated_at = get_catalog_state()
+        cart_version, cart_deleted_at = get_cart_version_state(self.request.user.id)
+        last_updated_at = cart_state['last_updated_at']
+
+        etag = quote_etag(hashlib.md5(
+            f'{self.request.user.id}:{cart_state["count"]}:{last_updated_at}:{cart_state["stocks"]}:{cart_version}:'
+            f'{catalog_version}:{self.request.get_full_path()}'.encode()
+        ).hexdigest())
+        last_modified = max(
+            [timestamp for timestamp in (
+                catalog_updated_at,
+                cart_deleted_at,
+                last_updated_at and int(last_updated_at.timestamp()),
+            ) if timestamp],
+            default=None,
+        )
+        return etag, last_modified
+
+    def create_with_lock(self, request, *args, **kwargs):
+        # upsert와 Redis 장바구니는 한번의 명령으로 동시에 담아도 안전하기 때문에 lock을 잡지 않는다.
+        if settings.CART_UPSERT_ENABLED or is_redis_cart_backend():
+            return self.create_response(request, *args, **kwargs)
+        return super().create_with_lock(request, *args, **kwargs)
+
+    def create_response(self, request, *args, **kwargs):
+        if not is_redis_cart_backend():
+            return super().create_response(request, *args, **kwargs)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        cart = add_cart(
+            request.user,
+            serializer.validated_data['product_option_id'],
+            serializer.validated_data['quantity'],
+            serializer.validated_data['stock'],
+            merge=settings.CART_UPSERT_ENABLED,
+        )
+        return Response(cart, status=status.HTTP_201_CREATED)
+
+
+class MeCartBulkCreateAPIView(IdempotentCreateMixin, CreateAPIView):
+    permission_classes = (IsAuthenticated,)
+    serializer_class = MeCartBulkItemSerializer
+    cart_fast_serializer = FastSerializer(MeCartSerializer)
+    create_lock_key = staticmethod(CART_CREATE_LOCK_USER_)
+
+    def create_response(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data, many=True, allow_empty=False)
+        serializer.is_valid(raise_exception=True)
+
+        if is_redis_cart_backend():
+            set_cart_quantities(request.user, {
+                item['product_option_id']: item['quantity'] for item in serializer.validated_data
+            })
+            return Response(get_carts(request.user), status=status.HTTP_201_CREATED)
+
+        serializer.save()
+
+        # 추가/변경된 옵션만이 아니라 사용자의 장바구니 전체를 돌려준다.
+        rows = self.cart_fast_serializer.values_list(
+            Cart.objects.filter(user=request.user).order_by('-id')
+        )
+        return Response(self.cart_fast_serializer.serialize(rows), status=status.HTTP_201_CREATED)
+
+
+class MeCartSummaryAPIView(GenericAPIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, *args, **kwargs):
+        return Response(get_cart_summary(request.user))
 
 
-class MeOrderCreateAPIView(CreateAPIView):
+class MeOrderQuerySetMixin:
     permission_classes = (IsAuthenticated,)
     serializer_class = MeOrderSerializer
-    queryset = Order.objects.select_related(
-        'user', 'payment',
-    ).prefetch_related(
-        'order_products__product_option__product__provider',
-    )
-
-    def create(self, request, *args, **kwargs):
-        lock_key = ORDER_CREATE_LOCK_USER_(request.user.id)
-
-        if has_obtained_redis_lock(lock_key, 3):
-            try:
-                response = super().create(request, *args, **kwargs)
-            finally:
-                release_redis_lock(lock_key)
-        else:
-            response = Response('처리중입니다.', status=status.HTTP_423_LOCKED)
+    queryset = Order.objects.select_related('user')
+
+    def get_queryset(self):
+        return super().get_queryset().filter(user=self.request.user)
+
+    def prefetch_order_details(self, orders):
+        """
+        페이지의 주문 상품 수와 상관없이 한번의 쿼리로 상품, 입점사까지 가져옵니다.
+        주문 상품, 결제 정보도 created_at으로 partition을 나눴기 때문에 주문들의 created_at 범위를 같이 걸어서
+        해당하는 partition만 조회합니다.
+        """
+        created_at_range = get_related_created_at_range(orders)
+
+        if created_at_range is None:
+            return orders
+
+        prefetch_related_objects(
+            orders,
+            Prefetch(
+                'order_products',
+                queryset=OrderProduct.objects.filter(
+                    created_at__range=created_at_range,
+                ).select_related(
+                    'product_option__product__provider',
+                ).order_by(
+                    'id',
+                ),
+            ),
+            Prefetch('payment', queryset=Payment.objects.filter(created_at__range=created_at_range)),
+        )
+        return orders
+
+
+class MeOrderListCreateAPIView(IdempotentCreateMixin, MeOrderQuerySetMixin, ListCreateAPIView):
+    pagination_class = KeysetPagination
+    create_lock_key = staticmethod(ORDER_CREATE_LOCK_USER_)
+
+    def get_queryset(self):
+        return super().get_queryset().order_by('-created_at', '-id')
+
+    def paginate_queryset(self, queryset):
+        return self.prefetch_order_details(super().paginate_queryset(queryset))
+
+    def create_response(self, request, *args, **kwargs):
+        if is_async_checkout_enabled():
+            return self.enqueue(request)
+        return super().create_response(request, *args, **kwargs)
+
+    def enqueue(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        order_uid = enqueue_checkout(request.user, serializer.validated_data)
+
+        return Response(
+            {'order_uid': order_uid, 'status': CHECKOUT_STATUS_CHOICE.PENDING},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class MeOrderRetrieveAPIView(MeOrderQuerySetMixin, RetrieveAPIView):
+    lookup_field = 'order_uid'
+
+    def get_queryset(self):
+        return filter_by_order_uids(super().get_queryset(), [self.kwargs['order_uid']])
+
+    def get_object(self):
+        return self.prefetch_order_details([super().get_object()])[0]
+
+
+class MeOrderCheckoutStatusAPIView(GenericAPIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, *args, **kwargs):
+        checkout_status = get_checkout_status(request.user, kwargs['order_uid'])
+
+        if checkout_status is None:
+            raise NotFound('주문을 찾을 수 없습니다.')
+
+        return Response({
+            'order_uid': kwargs['order_uid'],
+            'status': checkout_status['status'],
+            'order_id': checkout_status['order_id'],
+            'errors': checkout_status['errors'],
+        })
+
+
+class OrderProductRefundAPIView(GenericAPIView):
+    permission_classes = (IsAdminUser,)
+    serializer_class = OrderProductRefundSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data, many=True, allow_empty=False)
+        serializer.is_valid(raise_exception=True)
+
+        if len(serializer.validated_data) > settings.ORDER_REFUND_BATCH_SIZE:
+            raise ValidationError(
+                f'한번에 {settings.ORDER_REFUND_BATCH_SIZE}개까지 환불할 수 있습니다. '
+                f'더 많은 주문 상품은 refund_order_products 명령어로 환불해주세요.'
+            )
+
+        result = refund_order_products({
+            item['order_product_id']: item['quantity'] for item in serializer.validated_data
+        })
+        return Response({
+            'refunded': [
+                {'order_product_id': order_product_id, 'quantity': quantity}
+                for order_product_id, quantity in sorted(result.refunded_quantity_by_id.items())
+            ],
+            'skipped_order_product_ids': result.skipped_ids,
+        })
+
+
+class ProviderScopedMixin:
+    def get_provider_id(self, provider_id=None):
+        """
+        관리자는 요청한 입점사를, 입점사는 항상 자기 자신을 조회합니다. 입점사가 아닌 사용자는 403 에러입니다.
+        """
+        if self.request.user.is_staff:
+            return provider_id
+
+        provider = getattr(self.request.user, 'provider', None)
+        if provider is None:
+            raise PermissionDenied('입점사만 조회할 수 있습니다.')
+
+        return provider.id
+
+
+class SalesRollupAPIView(ProviderScopedMixin, GenericAPIView):
+    """
+    매출 집계 테이블에서 기간별 매출을 group_by(입점사, 상품, 상품 옵션)로 묶어서 돌려줍니다.
+    관리자는 모든 입점사를, 입점사는 자기 매출만 조회할 수 있습니다.
+    """
+    permission_classes = (IsAuthenticated,)
+    serializer_class = SalesRollupQuerySerializer
+    rollup_model = None
+    time_field = None
+    max_days_setting = None
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'max_days': getattr(settings, self.max_days_setting)}
+
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        group_field = f'{params["group_by"]}_id'
+
+        provider_id = self.get_provider_id(params.get('provider_id'))
+        queryset = self.rollup_model.objects.filter(
+            self.get_time_filter(params['date_from'], params['date_to']),
+            **{field: params[field] for field in ('product_id', 'product_option_id') if field in params},
+        )
+
+        if provider_id is not None:
+            queryset = queryset.filter(provider_id=provider_id)
+
+        rows = queryset.values(
+            self.time_field, group_field,
+        ).annotate(
+            order_products=Sum('order_product_count'),
+            quantity=Sum('ordered_quantity'),
+            gross_price=Sum('ordered_price'),
+            refund_quantity=Sum('refunded_quantity'),
+            refund_price=Sum('refunded_price'),
+            net_price=Sum('ordered_price') - Sum('refunded_price'),
+        ).order_by(
+            self.time_field, group_field,
+        )
+        return Response({'results': list(rows)})
+
+    def get_time_filter(self, date_from, date_to):
+        # date는 DateField가 aware datetime을 서버의 TIME_ZONE 기준 날짜로 바꿔서 비교하므로 같은 조건을 쓸 수 있다.
+        return Q(**{
+            f'{self.time_field}__gte': timezone.make_aware(datetime.datetime.combine(date_from, datetime.time())),
+            f'{self.time_field}__lt': timezone.make_aware(
+                datetime.datetime.combine(date_to + datetime.timedelta(days=1), datetime.time()),
+            ),
+        })
+
+
+class SalesDailyRollupAPIView(SalesRollupAPIView):
+    rollup_model = SalesDailyRollup
+    time_field = 'date'
+    max_days_setting = 'SALES_ROLLUP_MAX_DAYS'
+
+
+class SalesHourlyRollupAPIView(SalesRollupAPIView):
+    rollup_model = SalesHourlyRollup
+    time_field = 'hour'
+    max_days_setting = 'SALES_ROLLUP_MAX_HOURLY_DAYS'
+
+
+class SettlementExportAPIView(ProviderScopedMixin, GenericAPIView):
+    """
+    입점사의 월 정산 파일(gzip으로 압축한 CSV)을 만들면서 바로 내려줍니다.
+    """
+    permission_classes = (IsAuthenticated,)
+    serializer_class = SettlementExportQuerySerializer
+
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        provider_id = self.get_provider_id(serializer.validated_data.get('provider_id'))
+        month = serializer.validated_data['month']
+
+        if provider_id is None:
+            raise ValidationError({'provider_id': ['정산할 입점사를 입력해주세요.']})
 
+        response = StreamingHttpResponse(export_settlement(provider_id, month), content_type='application/gzip')
+        response['Content-Disposition'] = f'attachment; filename="{get_settlement_filename(provider_id, month)}"'
         return response
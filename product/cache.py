@@ -0,0 +1,46 @@
+import time
+
+from django.core.cache import cache
+
+from product.cache_keys import CATALOG_VERSION, CATALOG_UPDATED_AT, STOCK_UPDATED_AT
+
+
+def get_catalog_version():
+    catalog_version = cache.get(CATALOG_VERSION)
+
+    if catalog_version is None:
+        # 키가 유실되어도 예전 버전 번호가 재사용되지 않도록 현재 시각으로 초기화한다.
+        cache.add(CATALOG_VERSION, int(time.time() * 1000), timeout=None)
+        catalog_version = cache.get(CATALOG_VERSION)
+
+    return catalog_version
+
+
+def get_catalog_state():
+    """
+    (catalog version, 상품이나 재고가 마지막으로 바뀐 시각의 unix timestamp)를 한번의 round trip으로 가져옵니다.
+    """
+    state = cache.get_many([CATALOG_VERSION, CATALOG_UPDATED_AT, STOCK_UPDATED_AT])
+    catalog_version = state.get(CATALOG_VERSION)
+
+    if catalog_version is None:
+        catalog_version = get_catalog_version()
+
+    updated_at = max(
+        [timestamp for timestamp in (state.get(CATALOG_UPDATED_AT), state.get(STOCK_UPDATED_AT)) if timestamp],
+        default=None,
+    )
+    return catalog_version, updated_at
+
+
+def bump_catalog_version():
+    cache.set(CATALOG_UPDATED_AT, int(time.time()), timeout=None)
+
+    try:
+        return cache.incr(CATALOG_VERSION)
+    except ValueError:
+        return get_catalog_version()
+
+
+def touch_stock_updated_at():
+    cache.set(STOCK_UPDATED_AT, int(time.time()), timeout=None)
@@ -0,0 +1,6 @@
+CATALOG_VERSION = 'CATALOG_VERSION'
+CATALOG_UPDATED_AT = 'CATALOG_UPDATED_AT'
+STOCK_UPDATED_AT = 'STOCK_UPDATED_AT'
+STALE_PRODUCT_CARDS = 'STALE_PRODUCT_CARDS'
+PRODUCT_LIST_ = lambda catalog_version, params: f'PRODUCT_LIST_{catalog_version}_{params}'
+PRODUCT_OPTION_STOCK_ = lambda product_option_id: f'PRODUCT_OPTION_STOCK_{product_option_id}'
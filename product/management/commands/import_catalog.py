@@ -0,0 +1,228 @@
+import csv
+import io
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from product.cache import bump_catalog_version
+from product.read_models import refresh_product_cards
+from product.stock import set_mirrored_stocks
+
+FIELDS = (
+    'provider_id', 'product_name', 'price', 'shipping_price',
+    'is_on_sale', 'can_bundle', 'option_name', 'stock',
+)
+TRUE_VALUES = ('t', 'true', 'y', 'yes', '1')
+FALSE_VALUES = ('f', 'false', 'n', 'no', '0')
+# staging 테이블과 product/product_option의 integer 컬럼(int4)에 들어갈 수 있는 최댓값
+MAX_INTEGER = 2 ** 31 - 1
+
+CREATE_STAGING_TABLE_SQL = '''
+CREATE TEMPORARY TABLE IF NOT EXISTS catalog_import_staging (
+    line serial NOT NULL,
+    provider_id integer NOT NULL,
+    product_name varchar(50) NOT NULL,
+    price integer NOT NULL,
+    shipping_price integer NOT NULL,
+    is_on_sale boolean NOT NULL,
+    can_bundle boolean NOT NULL,
+    option_name varchar(50),
+    stock integer NOT NULL
+)
+'''
+
+COPY_STAGING_SQL = f'COPY catalog_import_staging ({", ".join(FIELDS)}) FROM STDIN WITH (FORMAT csv)'
+
+# 같은 배치에 같은 상품/옵션이 여러번 있으면 파일에서 나중에 나온 줄(line이 큰 줄)을 반영한다.
+UPSERT_PRODUCTS_SQL = '''
+INSERT INTO product (provider_id, name, price, shipping_price, is_on_sale, can_bundle, created_at, updated_at)
+SELECT DISTINCT ON (staging.product_name)
+       staging.provider_id, staging.product_name, staging.price, staging.shipping_price,
+       staging.is_on_sale, staging.can_bundle, now(), now()
+FROM catalog_import_staging AS staging
+JOIN provider ON provider.id = staging.provider_id
+ORDER BY staging.product_name, staging.line DESC
+ON CONFLICT (name) DO UPDATE SET
+    price = EXCLUDED.price,
+    shipping_price = EXCLUDED.shipping_price,
+    is_on_sale = EXCLUDED.is_on_sale,
+    can_bundle = EXCLUDED.can_bundle,
+    updated_at = EXCLUDED.updated_at
+WHERE product.provider_id = EXCLUDED.provider_id
+RETURNING id
+'''
+
+UPSERT_OPTIONS_SQL = '''
+INSERT INTO product_option (product_id, name, stock)
+SELECT DISTINCT ON (product.id, staging.option_name)
+       product.id, staging.option_name, staging.stock
+FROM catalog_import_staging AS staging
+JOIN product ON product.name = staging.product_name AND product.provider_id = staging.provider_id
+WHERE staging.option_name IS NOT NULL
+ORDER BY product.id, staging.option_name, staging.line DESC
+ON CONFLICT (product_id, name) DO UPDATE SET
+    stock = EXCLUDED.stock
+RETURNING id, stock
+'''
+
+# 입점사가 없거나 다른 입점사의 상품과 이름이 같아서 upsert되지 않은 줄들
+COUNT_REJECTED_STAGING_SQL = '''
+SELECT count(*)
+FROM catalog_import_staging AS staging
+WHERE NOT EXISTS (
+    SELECT 1
+    FROM product
+    WHERE product.name = staging.product_name
+      AND product.provider_id = staging.provider_id
+)
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'CSV/JSONL 상품 카탈로그를 COPY로 임시 테이블에 적재한 뒤 product/product_option에 upsert 합니다. '
+        f'컬럼: {", ".join(FIELDS)} (option_name이 비어있으면 상품만 upsert)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="파일 경로, '-'이면 stdin")
+        parser.add_argument('--format', choices=('csv', 'jsonl'))
+        parser.add_argument('--batch-size', type=int, default=50000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+        batch_size = options['batch_size']
+
+        if path == '-':
+            self.load(sys.stdin, file_format, batch_size)
+        else:
+            with open(path, newline='', encoding='utf-8') as file:
+                self.load(file, file_format, batch_size)
+
+    def read_rows(self, file, file_format):
+        if file_format == 'csv':
+            reader = csv.DictReader(file)
+            missing_fields = set(FIELDS) - set(reader.fieldnames or ())
+
+            if missing_fields:
+                raise CommandError(f'CSV 헤더에 {", ".join(sorted(missing_fields))} 컬럼이 없습니다.')
+
+            yield from enumerate(reader, start=2)
+        else:
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    # JSON이 아닌 줄은 clean_row에서 다른 잘못된 줄과 같이 건너뛴다.
+                    row = line.strip()
+
+                yield line_number, row
+
+    def clean_row(self, row):
+        def to_int(value):
+            value = int(value)
+            if not 0 <= value <= MAX_INTEGER:
+                raise ValueError(value)
+            return value
+
+        def to_bool(value):
+            if isinstance(value, bool):
+                return value
+            if str(value).lower() in TRUE_VALUES:
+                return True
+            if str(value).lower() in FALSE_VALUES:
+                return False
+            raise ValueError(value)
+
+        if not isinstance(row, dict):
+            raise TypeError(row)
+
+        product_name = str(row['product_name']).strip()
+        option_name = str(row.get('option_name') or '').strip() or None
+
+        if not product_name or len(product_name) > 50 or (option_name and len(option_name) > 50):
+            raise ValueError('name')
+
+        return (
+            to_int(row['provider_id']),
+            product_name,
+            to_int(row['price']),
+            to_int(row.get('shipping_price') or 0),
+            to_bool(row.get('is_on_sale', True)),
+            to_bool(row.get('can_bundle', True)),
+            option_name,
+            to_int(row.get('stock') or 0),
+        )
+
+    def load(self, file, file_format, batch_size):
+        started_at = time.monotonic()
+        row_count = rejected_count = 0
+        batch = []
+
+        with connection.cursor() as cursor:
+            cursor.execute(CREATE_STAGING_TABLE_SQL)
+
+        for line_number, row in self.read_rows(file, file_format):
+            try:
+                batch.append(self.clean_row(row))
+            except (KeyError, TypeError, ValueError):
+                rejected_count += 1
+                self.stderr.write(f'{line_number}번째 줄을 건너뜁니다: {row}')
+                continue
+
+            if len(batch) >= batch_size:
+                loaded_count, batch_rejected_count = self.load_batch(batch)
+                row_count += loaded_count
+                rejected_count += batch_rejected_count
+                batch = []
+                self.report(row_count, started_at)
+
+        if batch:
+            loaded_count, batch_rejected_count = self.load_batch(batch)
+            row_count += loaded_count
+            rejected_count += batch_rejected_count
+
+        bump_catalog_version()
+        self.report(row_count, started_at, rejected_count=rejected_count, style=self.style.SUCCESS)
+
+    def load_batch(self, batch):
+        """
+        배치를 upsert하고 (반영된 줄 수, 입점사가 없거나 다른 입점사의 상품 이름이라 반영되지 않은 줄 수)를 돌려줍니다.
+        """
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('TRUNCATE catalog_import_staging')
+            cursor.copy_expert(COPY_STAGING_SQL, buffer)
+            cursor.execute(UPSERT_PRODUCTS_SQL)
+            product_ids = [product_id for product_id, in cursor.fetchall()]
+            cursor.execute(UPSERT_OPTIONS_SQL)
+            stock_by_option_id = dict(cursor.fetchall())
+            cursor.execute(COUNT_REJECTED_STAGING_SQL)
+            rejected_count, = cursor.fetchone()
+            refresh_product_cards(product_ids)
+
+        if rejected_count:
+            self.stderr.write(f'입점사가 없거나 다른 입점사의 상품과 이름이 같은 {rejected_count}개 줄을 건너뜁니다.')
+
+        set_mirrored_stocks(stock_by_option_id)
+
+        return len(batch) - rejected_count, rejected_count
+
+    def report(self, row_count, started_at, rejected_count=None, style=None):
+        elapsed = max(time.monotonic() - started_at, 1e-6)
+        message = f'{row_count} rows, {elapsed:.1f}s, {row_count / elapsed:.0f} rows/sec'
+
+        if rejected_count is not None:
+            message += f', {rejected_count} rows rejected'
+
+        self.stdout.write(style(message) if style else message)
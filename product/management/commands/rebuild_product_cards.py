@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+
+from product.models import Product
+from product.read_models import refresh_product_cards_between, delete_orphan_product_cards
+
+
+class Command(BaseCommand):
+    help = 'product_card 읽기 모델을 product/product_option/provider로부터 전부 다시 만듭니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        started_at = time.monotonic()
+        id_range = Product.objects.aggregate(min_id=Min('id'), max_id=Max('id'))
+        refreshed_count = 0
+
+        if id_range['min_id'] is not None:
+            for start_id in range(id_range['min_id'], id_range['max_id'] + 1, chunk_size):
+                with transaction.atomic():
+                    refreshed_count += refresh_product_cards_between(start_id, start_id + chunk_size)
+
+        with transaction.atomic():
+            deleted_count = delete_orphan_product_cards()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'product_card {refreshed_count}건 갱신, {deleted_count}건 삭제 ({time.monotonic() - started_at:.1f}s)'
+        ))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from product.models import ProductOption
+from product.stock import set_mirrored_stocks
+
+
+class Command(BaseCommand):
+    help = 'product_option.stock 전체를 Redis 재고 미러에 다시 기록합니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        started_at = time.monotonic()
+        option_count = 0
+        chunk = {}
+
+        for option_id, stock in ProductOption.objects.values_list('id', 'stock').iterator(chunk_size=chunk_size):
+            chunk[option_id] = stock
+
+            if len(chunk) >= chunk_size:
+                set_mirrored_stocks(chunk)
+                option_count += len(chunk)
+                chunk = {}
+
+        if chunk:
+            set_mirrored_stocks(chunk)
+            option_count += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'상품옵션 {option_count}건의 재고를 미러링했습니다 ({time.monotonic() - started_at:.1f}s)'
+        ))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, transaction
+
+from product.read_models import pop_stale_product_ids, mark_stale_product_cards, refresh_product_cards
+
+
+class Command(BaseCommand):
+    help = 'PRODUCT_LIST_FROM_PRODUCT_CARD=True 일 때 주문으로 재고가 바뀐 상품들의 product_card를 모아서 갱신합니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--interval', type=float, default=1.0, help='갱신할 상품이 없을 때 기다리는 시간(초)')
+        parser.add_argument('--once', action='store_true', help='갱신할 상품을 모두 갱신하면 종료합니다.')
+
+    def handle(self, *args, **options):
+        while True:
+            product_ids = pop_stale_product_ids(options['batch_size'])
+
+            if not product_ids:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+                continue
+
+            close_old_connections()
+
+            try:
+                with transaction.atomic():
+                    refresh_product_cards(sorted(product_ids))
+            except Exception:
+                # 갱신하지 못한 상품은 다음에 다시 갱신한다.
+                mark_stale_product_cards(product_ids)
+                raise
+
+            self.stdout.write(f'상품 {len(product_ids)}개의 product_card를 갱신했습니다.')
@@ -0,0 +1,26 @@
+# Generated by Django 3.0.8 on 2026-10-18 10:12
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('user', '0003_provider_name_trgm_idx'),
+        ('product', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='product_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        AddIndexConcurrently(
+            model_name='productoption',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='product_option_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
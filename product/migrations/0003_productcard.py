@@ -0,0 +1,68 @@
+# Generated by Django 3.0.8 on 2026-10-18 11:03
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0002_product_name_trgm_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCard',
+            fields=[
+                ('id', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('provider_id', models.PositiveIntegerField()),
+                ('provider_name', models.CharField(max_length=50)),
+                ('name', models.CharField(db_index=True, max_length=50)),
+                ('price', models.PositiveIntegerField()),
+                ('shipping_price', models.PositiveIntegerField()),
+                ('is_on_sale', models.BooleanField()),
+                ('can_bundle', models.BooleanField()),
+                ('options', django.contrib.postgres.fields.jsonb.JSONField(default=list)),
+                ('total_stock', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': '상품 카드',
+                'verbose_name_plural': '상품 카드',
+                'db_table': 'product_card',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(fields=['provider_id', 'id'], name='product_card_provider_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(fields=['is_on_sale', 'id'], name='product_card_is_on_sale_idx'),
+        ),
+        migrations.RunSQL(
+            sql='''
+            INSERT INTO product_card (
+                id, provider_id, provider_name, name, price, shipping_price,
+                is_on_sale, can_bundle, options, total_stock, created_at, updated_at
+            )
+            SELECT product.id, product.provider_id, provider.provider_name, product.name, product.price,
+                   product.shipping_price, product.is_on_sale, product.can_bundle,
+                   COALESCE(product_options.options, '[]'::jsonb), COALESCE(product_options.total_stock, 0),
+                   product.created_at, product.updated_at
+            FROM product
+            JOIN provider ON provider.id = product.provider_id
+            LEFT JOIN LATERAL (
+                SELECT jsonb_agg(
+                           jsonb_build_array(product_option.id, product_option.stock, product_option.name)
+                           ORDER BY product_option.id
+                       ) AS options,
+                       SUM(product_option.stock) AS total_stock
+                FROM product_option
+                WHERE product_option.product_id = product.id
+            ) AS product_options ON TRUE
+            ''',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
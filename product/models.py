@@ -1,4 +1,6 @@
 from django.contrib.gis.db import models
+from django.contrib.postgres.fields import JSONField
+from django.contrib.postgres.indexes import GinIndex
 
 from common.models import TimeStampModel
 from user.models import Provider
@@ -29,6 +31,13 @@ class Product(TimeStampModel):
         db_table = 'product'
         verbose_name = '상품'
         verbose_name_plural = verbose_name
+        indexes = [
+            GinIndex(
+                fields=['name'],
+                name='product_name_trgm_idx',
+                opclasses=['gin_trgm_ops'],
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -51,9 +60,57 @@ class ProductOption(models.Model):
         db_table = 'product_option'
         verbose_name = '상품옵션'
         verbose_name_plural = verbose_name
+        indexes = [
+            GinIndex(
+                fields=['name'],
+                name='product_option_name_trgm_idx',
+                opclasses=['gin_trgm_ops'],
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['product', 'name'],
                 name='unique option for each product'
             )
         ]
+
+
+class ProductCard(models.Model):
+    id = models.PositiveIntegerField(
+        primary_key=True,
+    )
+    provider_id = models.PositiveIntegerField()
+    provider_name = models.CharField(
+        max_length=50,
+    )
+    name = models.CharField(
+        max_length=50,
+        db_index=True,
+    )
+    price = models.PositiveIntegerField()
+    shipping_price = models.PositiveIntegerField()
+    is_on_sale = models.BooleanField()
+    can_bundle = models.BooleanField()
+    options = JSONField(
+        default=list,
+    )
+    total_stock = models.PositiveIntegerField(
+        default=0,
+    )
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'product_card'
+        verbose_name = '상품 카드'
+        verbose_name_plural = verbose_name
+        indexes = [
+            models.Index(
+                fields=['provider_id', 'id'],
+                name='product_card_provider_idx',
+            ),
+            models.Index(
+                fields=['is_on_sale', 'id'],
+                name='product_card_is_on_sale_idx',
+            ),
+        ]
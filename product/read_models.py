@@ -0,0 +1,87 @@
+from django.core.cache import cache
+from django.db import connection
+from django_redis import get_redis_connection
+
+from product.cache_keys import STALE_PRODUCT_CARDS
+from product.models import ProductCard
+
+PRODUCT_CARD_COLUMNS = (
+    'id', 'provider_id', 'provider_name', 'name', 'price', 'shipping_price',
+    'is_on_sale', 'can_bundle', 'options', 'total_stock', 'created_at', 'updated_at',
+)
+
+REFRESH_PRODUCT_CARDS_SQL = '''
+INSERT INTO product_card ({columns})
+SELECT product.id, product.provider_id, provider.provider_name, product.name, product.price, product.shipping_price,
+       product.is_on_sale, product.can_bundle, COALESCE(product_options.options, '[]'::jsonb),
+       COALESCE(product_options.total_stock, 0), product.created_at, product.updated_at
+FROM product
+JOIN provider ON provider.id = product.provider_id
+LEFT JOIN LATERAL (
+    SELECT jsonb_agg(
+               jsonb_build_array(product_option.id, product_option.stock, product_option.name)
+               ORDER BY product_option.id
+           ) AS options,
+           SUM(product_option.stock) AS total_stock
+    FROM product_option
+    WHERE product_option.product_id = product.id
+) AS product_options ON TRUE
+WHERE {where}
+ON CONFLICT (id) DO UPDATE SET {updates}
+'''
+
+
+def _refresh_product_cards(where, params):
+    sql = REFRESH_PRODUCT_CARDS_SQL.format(
+        columns=', '.join(PRODUCT_CARD_COLUMNS),
+        where=where,
+        updates=', '.join(f'{column} = EXCLUDED.{column}' for column in PRODUCT_CARD_COLUMNS[1:]),
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def refresh_product_cards(product_ids):
+    return _refresh_product_cards('product.id = ANY(%s)', [list(product_ids)])
+
+
+def refresh_product_cards_between(start_id, end_id):
+    return _refresh_product_cards('product.id >= %s AND product.id < %s', [start_id, end_id])
+
+
+def delete_product_cards(product_ids):
+    return ProductCard.objects.filter(id__in=product_ids).delete()
+
+
+def delete_orphan_product_cards():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'DELETE FROM product_card '
+            'WHERE NOT EXISTS (SELECT 1 FROM product WHERE product.id = product_card.id)'
+        )
+        return cursor.rowcount
+
+
+def mark_stale_product_cards(product_ids):
+    """
+    주문 요청 중에 product_card를 갱신하지 않도록 재고가 바뀐 상품들을 모아두고 refresh_stale_product_cards 명령어가 갱신합니다.
+    """
+    if product_ids:
+        get_redis_connection('default').sadd(cache.make_key(STALE_PRODUCT_CARDS), *product_ids)
+
+
+def pop_stale_product_ids(count):
+    return [
+        int(product_id)
+        for product_id in get_redis_connection('default').spop(cache.make_key(STALE_PRODUCT_CARDS), count)
+    ]
+
+
+def rename_provider_product_cards(provider):
+    return ProductCard.objects.filter(
+        provider_id=provider.id,
+    ).update(
+        provider_name=provider.provider_name,
+    )
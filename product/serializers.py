@@ -1,6 +1,6 @@
 from rest_framework import serializers
 
-from product.models import Product, ProductOption
+from product.models import Product, ProductOption, ProductCard
 from user.serializers import ProviderSerializer
 
 
@@ -41,3 +41,35 @@ class ProductOptionWithProductSerializer(ProductOptionSerializer):
         fields = (
             'id', 'stock', 'name', 'product',
         )
+
+
+class ProductCardOptionsField(serializers.Field):
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return [
+            {'id': option_id, 'stock': stock, 'name': name}
+            for option_id, stock, name in value
+        ]
+
+
+class ProductCardProviderSerializer(serializers.Serializer):
+    id = serializers.IntegerField(source='provider_id')
+    provider_name = serializers.CharField()
+
+
+class ProductCardSerializer(serializers.ModelSerializer):
+    """
+    product_card 한 row로 ProductSerializer와 같은 모양의 결과를 만듭니다.
+    """
+    provider = ProductCardProviderSerializer(source='*')
+    options = ProductCardOptionsField()
+
+    class Meta:
+        model = ProductCard
+        fields = (
+            'id', 'name', 'price', 'shipping_price',
+            'is_on_sale', 'can_bundle', 'created_at', 'updated_at', 'provider', 'options',
+        )
@@ -0,0 +1,56 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from product.cache import bump_catalog_version
+from product.models import Product, ProductOption
+from product.read_models import refresh_product_cards, delete_product_cards, rename_provider_product_cards
+from product.stock import set_mirrored_stocks, delete_mirrored_stocks
+from user.models import Provider
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductOption)
+@receiver(post_delete, sender=ProductOption)
+@receiver(post_save, sender=Provider)
+@receiver(post_delete, sender=Provider)
+def invalidate_catalog(sender, **kwargs):
+    # 커밋 전에 다른 요청이 이전 데이터를 새 버전으로 캐싱하지 않도록 커밋 이후에도 한번 더 올린다.
+    bump_catalog_version()
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_card(sender, instance, **kwargs):
+    refresh_product_cards([instance.id])
+
+
+@receiver(post_delete, sender=Product)
+def delete_product_card(sender, instance, **kwargs):
+    delete_product_cards([instance.id])
+
+
+@receiver(post_save, sender=ProductOption)
+@receiver(post_delete, sender=ProductOption)
+def refresh_option_product_card(sender, instance, **kwargs):
+    refresh_product_cards([instance.product_id])
+
+
+@receiver(post_save, sender=Provider)
+def rename_provider_product_card(sender, instance, **kwargs):
+    rename_provider_product_cards(instance)
+
+
+@receiver(post_save, sender=ProductOption)
+def mirror_option_stock(sender, instance, **kwargs):
+    # 커밋 전까지는 미러를 비워서 DB 값을 읽게 하고, 커밋 이후에 새 재고를 기록한다.
+    stock_by_option_id = {instance.id: instance.stock}
+    delete_mirrored_stocks(stock_by_option_id)
+    transaction.on_commit(lambda: set_mirrored_stocks(stock_by_option_id))
+
+
+@receiver(post_delete, sender=ProductOption)
+def delete_mirrored_option_stock(sender, instance, **kwargs):
+    delete_mirrored_stocks([instance.id])
+    transaction.on_commit(lambda: delete_mirrored_stocks([instance.id]))
@@ -0,0 +1,150 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from product.cache import touch_stock_updated_at
+from product.cache_keys import PRODUCT_OPTION_STOCK_
+from product.models import ProductOption
+from product.read_models import mark_stale_product_cards
+
+RESERVE_STOCKS_SQL = '''
+WITH requested AS (
+    SELECT * FROM unnest(%s::integer[], %s::integer[]) AS requested (id, quantity)
+), locked AS (
+    SELECT product_option.id
+    FROM product_option
+    JOIN requested ON requested.id = product_option.id
+    WHERE product_option.stock >= requested.quantity
+    ORDER BY product_option.id
+    FOR UPDATE OF product_option
+)
+UPDATE product_option
+SET stock = product_option.stock - requested.quantity
+FROM locked, requested
+WHERE product_option.id = locked.id
+  AND requested.id = locked.id
+  AND product_option.stock >= requested.quantity
+RETURNING product_option.id, product_option.product_id, product_option.stock
+'''
+
+RELEASE_STOCKS_SQL = '''
+WITH requested AS (
+    SELECT * FROM unnest(%s::integer[], %s::integer[]) AS requested (id, quantity)
+), locked AS (
+    SELECT product_option.id
+    FROM product_option
+    JOIN requested ON requested.id = product_option.id
+    ORDER BY product_option.id
+    FOR UPDATE OF product_option
+)
+UPDATE product_option
+SET stock = product_option.stock + requested.quantity
+FROM locked, requested
+WHERE product_option.id = locked.id
+  AND requested.id = locked.id
+RETURNING product_option.id, product_option.product_id, product_option.stock
+'''
+
+
+def is_stock_mirror_enabled():
+    """
+    장바구니, 주문을 검증할 때 Redis의 재고로 먼저 거절할지 여부입니다.
+    캐시된 상품 리스트, 장바구니 응답의 재고는 이 설정과 상관없이 항상 Redis의 재고로 다시 채웁니다.
+    """
+    return settings.PRODUCT_STOCK_MIRROR_ENABLED
+
+
+def set_mirrored_stocks(stock_by_option_id):
+    cache.set_many(
+        {PRODUCT_OPTION_STOCK_(option_id): stock for option_id, stock in stock_by_option_id.items()},
+        timeout=settings.PRODUCT_STOCK_MIRROR_TIMEOUT,
+    )
+
+
+def delete_mirrored_stocks(option_ids):
+    cache.delete_many([PRODUCT_OPTION_STOCK_(option_id) for option_id in option_ids])
+
+
+def get_stocks(option_ids):
+    """
+    Redis에 미러링된 재고를 한번의 round trip으로 가져오고, 없는 옵션만 DB에서 읽어서 채워 넣습니다.
+    미러는 빠른 거절을 위한 값일 뿐이고 실제 재고 차감은 항상 DB에서 검증합니다.
+    """
+    option_id_by_key = {PRODUCT_OPTION_STOCK_(option_id): option_id for option_id in option_ids}
+    stocks = {
+        option_id_by_key[key]: stock
+        for key, stock in cache.get_many(list(option_id_by_key)).items()
+    }
+    missing_option_ids = set(option_ids) - set(stocks)
+
+    if missing_option_ids:
+        for option_id, stock in ProductOption.objects.filter(
+                id__in=missing_option_ids,
+        ).values_list(
+            'id', 'stock',
+        ):
+            # 그 사이에 커밋된 최신 값을 덮어쓰지 않도록 없는 경우에만 채운다.
+            cache.add(PRODUCT_OPTION_STOCK_(option_id), stock, timeout=settings.PRODUCT_STOCK_MIRROR_TIMEOUT)
+            stocks[option_id] = stock
+
+    return stocks
+
+
+def apply_mirrored_stocks(options):
+    """
+    캐시된 상품옵션 dict들의 stock을 미러의 현재 재고로 바꾸고 {option_id: stock}을 돌려줍니다.
+    재고가 바뀌어도 catalog version을 올리지 않기 때문에 캐시된 응답의 재고는 여기서 다시 채웁니다.
+    """
+    stocks = get_stocks({option['id'] for option in options})
+
+    for option in options:
+        option['stock'] = stocks.get(option['id'], option['stock'])
+
+    return stocks
+
+
+def publish_stocks(stock_by_option_id, product_ids):
+    """
+    커밋된 재고를 Redis에 기록합니다. 주문마다 상품 리스트, 장바구니 캐시 전체가 무효화되지 않도록 catalog version은 올리지 않고,
+    캐시된 응답은 apply_mirrored_stocks로 바뀐 옵션의 재고만 다시 읽습니다.
+    product_card는 주문 요청에서 갱신하지 않고 읽기 모델을 사용할 때만 refresh_stale_product_cards 명령어가 모아서 갱신합니다.
+    """
+    set_mirrored_stocks(stock_by_option_id)
+    touch_stock_updated_at()
+
+    if settings.PRODUCT_LIST_FROM_PRODUCT_CARD:
+        mark_stale_product_cards(product_ids)
+
+
+def execute_stock_update(sql, quantity_by_option_id):
+    option_ids = sorted(quantity_by_option_id)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [
+            option_ids, [quantity_by_option_id[option_id] for option_id in option_ids],
+        ])
+        rows = cursor.fetchall()
+
+    stock_by_option_id = {option_id: stock for option_id, _, stock in rows}
+    product_ids = {product_id for _, product_id, _ in rows}
+    transaction.on_commit(lambda: publish_stocks(stock_by_option_id, product_ids))
+
+    return stock_by_option_id
+
+
+def reserve_stocks(quantity_by_option_id):
+    """
+    재고가 충분한 옵션만 한번의 UPDATE로 차감하고 {option_id: 차감 후 재고}를 돌려줍니다.
+    row lock은 항상 option id 순서로 잡기 때문에 동시에 주문해도 deadlock이 생기지 않습니다.
+    돌려받은 옵션이 요청보다 적으면 호출한 쪽에서 예외를 발생시켜 transaction을 rollback 해야 하므로
+    반드시 transaction.atomic() 안에서 호출해야 합니다.
+    """
+    return execute_stock_update(RESERVE_STOCKS_SQL, quantity_by_option_id)
+
+
+def release_stocks(quantity_by_option_id):
+    """
+    환불, 주문 취소된 수량을 한번의 UPDATE로 재고에 되돌리고 {option_id: 복구 후 재고}를 돌려줍니다.
+    reserve_stocks와 같은 순서로 row lock을 잡습니다.
+    """
+    return execute_stock_update(RELEASE_STOCKS_SQL, quantity_by_option_id)
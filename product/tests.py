@@ -1,7 +1,20 @@
+import json
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 
+from common.fast_serializers import FastSerializer
+from common.pagination import KeysetPagination
 from common.tests import ToyTestCase
-from product.models import Product, ProductOption
+from product.cache import get_catalog_version
+from product.models import Product, ProductOption, ProductCard
+from product.serializers import ProductSerializer, ProductOptionWithProductSerializer
+from product.stock import publish_stocks
 
 
 class TestProductListAPIViewGET(ToyTestCase):
@@ -199,3 +212,302 @@ class TestProductListAPIViewGET(ToyTestCase):
             {item['provider']['id'] for item in response.json()['results']},
             {self.provider1.id, self.provider2.id}
         )
+
+    def test_같은_쿼리_파라미터로_다시_요청하면_DB를_조회하지_않고_캐시된_상품_리스트_노출_200_성공(self):
+        response = self.client.get(self.api_url + '?order_by=name&is_on_sale=t')
+
+        with self.assertNumQueries(0):
+            cached_response = self.client.get(self.api_url + '?is_on_sale=t&order_by=name')
+
+        self.assertEqual(cached_response.status_code, 200)
+        self.assertEqual(cached_response.json(), response.json())
+
+    def test_상품이_수정되면_캐시된_상품_리스트가_아닌_수정된_상품_리스트_노출_200_성공(self):
+        self.client.get(self.api_url)
+
+        self.product1.name = 'renamed_product1'
+        self.product1.save()
+        response = self.client.get(self.api_url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('renamed_product1', {item['name'] for item in response.json()['results']})
+
+    def test_상품옵션이나_입점사가_수정되면_캐시된_상품_리스트가_아닌_수정된_상품_리스트_노출_200_성공(self):
+        self.client.get(self.api_url)
+
+        self.product1_option.stock = 0
+        self.product1_option.save()
+        response = self.client.get(self.api_url)
+
+        self.assertEqual(
+            {option['stock'] for item in response.json()['results'] for option in item['options']},
+            {0, 10}
+        )
+
+        self.provider1.provider_name = 'renamed_provider1'
+        self.provider1.save()
+        response = self.client.get(self.api_url)
+
+        self.assertIn(
+            'renamed_provider1',
+            {item['provider']['provider_name'] for item in response.json()['results']}
+        )
+
+    def test_주문으로_재고가_바뀌어도_catalog_version을_올리지_않고_Redis의_재고를_노출_200_성공(self):
+        response = self.client.get(self.api_url)
+        catalog_version = get_catalog_version()
+
+        publish_stocks({self.product1_option.id: 3}, [self.product1.id])
+
+        self.assertEqual(get_catalog_version(), catalog_version)
+
+        modified_response = self.client.get(self.api_url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(modified_response.status_code, 200)
+        self.assertNotEqual(modified_response['ETag'], response['ETag'])
+        self.assertEqual(
+            {
+                option['id']: option['stock']
+                for item in modified_response.json()['results'] for option in item['options']
+            }[self.product1_option.id],
+            3,
+        )
+
+    @mock.patch.object(KeysetPagination, 'page_size', 2)
+    def test_pagination에_cursor를_사용하면_count_없이_cursor로_다음_이전_페이지의_상품_리스트_노출_200_성공(self):
+        for order_by in ('id', '-id', 'name', '-name'):
+            expected_names = list(Product.objects.order_by(order_by).values_list('name', flat=True))
+            response = self.client.get(self.api_url + f'?pagination=cursor&order_by={order_by}')
+
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.json())
+            self.assertIsNone(response.json()['previous'])
+            self.assertEqual([item['name'] for item in response.json()['results']], expected_names[:2])
+
+            next_response = self.client.get(response.json()['next'])
+
+            self.assertEqual(next_response.status_code, 200)
+            self.assertIsNone(next_response.json()['next'])
+            self.assertEqual([item['name'] for item in next_response.json()['results']], expected_names[2:])
+
+            previous_response = self.client.get(next_response.json()['previous'])
+
+            self.assertEqual(previous_response.status_code, 200)
+            self.assertEqual(previous_response.json()['results'], response.json()['results'])
+
+    def test_pagination에_잘못된_cursor를_사용하면_404_에러(self):
+        response = self.client.get(self.api_url + '?pagination=cursor&cursor=hahahoho')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'detail': '잘못된 cursor 입니다.'})
+
+    def test_쿼리_파라미터로_q를_사용하면_상품명_옵션명_입점사명으로_검색된_상품_리스트가_유사도순으로_노출_200_성공(self):
+        response = self.client.get(self.api_url + '?q=product1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['id'], self.product1.id)
+
+        ProductOption.objects.create(
+            product=self.product2,
+            stock=10,
+            name='red-shirt'
+        )
+        response = self.client.get(self.api_url + '?q=red-shirt')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['id'], self.product2.id)
+
+        response = self.client.get(self.api_url, {'q': '셀럽'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {item['id'] for item in response.json()['results']},
+            {self.product3.id, self.product4.id}
+        )
+
+    def test_쿼리_파라미터로_검색되지_않는_q를_사용하면_빈_상품_리스트_노출_200_성공(self):
+        response = self.client.get(self.api_url + '?q=zzzzzzzz')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 0)
+
+    def test_FastSerializer로_직렬화한_상품_리스트는_DRF_serializer로_직렬화한_결과와_바이트_단위로_같음(self):
+        ProductOption.objects.create(
+            product=self.product1,
+            stock=0,
+            name='sold out'
+        )
+        queryset = Product.objects.select_related('provider').prefetch_related('options').order_by('-id')
+        fast_serializer = FastSerializer(ProductSerializer)
+
+        self.assertEqual(
+            JSONRenderer().render(fast_serializer.serialize(fast_serializer.values_list(queryset))),
+            JSONRenderer().render(ProductSerializer(queryset, many=True).data),
+        )
+
+        queryset = ProductOption.objects.select_related('product__provider').order_by('id')
+        fast_serializer = FastSerializer(ProductOptionWithProductSerializer)
+
+        self.assertEqual(
+            JSONRenderer().render(fast_serializer.serialize(fast_serializer.values_list(queryset))),
+            JSONRenderer().render(ProductOptionWithProductSerializer(queryset, many=True).data),
+        )
+
+    @override_settings(PRODUCT_LIST_FROM_PRODUCT_CARD=True)
+    def test_product_card에서_조회한_상품_리스트는_상품_테이블에서_조회한_결과와_같음_200_성공(self):
+        ProductOption.objects.create(
+            product=self.product1,
+            stock=3,
+            name='another'
+        )
+        queryset = Product.objects.select_related('provider').prefetch_related('options').order_by('-id')
+        response = self.client.get(self.api_url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], Product.objects.count())
+        self.assertEqual(
+            JSONRenderer().render(response.json()['results']),
+            JSONRenderer().render(ProductSerializer(queryset, many=True).data),
+        )
+
+    @override_settings(PRODUCT_LIST_FROM_PRODUCT_CARD=True)
+    def test_주문으로_재고가_바뀐_상품의_product_card는_refresh_stale_product_cards_명령어가_갱신(self):
+        ProductOption.objects.filter(id=self.product1_option.id).update(stock=4)
+        publish_stocks({self.product1_option.id: 4}, [self.product1.id])
+
+        self.assertEqual(ProductCard.objects.get(id=self.product1.id).total_stock, 10)
+
+        call_command('refresh_stale_product_cards', '--once', stdout=StringIO())
+
+        self.assertEqual(ProductCard.objects.get(id=self.product1.id).total_stock, 4)
+
+    def test_상품_상품옵션_입점사가_변경되면_product_card도_함께_갱신(self):
+        product1_card = ProductCard.objects.get(id=self.product1.id)
+
+        self.assertEqual(product1_card.total_stock, 10)
+        self.assertEqual(product1_card.options, [[self.product1_option.id, 10, 'anything']])
+
+        self.product1_option.stock = 5
+        self.product1_option.save()
+        self.provider1.provider_name = 'renamed_provider1'
+        self.provider1.save()
+        product1_card.refresh_from_db()
+
+        self.assertEqual(product1_card.total_stock, 5)
+        self.assertEqual(product1_card.provider_name, 'renamed_provider1')
+
+        self.product1.delete()
+
+        self.assertFalse(ProductCard.objects.filter(id=self.product1.id).exists())
+
+    def test_If_None_Match가_현재_ETag와_같으면_상품_리스트를_조회하지_않고_304_성공(self):
+        response = self.client.get(self.api_url + '?order_by=name')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with self.assertNumQueries(0):
+            not_modified_response = self.client.get(
+                self.api_url + '?order_by=name',
+                HTTP_IF_NONE_MATCH=response['ETag'],
+            )
+
+        self.assertEqual(not_modified_response.status_code, 304)
+        self.assertEqual(not_modified_response.content, b'')
+        self.assertEqual(not_modified_response['ETag'], response['ETag'])
+
+        self.product1.price = 5000
+        self.product1.save()
+        modified_response = self.client.get(self.api_url + '?order_by=name', HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(modified_response.status_code, 200)
+        self.assertNotEqual(modified_response['ETag'], response['ETag'])
+
+
+class TestImportCatalogCommand(ToyTestCase):
+    def setUp(self):
+        self.provider = self.create_provider(
+            username='Ably',
+            name='Ably',
+            phone_number='01033333333',
+            email='ddd@naver.com',
+        )
+
+    def import_catalog(self, lines, suffix='.csv'):
+        stdout = StringIO()
+
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, encoding='utf-8') as file:
+            if suffix == '.csv':
+                file.write('provider_id,product_name,price,shipping_price,is_on_sale,can_bundle,option_name,stock\n')
+            file.write(''.join(f'{line}\n' for line in lines))
+            file.flush()
+            call_command('import_catalog', file.name, batch_size=2, stdout=stdout, stderr=StringIO())
+
+        return stdout.getvalue()
+
+    def test_CSV_파일로_상품과_상품옵션을_upsert_하고_잘못된_줄은_건너뜀(self):
+        self.import_catalog([
+            f'{self.provider.id},product1,3000,2500,t,t,red,10',
+            f'{self.provider.id},product1,3000,2500,t,t,blue,5',
+            f'{self.provider.id},product2,5000,0,f,f,free,1',
+            f'{self.provider.id},product3,not_int,0,t,t,free,1',
+        ])
+
+        product1 = Product.objects.get(name='product1')
+
+        self.assertEqual(Product.objects.filter(provider=self.provider).count(), 2)
+        self.assertEqual(product1.shipping_price, 2500)
+        self.assertEqual(
+            dict(product1.options.values_list('name', 'stock')),
+            {'red': 10, 'blue': 5}
+        )
+        self.assertEqual(ProductCard.objects.get(id=product1.id).total_stock, 15)
+
+        self.import_catalog([
+            f'{self.provider.id},product1,3500,2500,t,t,red,0',
+        ])
+        product1.refresh_from_db()
+
+        self.assertEqual(product1.price, 3500)
+        self.assertEqual(
+            dict(product1.options.values_list('name', 'stock')),
+            {'red': 0, 'blue': 5}
+        )
+
+    def test_JSONL_파일의_JSON이_아닌_줄과_integer_범위를_넘는_값은_건너뛰고_나머지는_upsert(self):
+        output = self.import_catalog([
+            json.dumps({'provider_id': self.provider.id, 'product_name': 'product1', 'price': 3000, 'option_name': 'red', 'stock': 10}),
+            '{"provider_id": ',
+            json.dumps({'provider_id': self.provider.id, 'product_name': 'product2', 'price': 2 ** 31, 'option_name': 'red'}),
+            json.dumps(['product3']),
+            json.dumps({'provider_id': self.provider.id, 'product_name': 'product4', 'price': 1000, 'option_name': 'blue', 'stock': 1}),
+        ], suffix='.jsonl')
+
+        self.assertEqual(
+            list(Product.objects.filter(provider=self.provider).order_by('name').values_list('name', flat=True)),
+            ['product1', 'product4'],
+        )
+        self.assertIn('2 rows,', output)
+        self.assertIn('3 rows rejected', output)
+
+    def test_입점사가_없거나_다른_입점사의_상품_이름인_줄은_rejected로_세고_중복된_줄은_나중_줄을_반영(self):
+        other_provider = self.create_provider(
+            username='Zigzag',
+            name='Zigzag',
+            phone_number='01044444444',
+            email='eee@naver.com',
+        )
+        Product.objects.create(provider=other_provider, name='taken', price=1000, shipping_price=0)
+
+        output = self.import_catalog([
+            f'{self.provider.id},product1,3000,0,t,t,red,10',
+            f'{self.provider.id},product1,3000,0,t,t,red,7',
+            f'{self.provider.id},taken,3000,0,t,t,red,1',
+            f'{other_provider.id + 1000},missing,3000,0,t,t,red,1',
+        ])
+
+        self.assertEqual(dict(Product.objects.get(name='product1').options.values_list('name', 'stock')), {'red': 7})
+        self.assertFalse(Product.objects.filter(name='missing').exists())
+        self.assertEqual(Product.objects.get(name='taken').provider_id, other_provider.id)
+        self.assertIn('2 rows,', output)
+        self.assertIn('2 rows rejected', output)
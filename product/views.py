@@ -1,14 +1,54 @@
-from django.db.models import Q
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.core.cache import cache
+from django.db.models import Q, OuterRef, Subquery, DecimalField
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest, Cast
+from django.utils.http import quote_etag
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from common.fast_serializers import FastSerializer
+from common.mixins import FastListModelMixin, ConditionalGetMixin
+from common.pagination import KeysetPagination
+from product.cache import get_catalog_state
+from product.cache_keys import PRODUCT_LIST_
+from product.models import Product, ProductOption, ProductCard
+from product.serializers import ProductSerializer, ProductCardSerializer
+from product.stock import apply_mirrored_stocks
+
+# 테이블마다 pg_trgm GIN 인덱스를 탈 수 있도록 상품명, 입점사명, 옵션명 검색을 따로 하고 UNION으로 후보 상품만 모은다.
+# 여러 테이블의 조건을 OR로 묶으면 인덱스를 쓰지 못하고 상품 전체를 join해서 훑는다.
+SEARCH_PRODUCT_IDS_SQL = '''
+SELECT product.id
+FROM product
+WHERE product.name %% %s OR product.name LIKE %s
+UNION
+SELECT product.id
+FROM provider
+JOIN product ON product.provider_id = provider.id
+WHERE provider.provider_name %% %s OR provider.provider_name LIKE %s
+UNION
+SELECT product_option.product_id
+FROM product_option
+WHERE product_option.name %% %s OR product_option.name LIKE %s
+'''
+
 
-from product.models import Product
-from product.serializers import ProductSerializer
+def get_like_pattern(search):
+    escaped = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
 
 
-class ProductListAPIView(ListAPIView):
+class ProductListAPIView(ConditionalGetMixin, FastListModelMixin, ListAPIView):
     permission_classes = (AllowAny,)
     serializer_class = ProductSerializer
+    fast_serializer = FastSerializer(ProductSerializer)
+    product_card_fast_serializer = FastSerializer(ProductCardSerializer)
     queryset = Product.objects.select_related(
         'provider'
     ).prefetch_related(
@@ -16,9 +56,28 @@ class ProductListAPIView(ListAPIView):
     ).order_by(
         '-id'
     )
+    cache_key_params = ('page', 'pagination', 'cursor', 'order_by', 'is_on_sale', 'provider_id', 'q')
+
+    @property
+    def paginator(self):
+        if self.request.query_params.get('pagination') == 'cursor':
+            self.pagination_class = KeysetPagination
+        return super().paginator
+
+    def is_serving_from_product_card(self):
+        return settings.PRODUCT_LIST_FROM_PRODUCT_CARD and not self.request.query_params.get('q', '').strip()
+
+    def get_fast_serializer(self):
+        if self.is_serving_from_product_card():
+            return self.product_card_fast_serializer
+        return super().get_fast_serializer()
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        if self.is_serving_from_product_card():
+            queryset = ProductCard.objects.order_by('-id')
+        else:
+            queryset = super().get_queryset()
+
         order_by = self.request.query_params.get('order_by')
 
         if order_by in ('id', '-id', 'name', '-name'):
@@ -38,4 +97,87 @@ class ProductListAPIView(ListAPIView):
         if provider_id and provider_id.isdigit():
             q |= Q(provider_id=provider_id)
 
-        return queryset.filter(q)
+        queryset = queryset.filter(q)
+        search = self.request.query_params.get('q', '').strip()
+
+        if search:
+            queryset = self.search_queryset(queryset, search)
+
+        return queryset
+
+    def search_queryset(self, queryset, search):
+        """
+        상품명, 옵션명, 입점사명을 pg_trgm GIN 인덱스로 검색하고 가장 유사한 항목의 similarity로 정렬합니다.
+        similarity는 UNION으로 모은 후보 상품들에서만 계산합니다.
+        keyset pagination에서 그대로 비교할 수 있도록 rank는 numeric으로 고정합니다.
+        """
+        option_similarity = ProductOption.objects.filter(
+            product_id=OuterRef('id'),
+        ).annotate(
+            similarity=TrigramSimilarity('name', search),
+        ).order_by(
+            '-similarity'
+        ).values('similarity')[:1]
+
+        queryset = queryset.filter(
+            id__in=RawSQL(SEARCH_PRODUCT_IDS_SQL, [search, get_like_pattern(search)] * 3),
+        ).annotate(
+            rank=Cast(
+                Greatest(
+                    TrigramSimilarity('name', search),
+                    TrigramSimilarity('provider__provider_name', search),
+                    Subquery(option_similarity),
+                ),
+                DecimalField(max_digits=7, decimal_places=6),
+            ),
+        )
+
+        if self.request.query_params.get('order_by') not in ('id', '-id', 'name', '-name'):
+            queryset = queryset.order_by('-rank', '-id')
+
+        return queryset
+
+    def get_catalog_state(self):
+        if not hasattr(self, '_catalog_state'):
+            self._catalog_state = get_catalog_state()
+        return self._catalog_state
+
+    def get_cache_key(self):
+        catalog_version, _ = self.get_catalog_state()
+        params = urlencode(sorted(
+            (param, self.request.query_params[param])
+            for param in self.cache_key_params if param in self.request.query_params
+        ))
+        return PRODUCT_LIST_(catalog_version, params)
+
+    def get_conditional_validators(self):
+        _, catalog_updated_at = self.get_catalog_state()
+        # 재고가 바뀌어도 catalog version이 올라가지 않으므로 페이지에 있는 옵션들의 재고를 ETag에 넣는다.
+        _, stocks = self.get_list_data()
+        etag_source = f'{self.get_cache_key()}:{sorted(stocks.items())}'
+        etag = quote_etag(hashlib.md5(etag_source.encode()).hexdigest())
+        return etag, catalog_updated_at
+
+    def get_list_data(self):
+        """
+        catalog version별로 캐시된 상품 리스트와, Redis의 재고로 다시 채운 {option_id: stock}입니다.
+        """
+        if hasattr(self, '_list_data'):
+            return self._list_data
+
+        cache_key = self.get_cache_key()
+        data = cache.get(cache_key)
+
+        if data is None:
+            data = super().list(self.request).data
+            cache.set(cache_key, data, timeout=settings.PRODUCT_LIST_CACHE_TIMEOUT)
+
+        items = data['results'] if isinstance(data, dict) else data
+        stocks = apply_mirrored_stocks([option for item in items for option in item['options']])
+
+        self._list_data = data, stocks
+        return self._list_data
+
+    def list(self, request, *args, **kwargs):
+        data, _ = self.get_list_data()
+        return Response(data)
@@ -0,0 +1,22 @@
+# Generated by Django 3.0.8 on 2026-10-18 10:12
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('user', '0002_provider'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddIndexConcurrently(
+            model_name='provider',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['provider_name'], name='provider_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.contrib.auth.base_user import AbstractBaseUser
 from django.contrib.auth.models import PermissionsMixin, UserManager
 from django.contrib.gis.db import models
+from django.contrib.postgres.indexes import GinIndex
 
 from common.models import TimeStampModel
 
@@ -60,6 +61,13 @@ class Provider(models.Model):
         db_table = 'provider'
         verbose_name = '입점사(상품 등록자)'
         verbose_name_plural = verbose_name
+        indexes = [
+            GinIndex(
+                fields=['provider_name'],
+                name='provider_name_trgm_idx',
+                opclasses=['gin_trgm_ops'],
+            ),
+        ]
 
     def __str__(self):
         return self.provider_name